@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# Benchmark of the stages of generate_csv.py: creation of the calendar
+# (Calendar.__init__ and init_weeks), addition of birthdays, namedays and
+# events, and serialisation of the weeks (Week.__str__).
+#
+# Each stage is run on synthetic data over scaling axes: the length of the
+# calendar (extra_weeks) and the number of items. The results, with the
+# duration, the throughput and the peak of the memory allocated (measured
+# with tracemalloc in a separate run), are written as JSON. A previous
+# result file can be given as baseline to compare with.
+
+import datetime
+from functools import partial
+import gc
+import json
+from optparse import OptionParser
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from csvcalendar import Calendar
+
+__all__ = [
+        'compare',
+        'run',
+        ]
+
+# Year of the calendars.
+g_year = 2022
+
+# Number of birthdays and events in the calendars of the serialisation
+# stage.
+g_serialize_count = 1000
+
+# Extra weeks of the calendars of the addition stages, as generate_csv.py.
+g_extra_weeks = 2
+
+g_stages = ['init', 'serialize', 'add_birthday', 'add_nameday', 'add_event']
+
+# Minimum total duration of the timed runs of a measurement, in seconds,
+# short measurements are repeated more.
+g_min_time = 0.2
+
+g_default_years = [1, 10, 50]
+g_default_counts = [1000, 10000, 100000]
+
+
+def synthetic_birthdays(count: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """Return `count` (datestr, name) birthdays, 10 % with unknown year."""
+    rand = random.Random(seed)
+    birthdays = []
+    for i in range(count):
+        year = 0 if rand.random() < 0.1 else rand.randint(1930, g_year)
+        # 0000-02-29 is not accepted by Birthday.
+        first = datetime.date(year or 2001, 1, 1)
+        date = first + datetime.timedelta(days=rand.randrange(
+            (first.replace(year=first.year + 1) - first).days))
+        birthdays.append(('{:04d}-{:02d}-{:02d}'.format(
+            year, date.month, date.day), 'Person {}'.format(i)))
+    return birthdays
+
+
+def synthetic_namedays(count: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """Return `count` (datestr, name) namedays."""
+    rand = random.Random(seed)
+    namedays = []
+    for i in range(count):
+        date = (datetime.date(2000, 1, 1)
+                + datetime.timedelta(days=rand.randrange(366)))
+        namedays.append(('{:02d}-{:02d}'.format(date.month, date.day),
+            'Saint {}'.format(i)))
+    return namedays
+
+
+def synthetic_events(cal: Calendar, count: int,
+        seed: int = 0) -> List[Tuple[str, str]]:
+    """Return `count` (datestr, name) events in the range of `cal`."""
+    rand = random.Random(seed)
+    return [((cal.first_day + datetime.timedelta(
+        days=rand.randrange(cal.day_count))).isoformat(),
+        'Event {}'.format(i)) for i in range(count)]
+
+
+def _serialize(cal: Calendar):
+    for week in cal.weeks:
+        str(week)
+
+
+def _setup_init(extra_weeks: int) -> Callable[[], None]:
+    return lambda: Calendar(g_year, extra_weeks=extra_weeks)
+
+
+def _setup_serialize(extra_weeks: int, count: int) -> Callable[[], None]:
+    cal = Calendar(g_year, extra_weeks=extra_weeks)
+    cal.add_birthdays(synthetic_birthdays(count))
+    for datestr, name in synthetic_events(cal, count):
+        cal.add_event(datestr, name)
+    return lambda: _serialize(cal)
+
+
+def _setup_add(method: str,
+        items: List[Tuple[str, str]]) -> Callable[[], None]:
+    add = getattr(Calendar(g_year, extra_weeks=g_extra_weeks), method)
+
+    def func():
+        for datestr, name in items:
+            add(datestr, name)
+    return func
+
+
+def _stage_cases(years: List[int], counts: List[int], stages: List[str]
+        ) -> Iterator[Tuple[str, int, int, Callable[[], Callable[[], None]]]]:
+    """Yield (stage, extra_weeks, count, setup) for all measurements.
+
+    `setup` is called before each run, out of the measurement, and returns
+    the function to measure.
+
+    """
+    if 'init' in stages:
+        for y in years:
+            yield 'init', 52 * y, 0, partial(_setup_init, 52 * y)
+    if 'serialize' in stages:
+        for y in years:
+            yield ('serialize', 52 * y, g_serialize_count,
+                    partial(_setup_serialize, 52 * y, g_serialize_count))
+    synthetic = {
+            'add_birthday': synthetic_birthdays,
+            'add_nameday': synthetic_namedays,
+            'add_event': lambda count: synthetic_events(
+                Calendar(g_year, extra_weeks=g_extra_weeks), count),
+            }
+    for count in counts:
+        for stage, make_items in synthetic.items():
+            if stage in stages:
+                yield (stage, g_extra_weeks, count,
+                        partial(_setup_add, stage, make_items(count)))
+
+
+def measure(setup: Callable[[], Callable[[], None]],
+        repeat: int = 3,
+        memory: bool = True) -> Tuple[float, Optional[int]]:
+    """Return the best duration in seconds and the peak memory in bytes.
+
+    Parameters
+    ----------
+
+    - setup: function returning the function to measure, cf. `_stage_cases`.
+    - repeat: minimum number of timed runs, cf. `g_min_time`.
+    - memory: whether to measure the peak memory, in an additional run.
+
+    """
+    best = float('inf')
+    total = 0.0
+    runs = 0
+    while runs < repeat or total < g_min_time:
+        func = setup()
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        duration = time.perf_counter() - start
+        del func
+        best = min(best, duration)
+        total += duration
+        runs += 1
+    peak = None
+    if memory:
+        func = setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+def run(years: List[int] = g_default_years,
+        counts: List[int] = g_default_counts,
+        stages: Optional[List[str]] = None,
+        repeat: int = 3,
+        memory: bool = True,
+        verbose: bool = False) -> Dict:
+    """Run the benchmark and return the results.
+
+    Parameters
+    ----------
+
+    - years: lengths of the calendars, in years of extra weeks.
+    - counts: numbers of birthdays, namedays and events.
+    - stages: stages to run, default to all.
+    - repeat: number of timed runs of each measurement.
+    - memory: whether to measure the peak memory.
+    - verbose: whether to print the progress to the standard error.
+
+    """
+    results = []
+    for stage, extra_weeks, count, setup in _stage_cases(years, counts,
+            stages or g_stages):
+        duration, peak = measure(setup, repeat, memory)
+        result = {
+                'stage': stage,
+                'extra_weeks': extra_weeks,
+                'count': count,
+                'time': duration,
+                'peak_memory': peak,
+                }
+        if count and stage != 'serialize':
+            result['per_second'] = count / duration
+        results.append(result)
+        if verbose:
+            print('{stage} extra_weeks={extra_weeks} count={count}:'
+                    ' {time:.4f} s'.format(**result), file=sys.stderr)
+    return {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'repeat': repeat,
+            'results': results,
+            }
+
+
+def compare(results: Dict, baseline: Dict,
+        threshold: float = 1.2) -> Tuple[List[str], bool]:
+    """Compare results with a baseline.
+
+    Return the lines of the comparison and whether a time or a peak memory
+    exceeds `threshold` times the baseline.
+
+    Parameters
+    ----------
+
+    - results, baseline: results of `run`.
+    - threshold: maximum accepted ratio to the baseline.
+
+    """
+    base = {(r['stage'], r['extra_weeks'], r['count']): r
+            for r in baseline['results']}
+    lines = ['{:<14} {:>11} {:>8} {:>10} {:>10} {:>7} {:>7}'.format(
+        'stage', 'extra_weeks', 'count', 'time', 'baseline', 'ratio',
+        'memory')]
+    regression = False
+    for r in results['results']:
+        b = base.get((r['stage'], r['extra_weeks'], r['count']))
+        if b is None:
+            continue
+        time_ratio = r['time'] / b['time']
+        memory_ratio = None
+        if r['peak_memory'] and b.get('peak_memory'):
+            memory_ratio = r['peak_memory'] / b['peak_memory']
+        flag = ''
+        if (time_ratio > threshold
+                or (memory_ratio is not None and memory_ratio > threshold)):
+            regression = True
+            flag = ' !'
+        lines.append('{:<14} {:>11} {:>8} {:>10.4f} {:>10.4f} {:>7.2f}'
+                ' {:>7}{}'.format(r['stage'], r['extra_weeks'], r['count'],
+                    r['time'], b['time'], time_ratio,
+                    '-' if memory_ratio is None
+                    else '{:.2f}'.format(memory_ratio), flag))
+    return lines, regression
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(',') if v]
+
+
+if __name__ == '__main__':
+    usage = 'usage: %prog [options]'
+    parser = OptionParser(usage=usage,
+            description=('Benchmark the stages of generate_csv.py and write'
+                ' the results as JSON.'))
+
+    parser.add_option('-y', '--years', dest='years',
+            action='store', type=str,
+            default=','.join(str(y) for y in g_default_years),
+            help=('comma-separated lengths of the calendars in years of'
+                ' extra weeks, default %default'))
+
+    parser.add_option('-c', '--counts', dest='counts',
+            action='store', type=str,
+            default=','.join(str(c) for c in g_default_counts),
+            help=('comma-separated numbers of birthdays, namedays and'
+                ' events, default %default'))
+
+    parser.add_option('-s', '--stage', dest='stages',
+            action='append', type=str, default=[],
+            help=('stage to run ({}), can be given several times, default'
+                ' to all'.format(', '.join(g_stages))))
+
+    parser.add_option('-r', '--repeat', dest='repeat',
+            action='store', type=int, default=3,
+            help='number of timed runs of each measurement, default %default')
+
+    parser.add_option('-M', '--no-memory', dest='memory',
+            action='store_false', default=True,
+            help='do not measure the peak memory')
+
+    parser.add_option('-o', '--output-file', dest='output_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help='write the results to FILE instead of the standard output')
+
+    parser.add_option('-b', '--baseline', dest='baseline',
+            action='store', type=str, metavar='FILE', default=None,
+            help=('compare with the results in FILE and exit with 1 on'
+                ' regression'))
+
+    parser.add_option('-t', '--threshold', dest='threshold',
+            action='store', type=float, default=1.2,
+            help=('maximum accepted ratio of time and memory to the baseline,'
+                ' default %default'))
+
+    parser.add_option('-v', '--verbose', dest='verbose',
+            action='store_true', default=False,
+            help='print the progress to the standard error')
+
+    options, args = parser.parse_args()
+    for stage in options.stages:
+        if stage not in g_stages:
+            parser.error('Unknown stage "{}"'.format(stage))
+    results = run(_int_list(options.years), _int_list(options.counts),
+            stages=options.stages, repeat=options.repeat,
+            memory=options.memory, verbose=options.verbose)
+    if options.output_file:
+        with open(options.output_file, 'w') as f:
+            json.dump(results, f, indent=1)
+            f.write('\n')
+    else:
+        json.dump(results, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+    if options.baseline:
+        with open(options.baseline, 'r') as f:
+            lines, regression = compare(results, json.load(f),
+                    options.threshold)
+        print('\n'.join(lines), file=sys.stderr)
+        if regression:
+            sys.exit(1)
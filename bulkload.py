@@ -0,0 +1,277 @@
+# Bulk loading of the birthday, event, holiday, moon and nameday files into a
+# Calendar (cf. csvcalendar.py for the file formats).
+#
+# The files are read by chunks of lines. The dates of a chunk are parsed in
+# one pass with NumPy, converted to day offsets from `Calendar.first_day` and
+# the entries in the calendar range are grouped by week before being added.
+# Only the entries in the calendar range are kept, so that the memory use is
+# bounded by the chunk size for large files.
+#
+# Requires NumPy.
+
+from itertools import islice
+from typing import Iterator, List, TextIO, Tuple
+
+import numpy as np
+
+from csvcalendar import Birthday
+from csvcalendar import Calendar
+from csvcalendar import Celebration
+from csvcalendar import Event
+from csvcalendar import Nameday
+
+__all__ = [
+        'load_birthdays',
+        'load_events',
+        'load_namedays',
+        ]
+
+# Number of lines parsed at once.
+g_chunk_size = 100000
+
+_zero = ord('0')
+_dash = ord('-')
+
+
+def read_chunks(f: TextIO, chunk_size: int = g_chunk_size
+        ) -> Iterator[Tuple[int, List[str]]]:
+    """Yield (line number of the first line, lines) by chunks."""
+    line_number = 1
+    while True:
+        lines = list(islice(f, chunk_size))
+        if not lines:
+            return
+        yield line_number, lines
+        line_number += len(lines)
+
+
+def parse_dates(fields: List[str], with_year: bool = True
+        ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Return the arrays of dates 'yyyy-mm-dd' or 'mm-dd'.
+
+    Parameters
+    ----------
+
+    - fields: date strings.
+    - with_year: True for 'yyyy-mm-dd', False for 'mm-dd' (year is then 0).
+
+    Return (year, month, day, valid), where `valid` is False for the
+    fields that are not a valid date.
+
+    """
+    width = 10 if with_year else 5
+    try:
+        raw = np.array(fields, dtype='S{}'.format(width))
+    except UnicodeEncodeError:
+        raw = np.array([f.encode('ascii', 'replace') for f in fields],
+                dtype='S{}'.format(width))
+    chars = raw.view(np.uint8).reshape(-1, width)
+    if with_year:
+        digits = chars[:, [0, 1, 2, 3, 5, 6, 8, 9]] - _zero
+        separators = chars[:, [4, 7]]
+    else:
+        digits = chars[:, [0, 1, 3, 4]] - _zero
+        separators = chars[:, [2]]
+    # Non-digits are > 9 as unsigned.
+    valid = (digits <= 9).all(axis=1) & (separators == _dash).all(axis=1)
+    digits = digits.astype(np.int64)
+    if with_year:
+        year = (digits[:, 0] * 1000 + digits[:, 1] * 100
+                + digits[:, 2] * 10 + digits[:, 3])
+        month = digits[:, 4] * 10 + digits[:, 5]
+        day = digits[:, 6] * 10 + digits[:, 7]
+    else:
+        year = np.zeros(len(fields), dtype=np.int64)
+        month = digits[:, 0] * 10 + digits[:, 1]
+        day = digits[:, 2] * 10 + digits[:, 3]
+    valid &= (month >= 1) & (month <= 12) & (day >= 1)
+    # Day count of the month, with year 0 (unknown year) as a leap year.
+    valid &= day <= month_length(year, np.clip(month, 1, 12))
+    return year, month, day, valid
+
+
+def month_start(year: np.ndarray, month: np.ndarray) -> np.ndarray:
+    """Return the first days of the months as datetime64[D]."""
+    months = (year - 1970) * 12 + (month - 1)
+    return months.astype('datetime64[M]').astype('datetime64[D]')
+
+
+def month_length(year: np.ndarray, month: np.ndarray) -> np.ndarray:
+    """Return the number of days of the months."""
+    months = ((year - 1970) * 12 + (month - 1)).astype('datetime64[M]')
+    return ((months + 1).astype('datetime64[D]')
+            - months.astype('datetime64[D]')).astype(np.int64)
+
+
+def day_offsets(cal: Calendar,
+        year: np.ndarray,
+        month: np.ndarray,
+        day: np.ndarray) -> np.ndarray:
+    """Return the offsets of the dates from `cal.first_day`, in days.
+
+    Days after the end of the month (Feb. 29th in non-leap years) roll over
+    to the next month.
+
+    """
+    dates = month_start(year, month) + (day - 1)
+    return (dates - np.datetime64(cal.first_day, 'D')).astype(np.int64)
+
+
+def group_by_week(cal: Calendar, offsets: np.ndarray
+        ) -> Iterator[Tuple[int, np.ndarray]]:
+    """Yield (week index, indices in `offsets`) for offsets in `cal`.
+
+    The indices of a week keep their order in `offsets`.
+
+    """
+    in_range = np.flatnonzero((offsets >= 0) & (offsets < cal.day_count))
+    if not len(in_range):
+        return
+    weeks = offsets[in_range] // 7
+    order = np.argsort(weeks, kind='stable')
+    weeks = weeks[order]
+    in_range = in_range[order]
+    bounds = np.flatnonzero(np.diff(weeks)) + 1
+    for group in np.split(np.arange(len(weeks)), bounds):
+        yield int(weeks[group[0]]), in_range[group]
+
+
+def _check_valid(filename: str, line_number: int, lines: List[str],
+        valid: np.ndarray) -> np.ndarray:
+    """Return the indices of the valid lines, ignoring empty lines.
+
+    Raise ValueError with the location of the first wrong line.
+
+    """
+    if valid.all():
+        return np.arange(len(lines))
+    for i in np.flatnonzero(~valid):
+        if lines[i].strip():
+            raise ValueError('{}:{}: wrong format, see --help for details'.format(
+                filename, line_number + i))
+    return np.flatnonzero(valid)
+
+
+def load_events(cal: Calendar, event_file: str, kind: str = 'event',
+        chunk_size: int = g_chunk_size):
+    """Add the entries of a file with format 'yyyy-mm-dd,name'.
+
+    Parameters
+    ----------
+
+    - cal: calendar to fill.
+    - event_file: file name.
+    - kind: 'event', 'holiday' or 'moon'.
+    - chunk_size: number of lines parsed at once.
+
+    """
+    if kind not in ('event', 'holiday', 'moon'):
+        raise ValueError('Unknown kind {}'.format(kind))
+    with open(event_file, 'r') as f:
+        for line_number, lines in read_chunks(f, chunk_size):
+            year, month, day, valid = parse_dates([l[:10] for l in lines])
+            # The year 0000 (unknown year) is only for birthdays.
+            valid &= year > 0
+            keep = _check_valid(event_file, line_number, lines, valid)
+            offsets = day_offsets(cal, year[keep], month[keep], day[keep])
+            check = not cal.trusted
+            for week_index, group in group_by_week(cal, offsets):
+                week = cal.week_for_update(week_index)
+                for k in group:
+                    l = lines[keep[k]]
+                    event = Event(l[:10], l[11:].strip())
+                    d = week.days[offsets[k] % 7]
+                    if kind == 'event':
+                        d.add_event(event, check)
+                    elif kind == 'holiday':
+                        d.set_holiday(event, check)
+                    else:
+                        d.set_moon(event, check)
+
+
+def _load_celebrations(cal: Calendar,
+        month: np.ndarray,
+        day: np.ndarray,
+        make_source,
+        on_next_day: bool):
+    """Add the yearly celebrations of the given month and day.
+
+    Parameters
+    ----------
+
+    - month, day: dates of the sources.
+    - make_source: function(index) returning the Birthday or Nameday at
+        `index`.
+    - on_next_day: True for birthdays, cf. `csvcalendar.yearly_dates`.
+
+    """
+    sources = {}
+    check = not cal.trusted
+    for celebration_year in range(cal.first_day.year, cal.last_day.year + 1):
+        year = np.full(len(month), celebration_year, dtype=np.int64)
+        # Feb. 29th rolls over to March 1st in non-leap years.
+        offsets = day_offsets(cal, year, month, day)
+        if not on_next_day:
+            offsets[day > month_length(year, month)] = -1
+        for week_index, group in group_by_week(cal, offsets):
+            week = cal.week_for_update(week_index)
+            for i in group:
+                source = sources.get(i)
+                if source is None:
+                    source = sources[i] = make_source(i)
+                d = week.days[offsets[i] % 7]
+                if on_next_day:
+                    d.add_birthday(Celebration(source, d.date), check)
+                else:
+                    d.add_nameday(Celebration(source, d.date), check)
+
+
+def load_birthdays(cal: Calendar, birthday_file: str,
+        chunk_size: int = g_chunk_size):
+    """Add the birthdays of a file with format 'yyyy-mm-dd,name'.
+
+    Parameters
+    ----------
+
+    - cal: calendar to fill.
+    - birthday_file: file name.
+    - chunk_size: number of lines parsed at once.
+
+    """
+    with open(birthday_file, 'r') as f:
+        for line_number, lines in read_chunks(f, chunk_size):
+            year, month, day, valid = parse_dates([l[:10] for l in lines])
+            # Minimum year for datetime.date is 1.
+            year[year == 0] = 1
+            valid &= day <= month_length(year, month)
+            keep = _check_valid(birthday_file, line_number, lines, valid)
+            _load_celebrations(cal, month[keep], day[keep],
+                    lambda k: Birthday(lines[keep[k]][:10],
+                        lines[keep[k]][11:].strip()),
+                    on_next_day=True)
+
+
+def load_namedays(cal: Calendar, nameday_file: str,
+        chunk_size: int = g_chunk_size):
+    """Add the included namedays of a file with format 'i,mm-dd,name'.
+
+    Parameters
+    ----------
+
+    - cal: calendar to fill.
+    - nameday_file: file name.
+    - chunk_size: number of lines parsed at once.
+
+    """
+    with open(nameday_file, 'r') as f:
+        for line_number, lines in read_chunks(f, chunk_size):
+            year, month, day, valid = parse_dates([l[2:7] for l in lines],
+                    with_year=False)
+            flags = np.array([l[:2] for l in lines])
+            valid &= (flags == '0,') | (flags == '1,')
+            keep = _check_valid(nameday_file, line_number, lines, valid)
+            keep = keep[flags[keep] == '1,']
+            _load_celebrations(cal, month[keep], day[keep],
+                    lambda k: Nameday(lines[keep[k]][2:7],
+                        lines[keep[k]][8:].strip()),
+                    on_next_day=False)
@@ -1,18 +1,22 @@
-# Options for inkscape's generator.py to generated pdf files.
-set(PDF_GENERATOR_OPTS --data-file=${DATA_FILE} --var-type=name --extra-vars=${EXTRA_REPLACEMENT} --format=pdf)
-
-# Options for inkscape's generator.py to generated svg files.
-set(SVG_GENERATOR_OPTS --data-file=${DATA_FILE} --var-type=name --extra-vars=${EXTRA_REPLACEMENT} --format=svg)
+# The target names end with ${TARGET_SUFFIX}, empty for a single edition and
+# "-<edition>" with generate_editions().
 
 function(generate_calendar)
 	# Entry-point to generate the calendar.
+
+	# Options for inkscape's generator.py to generated pdf files.
+	set(PDF_GENERATOR_OPTS --data-file=${DATA_FILE} --var-type=name --extra-vars=${EXTRA_REPLACEMENT} --format=pdf)
+
+	# Options for svgrender.py to generate svg files.
+	set(SVGRENDER_OPTS --data-file=${DATA_FILE} --extra-vars=${EXTRA_REPLACEMENT} --jobs=${RENDER_JOBS})
+
 	generate_list(pages ${FIRST_GEN_PAGE} ${LAST_GEN_PAGE} 1)
 
-	if(GENERATE_SVG)
-		add_inkscape_generator_svg(${page})
-		foreach(page IN LISTS pages)
-			add_one_generated_pdf_from_svg(${page})
-		endforeach()
+	if(PAGE_CACHE)
+		add_page_cache_pdf("${pages}")
+	elseif(GENERATE_SVG)
+		add_svgrender_svg(${FIRST_GEN_PAGE})
+		add_inkscape_pool_pdf("${pages}")
 	else()
 		add_inkscape_generator_pdf(${FIRST_GEN_PAGE} ${LAST_GEN_PAGE})
 		foreach(page IN LISTS pages)
@@ -23,6 +27,83 @@ function(generate_calendar)
 	assemble_pdf("${pages}" "${EXTRA_BEFORE}" "${EXTRA_AFTER}")
 endfunction()
 
+function(generate_editions)
+	# Entry-point to generate all editions in ${EDITIONS}.
+	# The data of all editions is generated by one call to ${GENERATE_CSV}, then
+	# each edition is generated in its own directory ${CMAKE_BINARY_DIR}/<edition>
+	# with its own targets, so that the editions are built in parallel with make -j.
+	set(editions_file ${CMAKE_BINARY_DIR}/editions.csv)
+	set(content "")
+	set(data_files "")
+	foreach(edition IN LISTS EDITIONS)
+		set(data_file ${CMAKE_BINARY_DIR}/${edition}/calendar_data.csv)
+		list(APPEND data_files ${data_file})
+		set(month_file "")
+		if(${edition}_MONTH_FILE)
+			set(month_file ${CMAKE_SOURCE_DIR}/${${edition}_MONTH_FILE})
+		endif()
+		set(nameday_file "")
+		if(${edition}_NAMEDAY_FILE)
+			set(nameday_file ${CMAKE_SOURCE_DIR}/${${edition}_NAMEDAY_FILE})
+		endif()
+		set(holiday_file "")
+		if(${edition}_HOLIDAY_FILE)
+			set(holiday_file ${CMAKE_SOURCE_DIR}/${${edition}_HOLIDAY_FILE})
+		endif()
+		set(weekday_file "")
+		if(${edition}_WEEKDAY_FILE)
+			set(weekday_file ${CMAKE_SOURCE_DIR}/${${edition}_WEEKDAY_FILE})
+		endif()
+		string(APPEND content "${data_file},${${edition}_FIRST_GEN_PAGE},${month_file},${nameday_file},${holiday_file},${weekday_file}\n")
+	endforeach()
+	# Only copied when changed, so that the data is not generated again.
+	file(WRITE ${editions_file}.tmp "${content}")
+	configure_file(${editions_file}.tmp ${editions_file} COPYONLY)
+
+	trace_prefix(trace generate_csv)
+	add_custom_command(OUTPUT ${data_files}
+		COMMAND ${trace} python3 ${GENERATE_CSV} ${DATA_OPTIONS} --editions-file=${editions_file} --jobs=${DATA_JOBS} ${YEAR}
+		DEPENDS ${editions_file} ${DATA_DEPENDS} ${GENERATE_CSV}
+		COMMENT "Generating the data of all editions"
+		VERBATIM
+	)
+
+	add_custom_target(generate-data
+		DEPENDS ${data_files}
+	)
+
+	foreach(edition IN LISTS EDITIONS)
+		set(EDITION ${edition})
+		set(SVG_EVEN ${${edition}_SVG_EVEN})
+		set(SVG_ODD ${${edition}_SVG_ODD})
+		set(FIRST_GEN_PAGE ${${edition}_FIRST_GEN_PAGE})
+		set(LAST_GEN_PAGE ${${edition}_LAST_GEN_PAGE})
+		set(EXTRA_BEFORE ${${edition}_EXTRA_BEFORE})
+		set(EXTRA_AFTER ${${edition}_EXTRA_AFTER})
+		set(OUTPUT_FILE ${${edition}_OUTPUT_FILE})
+		set(DATA_FILE ${CMAKE_BINARY_DIR}/${edition}/calendar_data.csv)
+		set(TARGET_SUFFIX -${edition})
+		set(DATA_TARGET generate-data)
+		add_subdirectory(${CMAKE_SOURCE_DIR}/cmake/edition ${CMAKE_BINARY_DIR}/${edition})
+	endforeach()
+endfunction()
+
+function(depend_on_data target)
+	# Make the target wait for ${DATA_TARGET}, which generates ${DATA_FILE} in another directory.
+	if(DATA_TARGET)
+		add_dependencies(${target} ${DATA_TARGET})
+	endif()
+endfunction()
+
+function(trace_prefix result_name span_name)
+	# Prefix of a command to record its duration to ${TRACE_FILE}, empty without TRACE_FILE.
+	if(TRACE_FILE)
+		set(${result_name} python3 ${TRACING} --trace-file=${TRACE_FILE} --name=${span_name} -- PARENT_SCOPE)
+	else()
+		set(${result_name} "" PARENT_SCOPE)
+	endif()
+endfunction()
+
 function(iseven result number)
 	# Result 1 if the number is even, 0 otherwise.
 	math(EXPR out "${number} % 2")
@@ -98,8 +179,9 @@ function(add_inkscape_generator_pdf first_page last_page)
 	set(template ${CMAKE_SOURCE_DIR}/${SVG_EVEN})
 	set(pdf_generator_template p%VAR_page_left%-gen.pdf)
 
+	trace_prefix(trace generator-even)
 	add_custom_command(OUTPUT ${file_list}
-		COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PYTHONPATH} python3 ${GENERATOR} ${PDF_GENERATOR_OPTS} --output-pattern=${pdf_generator_template} ${template}
+		COMMAND ${trace} ${CMAKE_COMMAND} -E env PYTHONPATH=${PYTHONPATH} python3 ${GENERATOR} ${PDF_GENERATOR_OPTS} --output-pattern=${pdf_generator_template} ${template}
 		# BYPRODUCTS file_list
 		MAIN_DEPENDENCY ${template} ${DATA_FILE}
 		DEPENDS ${template} ${DATA_FILE}
@@ -107,10 +189,11 @@ function(add_inkscape_generator_pdf first_page last_page)
 		VERBATIM
 	)
 
-	add_custom_target(generate-pdf-even
+	add_custom_target(generate-pdf-even${TARGET_SUFFIX}
 		ALL
 		DEPENDS ${template} ${DATA_FILE} ${file_list}
 	)
+	depend_on_data(generate-pdf-even${TARGET_SUFFIX})
 
 	# Odd pages (right).
 	first_odd(first ${first_page})
@@ -120,8 +203,9 @@ function(add_inkscape_generator_pdf first_page last_page)
 	set(template ${CMAKE_SOURCE_DIR}/${SVG_ODD})
 	set(pdf_generator_template p%VAR_page_right%-gen.pdf)
 
+	trace_prefix(trace generator-odd)
 	add_custom_command(OUTPUT ${file_list}
-		COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PYTHONPATH} python3 ${GENERATOR} ${PDF_GENERATOR_OPTS} --output-pattern=${pdf_generator_template} ${template}
+		COMMAND ${trace} ${CMAKE_COMMAND} -E env PYTHONPATH=${PYTHONPATH} python3 ${GENERATOR} ${PDF_GENERATOR_OPTS} --output-pattern=${pdf_generator_template} ${template}
 		# BYPRODUCTS file_list
 		MAIN_DEPENDENCY ${template} ${DATA_FILE}
 		DEPENDS ${template} ${DATA_FILE}
@@ -129,58 +213,67 @@ function(add_inkscape_generator_pdf first_page last_page)
 		VERBATIM
 	)
 
-	add_custom_target(generate-pdf-odd
+	add_custom_target(generate-pdf-odd${TARGET_SUFFIX}
 		DEPENDS ${template} ${DATA_FILE} ${file_list}
 	)
+	depend_on_data(generate-pdf-odd${TARGET_SUFFIX})
 
 	# All generated pdf.
-	add_custom_target(generate-pdf
-		DEPENDS generate-pdf-even generate-pdf-odd
+	add_custom_target(generate-pdf${TARGET_SUFFIX}
+		DEPENDS generate-pdf-even${TARGET_SUFFIX} generate-pdf-odd${TARGET_SUFFIX}
 	)
 
 endfunction()
 
-function(add_inkscape_generator_svg)
-	# Add the target to build the svg from inkscape_generator. This target is not built by default.
-
-	set(PYTHONPATH "${INKEX_PY_DIR}:$ENV{PYTHONPATH}")
+function(add_svgrender_svg first_page)
+	# Add the targets to build the svg with svgrender.py, which parses each template once.
 
 	# Even pages (left).
+	first_even(first ${first_page})
+	generate_list(pages ${first} ${LAST_GEN_PAGE} 2)
+	get_generated_file_list(file_list "${pages}" "p" "-gen.svg")
+
 	set(template ${CMAKE_SOURCE_DIR}/${SVG_EVEN})
 	set(svg_generator_template p%VAR_page_left%-gen.svg)
 
+	trace_prefix(trace svgrender-even)
 	add_custom_command(OUTPUT ${file_list}
-		COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PYTHONPATH} python3 ${GENERATOR} ${SVG_GENERATOR_OPTS} --output-pattern=${svg_generator_template} ${template}
+		COMMAND ${trace} python3 ${SVGRENDER} ${SVGRENDER_OPTS} --output-pattern=${svg_generator_template} ${template}
 		DEPENDS ${template} ${DATA_FILE}
-		COMMENT Generating generate-svg-even
+		COMMENT Generating even svg pages
 		VERBATIM
 	)
 
-	# add_custom_target(generate-svg-even
-	# 	ALL
-	# 	DEPENDS ${template} generate-svg-even.stamp
-	# )
+	add_custom_target(generate-svg-even${TARGET_SUFFIX}
+		DEPENDS ${file_list}
+	)
+	depend_on_data(generate-svg-even${TARGET_SUFFIX})
 
 	# Odd pages (right).
+	first_odd(first ${first_page})
+	generate_list(pages ${first} ${LAST_GEN_PAGE} 2)
+	get_generated_file_list(file_list "${pages}" "p" "-gen.svg")
+
 	set(template ${CMAKE_SOURCE_DIR}/${SVG_ODD})
 	set(svg_generator_template p%VAR_page_right%-gen.svg)
 
+	trace_prefix(trace svgrender-odd)
 	add_custom_command(OUTPUT ${file_list}
-		COMMAND ${CMAKE_COMMAND} -E env PYTHONPATH=${PYTHONPATH} python3 ${GENERATOR} ${SVG_GENERATOR_OPTS} --output-pattern=${svg_generator_template} ${template}
+		COMMAND ${trace} python3 ${SVGRENDER} ${SVGRENDER_OPTS} --output-pattern=${svg_generator_template} ${template}
 		DEPENDS ${template} ${DATA_FILE}
-		COMMENT Generating generate-svg-odd
+		COMMENT Generating odd svg pages
 		VERBATIM
 	)
 
-	# add_custom_target(generate-svg-odd
-	# 	ALL
-	# 	DEPENDS ${template} generate-svg-odd.stamp
-	# )
+	add_custom_target(generate-svg-odd${TARGET_SUFFIX}
+		DEPENDS ${file_list}
+	)
+	depend_on_data(generate-svg-odd${TARGET_SUFFIX})
 
 	# All generated svg.
-	add_custom_target(generate-svg
+	add_custom_target(generate-svg${TARGET_SUFFIX}
 		ALL
-		DEPENDS generate-svg-even generate-svg-odd
+		DEPENDS generate-svg-even${TARGET_SUFFIX} generate-svg-odd${TARGET_SUFFIX}
 	)
 endfunction()
 
@@ -202,29 +295,45 @@ function(add_one_generated_pdf page_name)
 	# endif()
 endfunction()
 
-function(add_one_generated_pdf_from_svg page_name)
-	# Add the targets to generate one pdf page through svg.
-	# These targets are not built by default.
-	prepend_zeros(${page_name} 3 formatted_page)
+function(add_inkscape_pool_pdf pages_name)
+	# Add the target to convert all generated svg to pdf with a pool of long-lived Inkscape processes.
+	get_generated_file_list(svg_list "${pages_name}" "p" "-gen.svg")
+	get_generated_file_list(pdf_list "${pages_name}" "p" "-gen.pdf")
 
-	# iseven(res ${page_name})
-	# if (${res})
-	# 	add_custom_target(generate-pdf-p${formatted_page}-from_svg
-	# 		ALL
-	# 		DEPENDS generate-svg-even.stamp generate-pdf-p${formatted_page}
-	# 	)
-	# else()
-	# 	add_custom_target(generate-pdf-p${formatted_page}-from_svg
-	# 		ALL
-	# 		DEPENDS generate-svg-odd.stamp generate-pdf-p${formatted_page}
-	# 	)
-	# endif()
+	trace_prefix(trace inkscape_pool)
+	add_custom_command(OUTPUT ${pdf_list}
+		COMMAND ${trace} python3 ${INKSCAPE_POOL} --jobs=${INKSCAPE_JOBS} ${svg_list}
+		DEPENDS ${svg_list}
+		COMMENT Converting svg pages to pdf
+		VERBATIM
+	)
 
-	add_custom_command(OUTPUT generate-pdf-p${formatted_page}
-		COMMAND inkscape --without-gui --file=${CMAKE_BINARY_DIR}/p${formatted_page}-gen.svg --export-pdf=${CMAKE_BINARY_DIR}/p${formatted_page}-gen.pdf
-		COMMENT Generating p${formatted_page}.pdf from svg
+	add_custom_target(generate-pdf${TARGET_SUFFIX}
+		ALL
+		DEPENDS ${pdf_list}
 	)
+	depend_on_data(generate-pdf${TARGET_SUFFIX})
+endfunction()
 
+function(add_page_cache_pdf pages_name)
+	# Add the target to generate the pdf pages with pagecache.py: only pages whose content changed are rendered.
+	get_generated_file_list(pdf_list "${pages_name}" "p" "-gen.pdf")
+	set(template_even ${CMAKE_SOURCE_DIR}/${SVG_EVEN})
+	set(template_odd ${CMAKE_SOURCE_DIR}/${SVG_ODD})
+
+	trace_prefix(trace pagecache)
+	add_custom_command(OUTPUT ${pdf_list}
+		COMMAND ${trace} python3 ${PAGE_CACHE_SCRIPT} --data-file=${DATA_FILE} --template-even=${template_even} --template-odd=${template_odd} --extra-vars=${EXTRA_REPLACEMENT} --cache-dir=${PAGE_CACHE_DIR} --max-size=${PAGE_CACHE_SIZE} --jobs=${INKSCAPE_JOBS}
+		DEPENDS ${template_even} ${template_odd} ${DATA_FILE}
+		COMMENT Updating the changed pages
+		VERBATIM
+	)
+
+	add_custom_target(generate-pdf${TARGET_SUFFIX}
+		ALL
+		DEPENDS ${pdf_list}
+	)
+	depend_on_data(generate-pdf${TARGET_SUFFIX})
 endfunction()
 
 function(get_generated_file_list result_name pages_name prefix_name suffix_name)
@@ -253,23 +362,20 @@ function(assemble_pdf pages_name extra_before_name extra_after_name)
 	prefix_build_dir(eb "${extra_before_name}")
 	prefix_build_dir(ea "${extra_after_name}")
 
-	add_custom_command(OUTPUT ${CMAKE_SOURCE_DIR}/${output_file_single_page}
-		COMMAND pdfjam --vanilla --rotateoversize false --quiet --outfile "${output_file_single_page}" ${extra_before_name} ${file_list} ${extra_after_name}
-		DEPENDS ${eb} ${file_list} ${ea}
-	)
-
-	add_custom_command(OUTPUT ${CMAKE_SOURCE_DIR}/${OUTPUT_FILE}
-		COMMAND pdfjam --booklet true --landscape --vanilla --rotateoversize false --quiet --outfile "${CMAKE_SOURCE_DIR}/${OUTPUT_FILE}" ${extra_before_name} ${file_list} ${extra_after_name}
-		DEPENDS ${eb} ${file_list} ${ea}
+	# Both files are written in one pass, each page being read once.
+	trace_prefix(trace impose)
+	add_custom_command(OUTPUT ${CMAKE_SOURCE_DIR}/${output_file_single_page} ${CMAKE_SOURCE_DIR}/${OUTPUT_FILE}
+		COMMAND ${trace} python3 ${IMPOSE} --single "${CMAKE_SOURCE_DIR}/${output_file_single_page}" --booklet "${CMAKE_SOURCE_DIR}/${OUTPUT_FILE}" ${eb} ${file_list} ${ea}
+		DEPENDS ${eb} ${file_list} ${ea} ${IMPOSE}
 	)
 
 	add_custom_target(${OUTPUT_FILE}-single_page
 		DEPENDS
-		generate-pdf ${CMAKE_SOURCE_DIR}/${output_file_single_page} ${eb} ${file_list} ${ea}
+		generate-pdf${TARGET_SUFFIX} ${CMAKE_SOURCE_DIR}/${output_file_single_page} ${eb} ${file_list} ${ea}
 	)
 
 	add_custom_target(${OUTPUT_FILE}-booklet
 		ALL
-		DEPENDS generate-pdf ${CMAKE_SOURCE_DIR}/${OUTPUT_FILE} ${eb} ${file_list} ${ea}
+		DEPENDS generate-pdf${TARGET_SUFFIX} ${CMAKE_SOURCE_DIR}/${OUTPUT_FILE} ${eb} ${file_list} ${ea}
 	)
 endfunction()
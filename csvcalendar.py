@@ -25,12 +25,16 @@
 #   line = "yyyy-mm-dd,holiday".
 #   with 0000 for unknown birthday year.
 
+import calendar
+import collections.abc
 import copy
+import csv
 import datetime
-from typing import Any,Dict,List,Union
+import io
+from typing import Any,Callable,Dict,Iterable,Iterator,List,Optional,Sequence,Set,TextIO,Tuple,Union
 import warnings
 
-__all__ = ['Calendar']
+__all__ = ['Calendar', 'RangeCalendar']
 
 g_months = [
         'January',
@@ -57,26 +61,63 @@ g_weekdays = [
         'sunday'
         ]
 
+# Names of the columns of a day, for a slot name such as 'monday'; the first
+# column is the day number, cf. `Day.fields`.
+g_day_columns = ('{}', 'birthdays_{}', 'namedays_{}', 'events_{}', 'moon_{}',
+        'holiday_{}')
+
+# Names of the columns of a week before the columns of its days, cf.
+# `Week.fields`.
+g_week_columns = ('code', 'number', 'page_left', 'page_right', 'month')
 
-def str_for_csv(l: Any, join: str = ', '):
-    """Add double quotes (and join if list).
+
+class CsvDialect(csv.excel):
+    """Dialect of the generated csv data.
+
+    Numbers are written as is, all other fields are double-quoted and the
+    double quotes they contain are doubled.
+
+    """
+    quoting = csv.QUOTE_NONNUMERIC
+    lineterminator = '\n'
+
+
+def str_for_field(l: Any, join: str = ', ') -> str:
+    """Return the string of a csv field (join if list).
 
     Parameters
     ----------
 
-    - l: Object with member __str__.
+    - l: Object with member __str__, or a list or tuple of such objects.
     - join: joining string.
 
     """
     if l is None:
-        return '""'
-    elif isinstance(l, list):
-        return '"' + join.join([str(v) for v in l]) + '"'
+        return ''
+    elif isinstance(l, (list, tuple)):
+        return join.join([str(v) for v in l])
     else:
-        return '"' + str(l) + '"'
+        return str(l)
+
+
+def str_for_csv(l: Any, join: str = ', '):
+    """Add double quotes (and join if list).
+
+    Double quotes inside the string are doubled.
+
+    Parameters
+    ----------
+
+    - l: Object with member __str__, or a list or tuple of such objects.
+    - join: joining string.
+
+    """
+    return '"' + str_for_field(l, join).replace('"', '""') + '"'
 
 
 class Event:
+    __slots__ = ('year', 'month', 'day', 'name')
+
     def __init__(self, datestr: str, name: str):
         """
         Parameters
@@ -99,8 +140,36 @@ class Event:
         return self.name
 
 
-# TODO: handle 02-29
+def yearly_dates(month: int, day: int,
+        first_day: datetime.date, last_day: datetime.date,
+        on_next_day: bool = False) -> Iterator[datetime.date]:
+    """Yield the dates in [first_day, last_day] with the given month and day.
+
+    Parameters
+    ----------
+
+    - month: month, 1 to 12.
+    - day: day of the month.
+    - first_day, last_day: range of dates, included.
+    - on_next_day: if True, a day that doesn't exist in a year (Feb. 29th)
+        is moved to the first day of the next month, otherwise it is
+        skipped.
+
+    """
+    for year in range(first_day.year, last_day.year + 1):
+        if day <= calendar.monthrange(year, month)[1]:
+            date = datetime.date(year, month, day)
+        elif on_next_day and month < 12:
+            date = datetime.date(year, month + 1, 1)
+        else:
+            continue
+        if first_day <= date <= last_day:
+            yield date
+
+
 class Birthday:
+    __slots__ = ('year', 'month', 'day', 'date', 'name')
+
     def __init__(self, datestr: str, name: str):
         """
         Parameters
@@ -118,36 +187,41 @@ class Birthday:
         self.day = int(datestr[8:10])
         self.date = datetime.date(self.year, self.month, self.day)
         self.name = name
-        # True whether the celebration must be on the next day (for birthdays
-        # on Feb. 29th).
-        self.on_next_day = False
 
-        self.celebration_year = datetime.date.today().year
+    def celebrations(self,
+            first_day: datetime.date,
+            last_day: datetime.date) -> Iterator['Celebration']:
+        """Yield the celebrations in [first_day, last_day].
 
-    @property
-    def celebration_date(self):
-        try:
-            date = datetime.date(self.celebration_year, self.month, self.day)
-        except ValueError:
-            self.on_next_day = True
-            return datetime.date(self.celebration_year, 3, 1)
-        return date
+        Birthdays on Feb. 29th are celebrated on March 1st in non-leap years.
 
-    def __str__(self):
+        """
+        for date in yearly_dates(self.month, self.day, first_day, last_day,
+                on_next_day=True):
+            yield Celebration(self, date)
+
+    def label(self, celebration_date: datetime.date) -> str:
+        """Return the text for the celebration at the given date."""
         comment = ''
         join_str = ''
         if self.year != 1:
-            comment += str(self.celebration_year - self.year)
+            comment += str(celebration_date.year - self.year)
             join_str = ', '
-        if self.on_next_day:
+        if celebration_date.day != self.day:
+            # Birthday on Feb. 29th celebrated on the next day.
             comment += join_str + '02-29'
         if comment:
             return self.name + ' (' + comment + ')'
         else:
             return self.name
 
+    def __str__(self):
+        return self.name
+
 
 class Nameday:
+    __slots__ = ('month', 'day', 'name')
+
     def __init__(self, datestr: str, name: str):
         """
         Parameters
@@ -161,78 +235,174 @@ class Nameday:
         self.day = int(datestr[3:5])
         self.name = name
 
-        self.celebration_year = datetime.date.today().year
+    def celebrations(self,
+            first_day: datetime.date,
+            last_day: datetime.date) -> Iterator['Celebration']:
+        """Yield the celebrations in [first_day, last_day]."""
+        for date in yearly_dates(self.month, self.day, first_day, last_day):
+            yield Celebration(self, date)
 
-    @property
-    def celebration_date(self):
-        return datetime.date(self.celebration_year, self.month, self.day)
+    def label(self, celebration_date: datetime.date) -> str:
+        """Return the text for the celebration at the given date."""
+        return self.name
 
     def __str__(self):
         return self.name
 
 
+class Celebration:
+    """One occurrence of a Birthday or a Nameday.
+
+    The occurrences of a birthday share the Birthday object, only the
+    celebration date differs.
+
+    """
+    __slots__ = ('source', 'celebration_date')
+
+    def __init__(self,
+            source: Union[Birthday,Nameday],
+            celebration_date: datetime.date):
+        self.source = source
+        self.celebration_date = celebration_date
+
+    @property
+    def name(self) -> str:
+        return self.source.name
+
+    def __str__(self):
+        return self.source.label(self.celebration_date)
+
+
 class Day:
+    # `birthdays`, `namedays` and `events` are the shared empty tuple until
+    # the first item is added, most days never get any.
+    __slots__ = ('date', 'birthdays', 'namedays', 'events', '_moon',
+            '_holiday')
+
     def __init__(self, date: datetime.date):
         self.date = date
-        self.year = date.year
-        self.month = date.month
-        self.day = date.day
-        self.birthdays: List[Birthday] = []
-        self.namedays: List[Nameday] = []
-        self.events: List[Event] = []
-        self.moon = None
-        self.holiday = None
+        self.birthdays: Sequence[Celebration] = ()
+        self.namedays: Sequence[Celebration] = ()
+        self.events: Sequence[Event] = ()
+        self._moon = None
+        self._holiday = None
+
+    def copy(self) -> 'Day':
+        """Return a copy with its own lists, sharing the items."""
+        day = Day.__new__(Day)
+        day.date = self.date
+        day.birthdays = list(self.birthdays) if self.birthdays else ()
+        day.namedays = list(self.namedays) if self.namedays else ()
+        day.events = list(self.events) if self.events else ()
+        day._moon = self._moon
+        day._holiday = self._holiday
+        return day
+
+    @property
+    def year(self) -> int:
+        return self.date.year
+
+    @property
+    def month(self) -> int:
+        return self.date.month
+
+    @property
+    def day(self) -> int:
+        return self.date.day
 
     @property
     def holiday(self):
-        return self.__dict__['holiday']
+        return self._holiday
 
     @holiday.setter
     def holiday(self, value: Event):
-        if (value is not None) and not self.valid_date(value):
+        self.set_holiday(value)
+
+    def set_holiday(self, value: Event, check: bool = True):
+        """Set the holiday, `check` whether it is at the date of the day."""
+        if check and (value is not None) and not self.valid_date(value):
             warnings.warn('Holiday not at the correct date, ignoring')
-        self.__dict__['holiday'] = value
+        self._holiday = value
 
     @property
     def moon(self):
-        return self.__dict__['moon']
+        return self._moon
 
     @moon.setter
     def moon(self, value: Event):
-        if (value is not None) and (not self.valid_date(value)):
+        self.set_moon(value)
+
+    def set_moon(self, value: Event, check: bool = True):
+        """Set the moon phase, `check` whether it is at the date of the day."""
+        if check and (value is not None) and (not self.valid_date(value)):
             warnings.warn('Moon not at the correct date, ignoring')
-        self.__dict__['moon'] = value
-
-    def valid_date(self, event: Union[Birthday,Event,Nameday]):
-        if (hasattr(event, 'year') and (event.year != 1) and
-                (event.celebration_date.year != self.date.year)):
-            return False
-        if event.month != self.date.month:
-            return False
-        if event.day != self.date.day:
-            return False
-        return True
-
-    def add_birthday(self, birthday: Birthday):
-        if self.valid_date(birthday):
+        self._moon = value
+
+    def valid_date(self, event: Union[Celebration,Event]):
+        return event.celebration_date == self.date
+
+    def fields(self) -> Tuple[Union[int,str], ...]:
+        """Return the csv fields of this day, cf. `g_day_columns`."""
+        return (self.date.day,
+                str_for_field(self.birthdays),
+                str_for_field(self.namedays),
+                str_for_field(self.events),
+                str_for_field(self._moon),
+                str_for_field(self._holiday))
+
+    @staticmethod
+    def field_getters() -> Tuple[Callable[['Day'], Union[int,str]], ...]:
+        """Return the functions computing each field of `fields`.
+
+        To compute only some of the fields, cf. `g_day_columns`.
+
+        """
+        return _day_field_getters
+
+    def add_birthday(self, birthday: Celebration, check: bool = True):
+        """Add a birthday, `check` whether it is at the date of the day."""
+        if check and not self.valid_date(birthday):
+            warnings.warn('Birthday not at the correct date, ignoring')
+            return
+        if self.birthdays:
             self.birthdays.append(birthday)
         else:
-            warnings.warn('Birthday not at the correct date, ignoring')
+            self.birthdays = [birthday]
 
-    def add_nameday(self, nameday: Nameday):
-        if self.valid_date(nameday):
+    def add_nameday(self, nameday: Celebration, check: bool = True):
+        """Add a nameday, `check` whether it is at the date of the day."""
+        if check and not self.valid_date(nameday):
+            warnings.warn('Nameday not at the correct date, ignoring')
+            return
+        if self.namedays:
             self.namedays.append(nameday)
         else:
-            warnings.warn('Nameday not at the correct date, ignoring')
+            self.namedays = [nameday]
 
-    def add_event(self, event: Event):
-        if self.valid_date(event):
+    def add_event(self, event: Event, check: bool = True):
+        """Add an event, `check` whether it is at the date of the day."""
+        if check and not self.valid_date(event):
+            warnings.warn('Event not at the correct date, ignoring')
+            return
+        if self.events:
             self.events.append(event)
         else:
-            warnings.warn('Event not at the correct date, ignoring')
+            self.events = [event]
+
+
+_day_field_getters = (
+        lambda day: day.date.day,
+        lambda day: str_for_field(day.birthdays),
+        lambda day: str_for_field(day.namedays),
+        lambda day: str_for_field(day.events),
+        lambda day: str_for_field(day._moon),
+        lambda day: str_for_field(day._holiday),
+        )
 
 
 class Week:
+    __slots__ = ('_monday', '_months', '_left_page', '_right_page', 'days')
+
     def __init__(self,
             monday: datetime.date,
             left_page: int,
@@ -249,43 +419,68 @@ class Week:
         self._months = months
         self._left_page = left_page
         self._right_page = left_page + 1
-        self.days: List[datetime.date] = []
-        for delta in range(7):
-            self.days.append(Day(monday + datetime.timedelta(delta)))
+        ordinal = monday.toordinal()
+        self.days: List[Day] = [Day(datetime.date.fromordinal(ordinal + delta))
+                for delta in range(7)]
+
+    def copy(self) -> 'Week':
+        """Return a copy with its own days, sharing the day items."""
+        week = Week.__new__(Week)
+        week._monday = self._monday
+        week._months = self._months
+        week._left_page = self._left_page
+        week._right_page = self._right_page
+        week.days = [d.copy() for d in self.days]
+        return week
+
+    def relabel(self, left_page: int, months: List[str]) -> 'Week':
+        """Return a week with other pages and months, sharing the days.
+
+        The days are shared, the returned week must be copied before being
+        modified (cf. `Calendar.week_for_update`).
+
+        """
+        week = Week.__new__(Week)
+        week._monday = self._monday
+        week._months = months
+        week._left_page = left_page
+        week._right_page = left_page + 1
+        week.days = self.days
+        return week
 
     def __str__(self):
-        # This must correspond to the content of self.header.
-        days_data: List[str] = []
-        for day in self.days:
-            days_data.append(day.day)
-            days_data.append(str_for_csv(day.birthdays))
-            days_data.append(str_for_csv(day.namedays))
-            days_data.append(str_for_csv(day.events))
-            days_data.append(str_for_csv(day.moon))
-            days_data.append(str_for_csv(day.holiday))
-
-        data = [self.code, self.number,
+        stream = io.StringIO()
+        csv.writer(stream, CsvDialect).writerow(self.row())
+        return stream.getvalue()[:-1]
+
+    def fields(self) -> List[Union[int,str]]:
+        """Return the csv fields of this week without its days.
+
+        Cf. `g_week_columns`.
+
+        """
+        return [self.code, self.number,
                 '{:03}'.format(self._left_page),
                 '{:03}'.format(self._right_page),
                 self.month_str]
-        data += days_data
-        return ','.join([str(d) for d in data])
+
+    def row(self) -> List[Union[int,str]]:
+        """Return the csv fields of this week."""
+        # This must correspond to the content of self.header_row().
+        data = self.fields()
+        for day in self.days:
+            data.extend(day.fields())
+        return data
+
+    @staticmethod
+    def header_row() -> List[str]:
+        """Return the csv column names."""
+        return list(_week_header)
 
     @property
     def header(self):
         """Return the csv header line"""
-        # This must correspond to the content of self.__str___.
-        header = ['"code"', '"number"', '"page_left"', '"page_right"',
-                '"month"']
-        for d in range(7):
-            header.append(str_for_csv(g_weekdays[d]))
-            header.append(str_for_csv('birthdays_' + g_weekdays[d]))
-            header.append(str_for_csv('namedays_' + g_weekdays[d]))
-            header.append(str_for_csv('events_' + g_weekdays[d]))
-            header.append(str_for_csv('moon_' + g_weekdays[d]))
-            header.append(str_for_csv('holiday_' + g_weekdays[d]))
-        header_str = ','.join(header)
-        return header_str
+        return ','.join([str_for_csv(h) for h in self.header_row()])
 
     @property
     def month_str(self) -> str:
@@ -340,11 +535,11 @@ class Week:
         """Return e.g. 2022-04 for the 4th week in 2022."""
         return '{}-{:02}'.format(self.monday.year, self._monday.isocalendar()[1])
 
-    def add_birthday(self, birthday: Birthday):
+    def add_birthday(self, birthday: Celebration):
         delta = (birthday.celebration_date - self._monday).days
         self.days[delta].add_birthday(birthday)
 
-    def add_nameday(self, nameday: Nameday):
+    def add_nameday(self, nameday: Celebration):
         delta = (nameday.celebration_date - self._monday).days
         self.days[delta].add_nameday(nameday)
 
@@ -361,6 +556,11 @@ class Week:
         self.days[delta].holiday = holiday
 
 
+# Column names of `Week.row`, computed once.
+_week_header = tuple(list(g_week_columns)
+        + [c.format(weekday) for weekday in g_weekdays for c in g_day_columns])
+
+
 class Calendar:
     def __init__(self,
             year: int,
@@ -380,16 +580,48 @@ class Calendar:
         """
         self.year = year
         if months is None:
-            self.months = g_months
+            months = g_months
         self.months = months
+        # Whether the input was validated (cf. validate.py), the items are
+        # then added without checking their date.
+        self.trusted = False
+        self.start_page = start_page
         self.init_weeks(year, extra_weeks, start_page)
 
     def __str__(self):
+        stream = io.StringIO()
+        self.write_csv(stream)
+        return stream.getvalue()[:-1]
+
+    def iter_rows(self, header: bool = True) -> Iterator[List[Union[int,str]]]:
+        """Yield the csv rows, one per week.
+
+        Parameters
+        ----------
+
+        - header: whether to yield the column names first.
+
+        """
         if not self.weeks:
-            return ''
-        header_str = self.weeks[0].header + '\n'
+            return
+        if header:
+            yield Week.header_row()
+        for week in self.weeks:
+            yield week.row()
+
+    def write_csv(self, stream: TextIO, header: bool = True):
+        """Write the csv data to `stream`, one week at a time.
 
-        return header_str + '\n'.join([str(w) for w in self.weeks])
+        Parameters
+        ----------
+
+        - stream: text stream, opened with newline='' if it is a file.
+        - header: whether to write the column names first.
+
+        """
+        writer = csv.writer(stream, CsvDialect)
+        for row in self.iter_rows(header):
+            writer.writerow(row)
 
     def init_weeks(self, year: int, extra_weeks: int, start_page: int):
         first_january = datetime.date(year, 1, 1)
@@ -400,17 +632,90 @@ class Calendar:
         # `last_day` is the Sunday in the same week as `last_december`.
         self.last_day = last_december + datetime.timedelta(
                 -last_december.weekday() + 7 * (extra_weeks + 1) - 1)
-        self.weeks: List[Week] = []
-        self.week_of_day: Dict[datetime.date,Week] = {}
-        day = copy.copy(self.first_day)
-        left_page = copy.copy(start_page)
-        while day < self.last_day:
-            week = Week(day, left_page, self.months)
-            self.weeks.append(week)
-            for delta in range(7):
-                self.week_of_day[day + datetime.timedelta(delta)] = week
-            day += datetime.timedelta(7)
-            left_page += 2
+        # Days are addressed by their offset from `first_day`, the week of the
+        # day at offset `o` is `self.weeks[o // 7]`.
+        self._day_count = (self.last_day - self.first_day).days + 1
+        self.weeks: List[Week] = [
+                Week(self.first_day + datetime.timedelta(7 * i),
+                    start_page + 2 * i,
+                    self.months)
+                for i in range(self._day_count // 7)]
+        # For overlays, `_shared_weeks[i]` is 1 while `self.weeks[i]` is still
+        # shared with the base calendar. None for a calendar owning all weeks.
+        self._shared_weeks: Optional[bytearray] = None
+
+    def overlay(self,
+            start_page: Optional[int] = None,
+            months: Optional[List[str]] = None) -> 'Calendar':
+        """Return a calendar sharing the weeks of this one.
+
+        Weeks are copied on the first write to the overlay, so that the
+        overlay can be filled without modifying this calendar nor
+        deep-copying it.
+        This calendar must not be modified while its overlays are in use.
+
+        Parameters
+        ----------
+
+        - start_page: page of the first week of the overlay, default to the
+            one of this calendar, e.g. for another edition of the book.
+        - months: list of months of the overlay, default to the ones of this
+            calendar.
+
+        """
+        cal = copy.copy(self)
+        if start_page is None and months is None:
+            cal.weeks = list(self.weeks)
+        else:
+            cal._relabel(start_page, months)
+            cal.weeks = [w.relabel(cal.start_page + 2 * i, cal.months)
+                    for i, w in enumerate(self.weeks)]
+        cal._shared_weeks = bytearray(b'\x01') * len(self.weeks)
+        return cal
+
+    def _relabel(self, start_page: Optional[int],
+            months: Optional[List[str]]):
+        if start_page is not None:
+            self.start_page = start_page
+        if months is not None:
+            self.months = months
+
+    def day_offset(self, date: datetime.date) -> int:
+        """Return the offset of `date` from `self.first_day`, in days."""
+        return (date - self.first_day).days
+
+    def day_at(self, offset: int) -> Optional[Day]:
+        """Return the Day at `offset` from `self.first_day`, or None."""
+        if 0 <= offset < self._day_count:
+            return self.weeks[offset // 7].days[offset % 7]
+        return None
+
+    def day(self, date: datetime.date) -> Optional[Day]:
+        """Return the Day at `date` or None if not in the calendar."""
+        return self.day_at(self.day_offset(date))
+
+    @property
+    def day_count(self) -> int:
+        """Number of days, from `first_day` to `last_day` included."""
+        return self._day_count
+
+    def week_for_update(self, index: int) -> Week:
+        """Return the week at `index` to be modified.
+
+        The week is copied first if it is shared with a base calendar.
+
+        """
+        if self._shared_weeks is not None and self._shared_weeks[index]:
+            self.weeks[index] = self.weeks[index].copy()
+            self._shared_weeks[index] = 0
+        return self.weeks[index]
+
+    def _day_for_update(self, date: datetime.date) -> Optional[Day]:
+        """Return the Day at `date`, copying its week if shared, or None."""
+        offset = self.day_offset(date)
+        if not 0 <= offset < self._day_count:
+            return None
+        return self.week_for_update(offset // 7).days[offset % 7]
 
     def add_birthday(self, datestr: str, name: str):
         """
@@ -424,16 +729,22 @@ class Calendar:
 
         """
         birthday = Birthday(datestr, name)
-        birthday.celebration_year = self.year - 1
-        if birthday.celebration_date in self.week_of_day:
-            self.week_of_day[birthday.celebration_date].add_birthday(birthday)
-        birthday = copy.deepcopy(birthday)
-        birthday.celebration_year = self.year
-        self.week_of_day[birthday.celebration_date].add_birthday(birthday)
-        birthday = copy.deepcopy(birthday)
-        birthday.celebration_year = self.year + 1
-        if birthday.celebration_date in self.week_of_day:
-            self.week_of_day[birthday.celebration_date].add_birthday(birthday)
+        check = not self.trusted
+        for celebration in birthday.celebrations(self.first_day, self.last_day):
+            self._day_for_update(celebration.celebration_date).add_birthday(
+                    celebration, check)
+
+    def add_birthdays(self, birthdays: Iterable[Tuple[str, str]]):
+        """Add several birthdays.
+
+        Parameters
+        ----------
+
+        - birthdays: iterable of (datestr, name), cf. `add_birthday`.
+
+        """
+        for datestr, name in birthdays:
+            self.add_birthday(datestr, name)
 
     def add_nameday(self, datestr: str, name: str):
         """
@@ -446,25 +757,22 @@ class Calendar:
 
         """
         nameday = Nameday(datestr, name)
-        nameday.celebration_year = self.year - 1
-        try:
-            if nameday.celebration_date in self.week_of_day:
-                self.week_of_day[nameday.celebration_date].add_nameday(nameday)
-        except ValueError:
-            pass
-        nameday = copy.deepcopy(nameday)
-        nameday.celebration_year = self.year
-        try:
-            self.week_of_day[nameday.celebration_date].add_nameday(nameday)
-        except ValueError:
-            pass
-        nameday = copy.deepcopy(nameday)
-        nameday.celebration_year = self.year + 1
-        try:
-            if nameday.celebration_date in self.week_of_day:
-                self.week_of_day[nameday.celebration_date].add_nameday(nameday)
-        except ValueError:
-            pass
+        check = not self.trusted
+        for celebration in nameday.celebrations(self.first_day, self.last_day):
+            self._day_for_update(celebration.celebration_date).add_nameday(
+                    celebration, check)
+
+    def add_namedays(self, namedays: Iterable[Tuple[str, str]]):
+        """Add several namedays.
+
+        Parameters
+        ----------
+
+        - namedays: iterable of (datestr, name), cf. `add_nameday`.
+
+        """
+        for datestr, name in namedays:
+            self.add_nameday(datestr, name)
 
     def add_event(self, datestr: str, name: str):
         """
@@ -477,8 +785,9 @@ class Calendar:
 
         """
         event = Event(datestr, name)
-        if event.celebration_date in self.week_of_day:
-            self.week_of_day[event.celebration_date].add_event(event)
+        day = self._day_for_update(event.celebration_date)
+        if day is not None:
+            day.add_event(event, not self.trusted)
 
     def set_moon(self, datestr: str, phase: str):
         """
@@ -491,8 +800,9 @@ class Calendar:
 
         """
         moon = Event(datestr, phase)
-        if moon.celebration_date in self.week_of_day:
-            self.week_of_day[moon.celebration_date].add_moon(moon)
+        day = self._day_for_update(moon.celebration_date)
+        if day is not None:
+            day.set_moon(moon, not self.trusted)
 
     def set_holiday(self, datestr: str, name: str):
         """
@@ -505,6 +815,126 @@ class Calendar:
 
         """
         holiday = Event(datestr, name)
-        if holiday.celebration_date in self.week_of_day:
-            self.week_of_day[holiday.celebration_date].add_holiday(holiday)
+        day = self._day_for_update(holiday.celebration_date)
+        if day is not None:
+            day.set_holiday(holiday, not self.trusted)
+
+
+class _LazyWeeks(collections.abc.Sequence):
+    """The weeks of a RangeCalendar, created on access if not stored."""
+
+    __slots__ = ('_cal',)
+
+    def __init__(self, cal: 'RangeCalendar'):
+        self._cal = cal
+
+    def __len__(self) -> int:
+        return self._cal.day_count // 7
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('week index out of range')
+        return self._cal.week_at(index)
+
+
+class RangeCalendar(Calendar):
+    """A calendar over an arbitrary range of dates, e.g. 18 months.
+
+    Weeks are only created when data is added to them. The other weeks are
+    created when they are read (e.g. to write a row) and not stored, so that
+    memory and start-up time depend on the data, not on the range.
+    The page numbers are computed from the week index.
+
+    """
+
+    def __init__(self,
+            first_date: datetime.date,
+            last_date: datetime.date,
+            start_page: int = 2,
+            months: List[str] = g_months):
+        """
+
+        Parameters
+        ----------
+
+        - first_date, last_date: range of the calendar, extended to whole
+            weeks.
+        - start_page: page of the first week.
+        - months: list of months.
 
+        """
+        if last_date < first_date:
+            raise ValueError('The last date must not be before the first one')
+        self.year = first_date.year
+        if months is None:
+            months = g_months
+        self.months = months
+        self.trusted = False
+        self.start_page = start_page
+        # `first_day` is the Monday in the same week as `first_date`,
+        # `last_day` the Sunday in the same week as `last_date`.
+        self.first_day = first_date - datetime.timedelta(first_date.weekday())
+        self.last_day = last_date + datetime.timedelta(6 - last_date.weekday())
+        self._day_count = (self.last_day - self.first_day).days + 1
+        # Week index: Week, for the weeks with data.
+        self._weeks: Dict[int, Week] = {}
+        # For overlays, indices of the weeks in `_weeks` still shared with the
+        # base calendar. None for a calendar owning all weeks.
+        self._shared_weeks: Optional[Set[int]] = None
+        self.weeks = _LazyWeeks(self)
+
+    @property
+    def stored_week_count(self) -> int:
+        """Number of weeks created because they have data."""
+        return len(self._weeks)
+
+    def _new_week(self, index: int) -> Week:
+        return Week(self.first_day + datetime.timedelta(7 * index),
+                self.start_page + 2 * index,
+                self.months)
+
+    def week_at(self, index: int) -> Week:
+        """Return the week at `index`, an empty one if it has no data.
+
+        An empty week is not stored, changes to it are lost.
+
+        """
+        week = self._weeks.get(index)
+        if week is None:
+            week = self._new_week(index)
+        return week
+
+    def week_for_update(self, index: int) -> Week:
+        """Return the week at `index` to be modified, stored in the calendar.
+
+        The week is copied first if it is shared with a base calendar.
+
+        """
+        week = self._weeks.get(index)
+        if week is None:
+            week = self._new_week(index)
+            self._weeks[index] = week
+        elif self._shared_weeks is not None and index in self._shared_weeks:
+            week = week.copy()
+            self._weeks[index] = week
+            self._shared_weeks.discard(index)
+        return week
+
+    def overlay(self,
+            start_page: Optional[int] = None,
+            months: Optional[List[str]] = None) -> 'RangeCalendar':
+        """Return a calendar sharing the weeks of this one, cf. Calendar."""
+        cal = copy.copy(self)
+        if start_page is None and months is None:
+            cal._weeks = dict(self._weeks)
+        else:
+            cal._relabel(start_page, months)
+            cal._weeks = {i: w.relabel(cal.start_page + 2 * i, cal.months)
+                    for i, w in self._weeks.items()}
+        cal._shared_weeks = set(self._weeks)
+        cal.weeks = _LazyWeeks(cal)
+        return cal
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# Binary pack of the static input files of generate_csv.py (month names,
+# namedays, holidays and moon phases), read through mmap.
+#
+# The files are parsed once when the pack is compiled, the pack is compiled
+# again when one of them is modified (`open_pack`). Each file is a section of
+# records (key, offset, length) sorted by key, pointing to the UTF-8 names:
+#
+# - months: key = month index, 0 to 11.
+# - namedays: key = day of the year in a leap year, 0 to 365 (only the
+#   included namedays are stored).
+# - holiday, moon: key = proleptic Gregorian ordinal of the date.
+#
+# The records are searched in place in the mapped file, only the names of
+# the found records are decoded.
+#
+# Layout, little endian:
+#
+# - magic b'CAGEPACK', version (u32), length of the header (u32).
+# - header: JSON with the sources (kind, path, size, mtime_ns, offset of
+#   their records, record count) and the offset of the names.
+# - records: 3 u32 per record.
+# - names.
+
+import bisect
+import datetime
+import json
+import mmap
+import os
+from optparse import OptionParser
+import struct
+import sys
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+__all__ = [
+        'DataPack',
+        'compile_pack',
+        'open_pack',
+        ]
+
+g_magic = b'CAGEPACK'
+g_version = 1
+
+g_kinds = ('months', 'namedays', 'holiday', 'moon')
+
+_prefix = struct.Struct('<8sII')
+_record = struct.Struct('<III')
+
+# 'mm-dd' of the days of a leap year, by day of the year.
+_leap_days = [(datetime.date(2000, 1, 1) + datetime.timedelta(i)).strftime(
+    '%m-%d') for i in range(366)]
+_leap_day_index = {mmdd: i for i, mmdd in enumerate(_leap_days)}
+
+
+def _file_id(filename: str) -> Dict[str, Any]:
+    stat = os.stat(filename)
+    return {'path': os.path.abspath(filename), 'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns}
+
+
+def _wrong_format(filename: str, line_number: int) -> ValueError:
+    return ValueError('{}:{}: wrong file format, see --help for details'.format(
+        filename, line_number))
+
+
+def _parse(kind: str, filename: str) -> List[Tuple[int, str]]:
+    """Return the (key, name) of a file, in file order."""
+    items = []
+    with open(filename, 'r') as f:
+        lines = f.readlines()
+    if kind == 'months':
+        if len(lines) != 12:
+            raise ValueError('Error in month file')
+        return [(i, l.strip()) for i, l in enumerate(lines)]
+    for line_number, l in enumerate(lines, 1):
+        try:
+            if kind == 'namedays':
+                if l[:2] not in ('0,', '1,'):
+                    raise ValueError
+                key = _leap_day_index[l[2:7]]
+                if l[0] == '0':
+                    continue
+                items.append((key, l[8:].strip()))
+            else:
+                date = datetime.date.fromisoformat(l[:10])
+                items.append((date.toordinal(), l[11:].strip()))
+        except (ValueError, KeyError):
+            raise _wrong_format(filename, line_number) from None
+    return items
+
+
+def compile_pack(pack_file: str, sources: Sequence[Tuple[str, str]]):
+    """Parse the source files and write the pack.
+
+    The pack is written to a temporary file first, then renamed, so that a
+    pack being read is never modified.
+
+    Parameters
+    ----------
+
+    - pack_file: output file.
+    - sources: (kind, filename), kind in `g_kinds`.
+
+    """
+    header: Dict[str, Any] = {'sources': []}
+    records = bytearray()
+    names = bytearray()
+    for kind, filename in sources:
+        if kind not in g_kinds:
+            raise ValueError('Unknown kind {}'.format(kind))
+        source = _file_id(filename)
+        items = _parse(kind, filename)
+        # The order of the file is kept for equal keys, the last holiday of
+        # a day replaces the previous ones.
+        items.sort(key=lambda item: item[0])
+        source.update(kind=kind, offset=len(records), count=len(items))
+        for key, name in items:
+            encoded = name.encode('utf-8')
+            records += _record.pack(key, len(names), len(encoded))
+            names += encoded
+        header['sources'].append(source)
+    header['records'] = len(records)
+    encoded_header = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    # Records aligned on 4 bytes.
+    encoded_header += b' ' * (-(_prefix.size + len(encoded_header)) % 4)
+    tmp_file = '{}.{}.tmp'.format(pack_file, os.getpid())
+    with open(tmp_file, 'wb') as f:
+        f.write(_prefix.pack(g_magic, g_version, len(encoded_header)))
+        f.write(encoded_header)
+        f.write(records)
+        f.write(names)
+    os.replace(tmp_file, pack_file)
+
+
+class DataPack:
+    """A compiled pack, mapped in memory."""
+
+    def __init__(self, pack_file: str):
+        """
+        Raise ValueError if the file is not a pack of the current version.
+
+        Parameters
+        ----------
+
+        - pack_file: file written by `compile_pack`.
+
+        """
+        self.pack_file = pack_file
+        with open(pack_file, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, header_length = _prefix.unpack_from(self._map)
+            if magic != g_magic or version != g_version:
+                raise ValueError('{} is not a data pack of version {}'.format(
+                    pack_file, g_version))
+            start = _prefix.size
+            header = json.loads(self._map[start:start + header_length])
+        except (struct.error, ValueError):
+            self._map.close()
+            raise ValueError('{} is not a data pack of version {}'.format(
+                pack_file, g_version)) from None
+        start += header_length
+        view = memoryview(self._map)
+        self._records = view[start:start + header['records']].cast('I')
+        self._names = view[start + header['records']:]
+        # Absolute path: source.
+        self.sources: Dict[str, Dict[str, Any]] = {
+                s['path']: s for s in header['sources']}
+
+    def close(self):
+        self._records.release()
+        self._names.release()
+        self._map.close()
+
+    def __enter__(self) -> 'DataPack':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def is_fresh(self, filename: str) -> bool:
+        """Return whether `filename` is in the pack and was not modified."""
+        source = self.sources.get(os.path.abspath(filename))
+        if source is None:
+            return False
+        try:
+            file_id = _file_id(filename)
+        except OSError:
+            return False
+        return (source['size'] == file_id['size']
+                and source['mtime_ns'] == file_id['mtime_ns'])
+
+    def _section(self, filename: str, kind: str) -> Tuple[int, int]:
+        """Return the index of the first record and the record count."""
+        source = self.sources.get(os.path.abspath(filename))
+        if source is None or source['kind'] != kind:
+            raise KeyError('No {} file {} in {}'.format(kind, filename,
+                self.pack_file))
+        return source['offset'] // _record.size, source['count']
+
+    def _items(self, first: int, last: int) -> Iterator[Tuple[int, str]]:
+        """Yield (key, name) of the records in [first, last["""
+        records = self._records
+        names = self._names
+        for i in range(3 * first, 3 * last, 3):
+            offset = records[i + 1]
+            yield records[i], str(names[offset:offset + records[i + 2]],
+                    'utf-8')
+
+    def months(self, month_file: str) -> List[str]:
+        """Return the month names of a month file."""
+        first, count = self._section(month_file, 'months')
+        return [name for _, name in self._items(first, first + count)]
+
+    def namedays(self, nameday_file: str) -> Iterator[Tuple[str, str]]:
+        """Yield (mm-dd, name) of the included namedays of a file."""
+        first, count = self._section(nameday_file, 'namedays')
+        for key, name in self._items(first, first + count):
+            yield _leap_days[key], name
+
+    def events(self, event_file: str, kind: str,
+            first_day: datetime.date,
+            last_day: datetime.date) -> Iterator[Tuple[str, str]]:
+        """Yield (yyyy-mm-dd, name) of the entries in [first_day, last_day].
+
+        Parameters
+        ----------
+
+        - event_file: holiday or moon file.
+        - kind: 'holiday' or 'moon'.
+        - first_day, last_day: range of dates, included.
+
+        """
+        first, count = self._section(event_file, kind)
+        records = self._records
+        key = lambda i: records[3 * i]
+        lo = bisect.bisect_left(range(first, first + count),
+                first_day.toordinal(), key=key) + first
+        hi = bisect.bisect_right(range(lo, first + count),
+                last_day.toordinal(), key=key) + lo
+        for ordinal, name in self._items(lo, hi):
+            yield datetime.date.fromordinal(ordinal).isoformat(), name
+
+
+def open_pack(pack_file: str, sources: Sequence[Tuple[str, str]]
+        ) -> DataPack:
+    """Return the pack with the given sources, compiled again if needed.
+
+    The pack is compiled again if a source is missing or was modified since
+    the pack was compiled, the other sources of the existing pack are kept.
+
+    Parameters
+    ----------
+
+    - pack_file: pack file, created if it does not exist.
+    - sources: (kind, filename), kind in `g_kinds`.
+
+    """
+    pack = None
+    try:
+        pack = DataPack(pack_file)
+    except (OSError, ValueError):
+        pass
+    if pack is not None:
+        if all(pack.is_fresh(filename)
+                and pack.sources[os.path.abspath(filename)]['kind'] == kind
+                for kind, filename in sources):
+            return pack
+        requested = {os.path.abspath(filename) for _, filename in sources}
+        kept = [(s['kind'], s['path']) for s in pack.sources.values()
+                if s['path'] not in requested and os.path.exists(s['path'])]
+        pack.close()
+        sources = kept + list(sources)
+    compile_pack(pack_file, sources)
+    return DataPack(pack_file)
+
+
+if __name__ == '__main__':
+    usage = 'usage: %prog [options] -o FILE'
+    parser = OptionParser(usage=usage,
+            description=('Compile the static input files of generate_csv.py'
+                ' into a data pack, cf. generate_csv.py --pack.'))
+
+    parser.add_option('-d', '--holiday-file', dest='holiday_files',
+            action='append', type=str, metavar='FILE', default=[],
+            help='holiday file, can be given several times')
+
+    parser.add_option('-m', '--moon-file', dest='moon_files',
+            action='append', type=str, metavar='FILE', default=[],
+            help='moon file, can be given several times')
+
+    parser.add_option('-n', '--nameday-file', dest='nameday_files',
+            action='append', type=str, metavar='FILE', default=[],
+            help='nameday file, can be given several times')
+
+    parser.add_option('-t', '--month-file', dest='month_files',
+            action='append', type=str, metavar='FILE', default=[],
+            help='month file, can be given several times (one per locale)')
+
+    parser.add_option('-o', '--output-file', dest='output_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help='pack file to write')
+
+    options, args = parser.parse_args()
+    if not options.output_file:
+        parser.error('--output-file is required')
+    sources = ([('months', f) for f in options.month_files]
+            + [('namedays', f) for f in options.nameday_files]
+            + [('holiday', f) for f in options.holiday_files]
+            + [('moon', f) for f in options.moon_files])
+    try:
+        compile_pack(options.output_file, sources)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
@@ -3,9 +3,18 @@
 # data such as week number, page for publiposting, for each week are separated
 # by columns.
 
+import copy
+import datetime
+import multiprocessing
 from optparse import OptionParser
+import os
+import sys
 
 from csvcalendar import Calendar
+from csvcalendar import RangeCalendar
+from layouts import get_layout
+from layouts import g_layouts
+import tracing
 
 
 def generate_csv(year, **kwargs):
@@ -14,12 +23,104 @@ def generate_csv(year, **kwargs):
     ----------
     year: int, year for which to generate data.
     extra_weeks: int, number of weeks of the following year.
+    first_date, last_date: datetime.date, range of dates instead of year
+      and extra_weeks, the weeks are then only created when needed (cf.
+      csvcalendar.RangeCalendar).
     birthday_file: str, file with birthdays (cf. above for
       format explanation).
     nameday_file: str, file with namedays (cf. above for
       format explanation).
     event_file: str, file with events (cf. above for
       format explanation).
+    bulk: bool, load the files by chunks with NumPy (faster for large
+      files).
+    ics_files: list of str, iCalendar files whose events are added (cf.
+      icsimport.py).
+    ics_holidays: bool, set the all-day events of ics_files as holidays.
+    moon_glyphs: str, compute the moon phases with these glyphs (cf.
+      moonphase.get_glyphs), in addition to moon_file.
+    utc_offset: float, offset from UTC in hours for the computed moon
+      phases.
+    holiday_countries: list of str, compute the holidays of these
+      countries (cf. holiday_provider.g_countries), in addition to
+      holiday_file.
+    holiday_length: str, 'long' or 'short' names of the computed holidays.
+    layout: str, one row per 'week' (default), 'day' or 'month' (cf.
+      layouts.py).
+    weekday_file: str, file with the names of the days from Monday, one per
+      line, for the day and month layouts.
+    templates: list of str, svg templates of the pages, only the columns
+      they use are written, all columns if None.
+    report_file: str, validate the input files first (cf. validate.py) and
+      write the report to this file. Raise ValueError if there are errors,
+      otherwise load the files in trusted mode.
+    trusted: bool, the input files were already validated, their items
+      are added without checking their date.
+    pack_file: str, read month_file, nameday_file, holiday_file and
+      moon_file through this data pack (cf. datapack.py), compiled again
+      if one of them was modified.
+    output_file: str, file to write to, standard output if None.
+    manifest_file: str, file to write the page fingerprints to (cf.
+      pagecache.py), requires template_even and template_odd.
+    template_even, template_odd: str, svg templates of the pages.
+    """
+    output_file = kwargs.get('output_file', None)
+
+    manifest_file = kwargs.get('manifest_file', None)
+
+    layout = build_layout(**kwargs)
+
+    cal = build_calendar(year, **kwargs)
+    with tracing.span('write_csv', weeks=len(cal.weeks)) as args:
+        if output_file is None:
+            layout.write_csv(cal, tracing.counting_stream(sys.stdout, args))
+        else:
+            with open(output_file, 'w', newline='') as f:
+                layout.write_csv(cal, f)
+            args['bytes'] = os.path.getsize(output_file)
+    if manifest_file is not None:
+        with tracing.span('write_manifest'):
+            write_manifest(cal, manifest_file,
+                    kwargs['template_even'], kwargs['template_odd'])
+
+
+def write_manifest(cal, manifest_file, template_even, template_odd):
+    """Write the page fingerprints for pagecache.py."""
+    import pagecache
+    import svgrender
+
+    pagecache.write_manifest(
+            pagecache.page_manifest(svgrender.rows_from_calendar(cal),
+                template_even, template_odd),
+            manifest_file)
+
+
+def build_layout(**kwargs):
+    """Return the layout of the csv data.
+
+    Keyword arguments are the same as for `generate_csv`.
+
+    """
+    templates = kwargs.get('templates', None)
+    keep = None
+    if templates:
+        import svgrender
+
+        with tracing.span('template_placeholders', templates=len(templates)):
+            keep = set()
+            for template in templates:
+                keep |= svgrender.template_placeholders(template)
+    return get_layout(kwargs.get('layout', 'week'),
+            start_page=kwargs.get('start_page', 2),
+            weekdays=get_weekdays(kwargs.get('weekday_file', None)),
+            keep=keep)
+
+
+def build_calendar(year, **kwargs):
+    """Return a Calendar filled with the data from the given files.
+
+    Keyword arguments are the same as for `generate_csv`.
+
     """
     extra_weeks = kwargs.get('extra_weeks', 2)
     start_page = kwargs.get('start_page', 2)
@@ -29,17 +130,315 @@ def generate_csv(year, **kwargs):
     moon_file = kwargs.get('moon_file', None)
     month_file = kwargs.get('month_file', None)
     nameday_file = kwargs.get('nameday_file', None)
+    bulk = kwargs.get('bulk', False)
+    moon_glyphs = kwargs.get('moon_glyphs', None)
+    utc_offset = kwargs.get('utc_offset', 0.0)
+    holiday_countries = kwargs.get('holiday_countries', None)
+    holiday_length = kwargs.get('holiday_length', 'long')
+    first_date = kwargs.get('first_date', None)
+    last_date = kwargs.get('last_date', None)
+    report_file = kwargs.get('report_file', None)
+    trusted = kwargs.get('trusted', False)
+    pack_file = kwargs.get('pack_file', None)
+    ics_files = kwargs.get('ics_files', None)
+    ics_holidays = kwargs.get('ics_holidays', False)
+
+    pack = None
+    if pack_file is not None:
+        with tracing.span('open_pack', file=pack_file):
+            pack = open_pack(pack_file, month_file, holiday_file, moon_file,
+                    nameday_file)
+        months = pack.months(month_file) if month_file else None
+    else:
+        months = get_months(month_file)
+    with tracing.span('Calendar', extra_weeks=extra_weeks):
+        if first_date is not None:
+            cal = RangeCalendar(first_date, last_date,
+                    start_page=start_page,
+                    months=months)
+        else:
+            cal = Calendar(year,
+                    extra_weeks=extra_weeks,
+                    start_page=start_page,
+                    months=months)
+    if report_file is not None:
+        with tracing.span('validate', file=report_file):
+            validate_input(cal, **kwargs)
+        trusted = True
+    cal.trusted = trusted
+    if moon_glyphs is not None:
+        with tracing.span('set_moon_phases'):
+            set_moon_phases(cal, moon_glyphs, utc_offset)
+    if holiday_countries:
+        with tracing.span('set_holidays', countries=holiday_countries):
+            set_holidays(cal, holiday_countries, holiday_length)
+    if pack is not None:
+        with tracing.span('load_pack', file=pack_file), pack:
+            load_pack(cal, pack, holiday_file, moon_file, nameday_file)
+        # Already loaded.
+        holiday_file = moon_file = nameday_file = None
+    if bulk:
+        with tracing.span('load_bulk'):
+            load_bulk(cal, birthday_file, event_file, holiday_file,
+                    moon_file, nameday_file)
+    else:
+        add_birthdays(cal, birthday_file)
+        add_events(cal, event_file, cal.add_event)
+        add_events(cal, holiday_file, cal.set_holiday)
+        add_events(cal, moon_file, cal.set_moon)
+        add_namedays(cal, nameday_file)
+    if ics_files:
+        import icsimport
+
+        for ics_file in ics_files:
+            icsimport.import_ics(cal, ics_file, ics_holidays, utc_offset)
+    return cal
+
+
+def validate_input(cal, **kwargs):
+    """Validate the input files and write the report to report_file.
+
+    Raise ValueError if there are errors. Keyword arguments are the same as
+    for `generate_csv`, batch_jobs, the jobs of `generate_csv_batch`, and
+    editions, the editions of `generate_csv_editions`, whose files are also
+    validated.
+    """
+    import validate
+
+    report_file = kwargs['report_file']
+    jobs = kwargs.get('batch_jobs', [])
+    editions = kwargs.get('editions', [])
+    birthday_files = [kwargs.get('birthday_file', None)]
+    birthday_files += [birthday_file for _, birthday_file, _ in jobs]
+    event_files = [kwargs.get('event_file', None)]
+    event_files += [event_file for _, _, event_file in jobs]
+    holiday_files = [kwargs.get('holiday_file', None)]
+    holiday_files += [edition[4] for edition in editions]
+    nameday_files = [kwargs.get('nameday_file', None)]
+    nameday_files += [edition[3] for edition in editions]
+    report = validate.validate_files(cal.first_day, cal.last_day,
+            birthday_files=[f for f in birthday_files if f],
+            event_files=[f for f in event_files if f],
+            holiday_files=[f for f in holiday_files if f],
+            moon_files=[f for f in [kwargs.get('moon_file', None)] if f],
+            nameday_files=[f for f in nameday_files if f])
+    report.write(report_file)
+    errors = report.errors
+    if errors:
+        raise ValueError('{} error(s) in the input files, cf. {}, first: {}'.format(
+            len(errors), report_file, errors[0]))
+
+
+def set_moon_phases(cal, moon_glyphs, utc_offset):
+    """Set the computed moon phases with moonphase, which requires NumPy."""
+    import moonphase
+
+    moonphase.set_moon_phases(cal, moonphase.get_glyphs(moon_glyphs),
+            utc_offset)
+
+
+def set_holidays(cal, holiday_countries, holiday_length):
+    """Set the computed holidays with holiday_provider, which requires calendra."""
+    import holiday_provider
+
+    holiday_provider.set_holidays(cal, holiday_countries, holiday_length)
+
+
+def open_pack(pack_file, month_file, holiday_file, moon_file, nameday_file):
+    """Return the datapack.DataPack with the given files."""
+    import datapack
 
-    cal = Calendar(year,
-            extra_weeks=extra_weeks,
-            start_page=start_page,
-            months=get_months(month_file))
-    add_birthdays(cal, birthday_file)
-    add_events(cal, event_file, cal.add_event)
-    add_events(cal, holiday_file, cal.set_holiday)
-    add_events(cal, moon_file, cal.set_moon)
-    add_namedays(cal, nameday_file)
-    print(cal)
+    sources = [(kind, filename) for kind, filename in (
+        ('months', month_file),
+        ('holiday', holiday_file),
+        ('moon', moon_file),
+        ('namedays', nameday_file)) if filename]
+    return datapack.open_pack(pack_file, sources)
+
+
+def load_pack(cal, pack, holiday_file, moon_file, nameday_file):
+    """Fill the calendar with the files of a data pack."""
+    if holiday_file is not None:
+        for datestr, name in pack.events(holiday_file, 'holiday',
+                cal.first_day, cal.last_day):
+            cal.set_holiday(datestr, name)
+    if moon_file is not None:
+        for datestr, name in pack.events(moon_file, 'moon',
+                cal.first_day, cal.last_day):
+            cal.set_moon(datestr, name)
+    if nameday_file is not None:
+        cal.add_namedays(pack.namedays(nameday_file))
+
+
+def load_bulk(cal, birthday_file, event_file, holiday_file, moon_file,
+        nameday_file):
+    """Fill the calendar with bulkload, which requires NumPy."""
+    import bulkload
+
+    if birthday_file is not None:
+        bulkload.load_birthdays(cal, birthday_file)
+    if event_file is not None:
+        bulkload.load_events(cal, event_file, 'event')
+    if holiday_file is not None:
+        bulkload.load_events(cal, holiday_file, 'holiday')
+    if moon_file is not None:
+        bulkload.load_events(cal, moon_file, 'moon')
+    if nameday_file is not None:
+        bulkload.load_namedays(cal, nameday_file)
+
+
+def generate_csv_batch(year, jobs, processes=1, **kwargs):
+    """Generate one csv file per user from a shared base calendar.
+
+    The base calendar is built once from the files given as keyword
+    arguments, the birthdays and events of each user are added to an
+    overlay of it (cf. `Calendar.overlay`).
+
+    Parameters
+    ----------
+    year: int, year for which to generate data.
+    jobs: iterable of (output_file, birthday_file, event_file), where
+      birthday_file and event_file can be None.
+    processes: int, number of worker processes, 1 to work in this process.
+    Other keyword arguments are the same as for `generate_csv`.
+    """
+    layout = build_layout(**kwargs)
+    jobs = list(jobs)
+    base = build_calendar(year, batch_jobs=jobs, **kwargs)
+    if processes <= 1:
+        for job in jobs:
+            _write_user_csv(base, layout, job)
+        return
+    with multiprocessing.Pool(processes,
+            initializer=_init_batch_worker,
+            initargs=(base, layout)) as pool:
+        for _ in pool.imap_unordered(_run_batch_job, jobs, chunksize=16):
+            pass
+
+
+def generate_csv_editions(year, editions, processes=1, **kwargs):
+    """Generate the csv file of several editions from a shared base calendar.
+
+    The base calendar is built once from the files given as keyword
+    arguments, each edition is an overlay of it (cf. `Calendar.overlay`)
+    with its own start page and months, to which its namedays and holidays
+    are added.
+
+    Parameters
+    ----------
+    year: int, year for which to generate data.
+    editions: iterable of (output_file, start_page, month_file,
+      nameday_file, holiday_file, weekday_file), where the files can be
+      None.
+    processes: int, number of worker processes, 1 to work in this process.
+    Other keyword arguments are the same as for `generate_csv`.
+    """
+    layout = build_layout(**kwargs)
+    editions = list(editions)
+    base = build_calendar(year, editions=editions, **kwargs)
+    if processes <= 1:
+        for edition in editions:
+            _write_edition_csv(base, layout, edition)
+        return
+    with multiprocessing.Pool(min(processes, len(editions)),
+            initializer=_init_batch_worker,
+            initargs=(base, layout)) as pool:
+        for _ in pool.imap_unordered(_run_edition_job, editions):
+            pass
+
+
+def read_batch_file(batch_file):
+    """Return the jobs for `generate_csv_batch` from a batch file.
+
+    Each line is 'output_file,birthday_file,event_file', where
+    birthday_file and event_file can be empty.
+    """
+    jobs = []
+    with open(batch_file, 'r') as f:
+        for l in f:
+            if not l.strip():
+                continue
+            fields = [v.strip() for v in l.split(',')]
+            if len(fields) != 3 or not fields[0]:
+                raise ValueError('Wrong format for batch file, see --help for details')
+            jobs.append(tuple(v or None for v in fields))
+    return jobs
+
+
+def read_editions_file(editions_file):
+    """Return the editions for `generate_csv_editions` from a file.
+
+    Each line is 'output_file,start_page,month_file,nameday_file,holiday_file'
+    optionally followed by ',weekday_file', where the files can be empty.
+    """
+    editions = []
+    with open(editions_file, 'r') as f:
+        for l in f:
+            if not l.strip():
+                continue
+            fields = [v.strip() for v in l.split(',')]
+            try:
+                if len(fields) not in (5, 6) or not fields[0]:
+                    raise ValueError
+                start_page = int(fields[1])
+            except ValueError:
+                raise ValueError('Wrong format for editions file, see --help for details') from None
+            fields += [''] * (6 - len(fields))
+            editions.append((fields[0], start_page)
+                    + tuple(v or None for v in fields[2:]))
+    return editions
+
+
+# Base calendar and layout of the worker processes of `generate_csv_batch`
+# and `generate_csv_editions`.
+g_base_calendar = None
+g_layout = None
+
+
+def _init_batch_worker(base, layout):
+    global g_base_calendar
+    global g_layout
+    g_base_calendar = base
+    g_layout = layout
+
+
+def _run_batch_job(job):
+    _write_user_csv(g_base_calendar, g_layout, job)
+    # The worker processes do not run the exit handlers.
+    tracing.flush()
+
+
+def _run_edition_job(edition):
+    _write_edition_csv(g_base_calendar, g_layout, edition)
+    tracing.flush()
+
+
+def _write_edition_csv(base, layout, edition):
+    (output_file, start_page, month_file, nameday_file, holiday_file,
+            weekday_file) = edition
+    with tracing.span('edition_csv', file=output_file) as args:
+        cal = base.overlay(start_page, get_months(month_file))
+        add_events(cal, holiday_file, cal.set_holiday)
+        add_namedays(cal, nameday_file)
+        # The day and month layouts number their own pages.
+        layout = copy.copy(layout)
+        layout.start_page = start_page
+        if weekday_file:
+            layout.weekdays = get_weekdays(weekday_file)
+        with open(output_file, 'w', newline='') as f:
+            layout.write_csv(cal, f)
+        args['bytes'] = os.path.getsize(output_file)
+
+
+def _write_user_csv(base, layout, job):
+    output_file, birthday_file, event_file = job
+    with tracing.span('user_csv', file=output_file) as args:
+        cal = base.overlay()
+        add_birthdays(cal, birthday_file)
+        add_events(cal, event_file, cal.add_event)
+        with open(output_file, 'w', newline='') as f:
+            layout.write_csv(cal, f)
+        args['bytes'] = os.path.getsize(output_file)
 
 
 def get_months(month_file):
@@ -54,52 +453,79 @@ def get_months(month_file):
     return months
 
 
+def get_weekdays(weekday_file):
+    if not weekday_file:
+        return
+    with open(weekday_file, 'r') as f:
+        weekdays = [l.strip() for l in f.readlines()]
+    if len(weekdays) != 7:
+        raise ValueError('Error in weekday file')
+    return weekdays
+
+
 def add_birthdays(cal, birthday_file):
     if birthday_file is None:
         return
-    with open(birthday_file, 'r') as f:
+    with tracing.span('add_birthdays', file=birthday_file) as args, \
+            open(birthday_file, 'r') as f:
+        line_number = 0
         try:
-            for l in f.readlines():
-                datestr = l[:10]
-                name = l[11:].strip()
-                cal.add_birthday(datestr, name)
-        except:
-            raise ValueError('Wrong format for birthday file, see --help for details')
+            for line_number, l in enumerate(tracing.counted(f, args), 1):
+                cal.add_birthday(l[:10], l[11:].strip())
+        except ValueError:
+            raise ValueError('{}:{}: wrong format for birthday file, see --help for details'.format(
+                birthday_file, line_number)) from None
 
 
 def add_events(cal, event_file, add_function):
     """Add events with format 'yyy-mm-dd,name'"""
     if event_file is None:
         return
-    with open(event_file, 'r') as f:
+    with tracing.span(add_function.__name__, file=event_file) as args, \
+            open(event_file, 'r') as f:
+        line_number = 0
         try:
-            for l in f.readlines():
+            for line_number, l in enumerate(tracing.counted(f, args), 1):
                 datestr = l[:10]
                 name = l[11:].strip()
                 add_function(datestr, name)
-        except:
-            raise ValueError('Wrong file format, see --help for details')
+        except ValueError:
+            raise ValueError('{}:{}: wrong file format, see --help for details'.format(
+                event_file, line_number)) from None
 
 
 
 def add_namedays(cal, nameday_file):
     if nameday_file is None:
         return
-    with open(nameday_file, 'r') as f:
-        for l in f.readlines():
-            try:
-                include = bool(int(l[0]))
-            except (ValueError, IndexError):
-                raise ValueError('Wrong format for nameday file, see --help for details')
-            if not include:
-                continue
-            datestr = l[2:7]
-            name = l[8:].strip()
-            cal.add_nameday(datestr, name)
+    with tracing.span('add_namedays', file=nameday_file) as args, \
+            open(nameday_file, 'r') as f:
+        cal.add_namedays(_included_namedays(tracing.counted(f, args)))
+
+
+def _included_namedays(lines):
+    """Yield (datestr, name) for the included lines of a nameday file."""
+    for l in lines:
+        try:
+            include = bool(int(l[0]))
+        except (ValueError, IndexError):
+            raise ValueError('Wrong format for nameday file, see --help for details')
+        if not include:
+            continue
+        yield l[2:7], l[8:].strip()
+
+
+def parse_date(datestr):
+    """Return the datetime.date from 'yyyy-mm-dd'."""
+    try:
+        return datetime.date.fromisoformat(datestr)
+    except ValueError:
+        raise ValueError('Date must be in format yyyy-mm-dd') from None
 
 
 if __name__ == '__main__':
-    usage = "usage: %prog [options] year"
+    usage = ('usage: %prog [options] year\n'
+            '       %prog [options] --first-date=DATE --last-date=DATE')
     parser = OptionParser(usage=usage)
 
     parser.add_option('-e', '--extra-weeks', dest='extra_weeks',
@@ -110,6 +536,15 @@ if __name__ == '__main__':
             action='store', type=int, default=2,
             help='start page for week 1 (even number)')
 
+    parser.add_option('--first-date', dest='first_date',
+            action='store', type=str, metavar='YYYY-MM-DD', default=None,
+            help=('first date of the calendar, with --last-date, instead of'
+                ' year and --extra-weeks'))
+
+    parser.add_option('--last-date', dest='last_date',
+            action='store', type=str, metavar='YYYY-MM-DD', default=None,
+            help='last date of the calendar, with --first-date')
+
     parser.add_option('-b', '--birthday-file', dest='birthday_file',
             action='store', type=str, metavar='FILE', default=None,
             help='birthday file with "YYYY-mm-dd,name" format')
@@ -122,6 +557,26 @@ if __name__ == '__main__':
             action='store', type=str, metavar='FILE', default=None,
             help='moon file with "YYYY-mm-dd,name" format')
 
+    parser.add_option('-p', '--moon-glyphs', dest='moon_glyphs',
+            action='store', type=str, metavar='GLYPHS', default=None,
+            help=('compute the moon phases instead of reading a moon file,'
+                ' GLYPHS is "circles", "weather-icons", "emoji" or 4'
+                ' characters for new moon, first quarter, full moon and last'
+                ' quarter'))
+
+    parser.add_option('-z', '--utc-offset', dest='utc_offset',
+            action='store', type=float, default=0.0,
+            help='UTC offset in hours for the computed moon phases')
+
+    parser.add_option('-c', '--holiday-countries', dest='holiday_countries',
+            action='store', type=str, metavar='COUNTRIES', default=None,
+            help=('compute the holidays of these comma-separated countries'
+                ' (e.g. "fr" or "fr,cz") instead of reading a holiday file'))
+
+    parser.add_option('-l', '--holiday-length', dest='holiday_length',
+            action='store', type=str, default='long',
+            help='"long" or "short" names of the computed holidays')
+
     parser.add_option('-n', '--nameday-file', dest='nameday_file',
             action='store', type=str, metavar='FILE', default=None,
             help='nameday file with "{0|1},mm-dd,name" format')
@@ -130,19 +585,200 @@ if __name__ == '__main__':
             action='store', type=str, metavar='FILE', default=None,
             help='month file with one month per line')
 
+    parser.add_option('-w', '--weekday-file', dest='weekday_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help=('file with the names of the days from Monday, one per'
+                ' line, for the day and month layouts'))
+
     parser.add_option('-v', '--event-file', dest='event_file',
             action='store', type=str, metavar='FILE', default=None,
             help='event file with "YYYY-mm-dd,name" format')
 
+    parser.add_option('-i', '--ics-file', dest='ics_files',
+            action='append', type=str, metavar='FILE', default=[],
+            help=('iCalendar file (.ics) whose events are added, read as a'
+                ' stream, can be given several times'))
+
+    parser.add_option('--ics-holidays', dest='ics_holidays',
+            action='store_true', default=False,
+            help='set the all-day events of the iCalendar files as holidays')
+
+    parser.add_option('-k', '--bulk', dest='bulk',
+            action='store_true', default=False,
+            help='load the files in bulk with NumPy (for large files)')
+
+    parser.add_option('-y', '--layout', dest='layout',
+            action='store', type='choice', choices=list(g_layouts),
+            default='week',
+            help=('one row per week (double page, default), day or month'
+                ' (page), cf. layouts.py'))
+
+    parser.add_option('-g', '--template', dest='templates',
+            action='append', type=str, metavar='FILE', default=[],
+            help=('svg template of the pages, can be given several times;'
+                ' only the columns used by the templates are written'))
+
+    parser.add_option('-o', '--output-file', dest='output_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help='write to FILE instead of the standard output')
+
+    parser.add_option('--manifest', dest='manifest_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help=('write the page fingerprints for pagecache.py to FILE,'
+                ' requires --template-even and --template-odd'))
+
+    parser.add_option('--template-even', dest='template_even',
+            action='store', type=str, metavar='FILE', default=None,
+            help='svg template for even pages')
+
+    parser.add_option('--template-odd', dest='template_odd',
+            action='store', type=str, metavar='FILE', default=None,
+            help='svg template for odd pages')
+
+    parser.add_option('-u', '--batch-file', dest='batch_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help=('batch file with one "output_file,birthday_file,event_file"'
+                ' line per user, the other files are shared by all users'))
+
+    parser.add_option('-E', '--editions-file', dest='editions_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help=('editions file with one "output_file,start_page,'
+                'month_file,nameday_file,holiday_file[,weekday_file]" line'
+                ' per edition of the book, the other files are shared by'
+                ' all editions'))
+
+    parser.add_option('-j', '--jobs', dest='jobs',
+            action='store', type=int, default=1,
+            help='number of processes for --batch-file and --editions-file')
+
+    parser.add_option('--validate', dest='report_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help=('check the input files first and write the report to FILE'
+                ' as JSON (cf. validate.py), stop if there are errors'))
+
+    parser.add_option('--trusted', dest='trusted',
+            action='store_true', default=False,
+            help=('the input files were already checked with validate.py,'
+                ' skip the check of each item'))
+
+    parser.add_option('--pack', dest='pack_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help=('read the month, nameday, holiday and moon files through'
+                ' the data pack FILE (cf. datapack.py), compiled again when'
+                ' one of them is modified'))
+
+    parser.add_option('--trace', dest='trace_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help=('append the duration of the stages to FILE, as Chrome'
+                ' trace events (cf. tracing.py)'))
+
     options, args = parser.parse_args()
+    if options.trace_file:
+        tracing.enable(options.trace_file)
+    if bool(options.first_date) != bool(options.last_date):
+        parser.error('--first-date and --last-date go together')
+    first_date = None
+    last_date = None
+    if options.first_date:
+        try:
+            first_date = parse_date(options.first_date)
+            last_date = parse_date(options.last_date)
+        except ValueError as e:
+            parser.error(str(e))
+        if last_date < first_date:
+            parser.error('--last-date must not be before --first-date')
+        # The year is only used without date range.
+        args = args or [str(first_date.year)]
     if not args:
         parser.error('year argument missing')
+    if options.manifest_file and not (options.template_even
+            and options.template_odd):
+        parser.error('--manifest requires --template-even and --template-odd')
+    if options.batch_file and options.editions_file:
+        parser.error('--batch-file and --editions-file are exclusive')
+    holiday_countries = (options.holiday_countries.split(',')
+            if options.holiday_countries else None)
+    if options.editions_file:
+        generate_csv_editions(int(args[0]),
+                read_editions_file(options.editions_file),
+                processes=options.jobs,
+                extra_weeks=options.extra_weeks,
+                first_date=first_date,
+                last_date=last_date,
+                start_page=options.start_page,
+                birthday_file=options.birthday_file,
+                holiday_file=options.holiday_file,
+                moon_file=options.moon_file,
+                moon_glyphs=options.moon_glyphs,
+                utc_offset=options.utc_offset,
+                holiday_countries=holiday_countries,
+                holiday_length=options.holiday_length,
+                nameday_file=options.nameday_file,
+                month_file=options.month_file,
+                event_file=options.event_file,
+                ics_files=options.ics_files,
+                ics_holidays=options.ics_holidays,
+                bulk=options.bulk,
+                layout=options.layout,
+                weekday_file=options.weekday_file,
+                templates=options.templates,
+                report_file=options.report_file,
+                trusted=options.trusted,
+                pack_file=options.pack_file)
+        sys.exit(0)
+    if options.batch_file:
+        generate_csv_batch(int(args[0]),
+                read_batch_file(options.batch_file),
+                processes=options.jobs,
+                extra_weeks=options.extra_weeks,
+                first_date=first_date,
+                last_date=last_date,
+                start_page=options.start_page,
+                birthday_file=options.birthday_file,
+                holiday_file=options.holiday_file,
+                moon_file=options.moon_file,
+                moon_glyphs=options.moon_glyphs,
+                utc_offset=options.utc_offset,
+                holiday_countries=holiday_countries,
+                holiday_length=options.holiday_length,
+                nameday_file=options.nameday_file,
+                month_file=options.month_file,
+                event_file=options.event_file,
+                ics_files=options.ics_files,
+                ics_holidays=options.ics_holidays,
+                bulk=options.bulk,
+                layout=options.layout,
+                weekday_file=options.weekday_file,
+                templates=options.templates,
+                report_file=options.report_file,
+                trusted=options.trusted,
+                pack_file=options.pack_file)
+        sys.exit(0)
     generate_csv(int(args[0]),
             extra_weeks=options.extra_weeks,
+            first_date=first_date,
+            last_date=last_date,
             start_page=options.start_page,
             birthday_file=options.birthday_file,
             holiday_file=options.holiday_file,
             moon_file=options.moon_file,
+            moon_glyphs=options.moon_glyphs,
+            utc_offset=options.utc_offset,
+            holiday_countries=holiday_countries,
+            holiday_length=options.holiday_length,
             nameday_file=options.nameday_file,
             month_file=options.month_file,
-            event_file=options.event_file)
+            event_file=options.event_file,
+            ics_files=options.ics_files,
+            ics_holidays=options.ics_holidays,
+            bulk=options.bulk,
+            layout=options.layout,
+            weekday_file=options.weekday_file,
+            templates=options.templates,
+            report_file=options.report_file,
+            trusted=options.trusted,
+            pack_file=options.pack_file,
+            output_file=options.output_file,
+            manifest_file=options.manifest_file,
+            template_even=options.template_even,
+            template_odd=options.template_odd)
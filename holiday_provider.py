@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# Public holidays of several countries, to fill a Calendar directly instead of
+# going through holidays.csv.
+#
+# The holidays are computed with calendra and translated with the `long_` and
+# `short_` tables of generate_holidays_<country>.py. The holidays of a year
+# are cached on disk, one file per country, year and length, with lines
+# "yyyy-mm-dd,name". A cache file older than the translation module is
+# recomputed.
+#
+# Requires calendra.
+
+import datetime
+import importlib
+import os
+from optparse import OptionParser
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import warnings
+
+from csvcalendar import Calendar
+
+__all__ = [
+        'g_countries',
+        'holidays',
+        'set_holidays',
+        ]
+
+# Country code: (module with the translation tables, calendra class imported
+# in this module).
+g_countries = {
+        'fr': ('generate_holidays_fr', 'France'),
+        'cz': ('generate_holidays_cz', 'CzechRepublic'),
+        }
+
+g_lengths = ('long', 'short')
+
+g_cache_dir = os.path.join(
+        os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+        'cage', 'holidays')
+
+
+def _check_country(country: str):
+    if country not in g_countries:
+        raise ValueError('Unknown country "{}", must be one of {}'.format(
+            country, ', '.join(g_countries)))
+
+
+def _check_length(length: str):
+    if length not in g_lengths:
+        raise ValueError('Length must be one of {}'.format(
+            ', '.join(g_lengths)))
+
+
+def compute_holidays(country: str, year: int,
+        length: str = 'long') -> List[Tuple[datetime.date, str]]:
+    """Return the (date, name) of the holidays in `year`, without cache.
+
+    Parameters
+    ----------
+
+    - country: key of `g_countries`.
+    - year: year.
+    - length: 'long' or 'short', translation table to use.
+
+    """
+    _check_country(country)
+    _check_length(length)
+    module = importlib.import_module(g_countries[country][0])
+    cal = getattr(module, g_countries[country][1])()
+    table = module.long_ if length == 'long' else module.short_
+    result = []
+    for holiday in cal.holidays(year):
+        name = table.get(holiday.name)
+        if name is None:
+            warnings.warn('No translation for "{}" ({}), using it as is'.format(
+                holiday.name, country))
+            name = holiday.name
+        # calendra returns its own date subclass.
+        result.append((datetime.date(holiday.year, holiday.month,
+            holiday.day), name))
+    return result
+
+
+def _cache_file(cache_dir: str, country: str, year: int, length: str) -> str:
+    return os.path.join(cache_dir, 'holidays-{}-{}-{}.csv'.format(
+        country, year, length))
+
+
+def _module_mtime(country: str) -> float:
+    """Return the modification time of the translation module, 0 if unknown."""
+    module_name, _ = g_countries[country]
+    filename = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+            module_name + '.py')
+    try:
+        return os.path.getmtime(filename)
+    except OSError:
+        return 0.0
+
+
+def year_holidays(country: str, year: int,
+        length: str = 'long',
+        cache_dir: Optional[str] = g_cache_dir
+        ) -> List[Tuple[datetime.date, str]]:
+    """Return the (date, name) of the holidays in `year`, cached.
+
+    Parameters
+    ----------
+
+    - country: key of `g_countries`.
+    - year: year.
+    - length: 'long' or 'short', translation table to use.
+    - cache_dir: directory of the cache files, None to disable the cache.
+
+    """
+    if cache_dir is None:
+        return compute_holidays(country, year, length)
+    _check_country(country)
+    _check_length(length)
+    filename = _cache_file(cache_dir, country, year, length)
+    try:
+        if os.path.getmtime(filename) >= _module_mtime(country):
+            with open(filename, 'r', encoding='utf-8') as f:
+                return [(datetime.date.fromisoformat(l[:10]),
+                    l[11:].rstrip('\n')) for l in f if l.strip()]
+    except (OSError, ValueError):
+        pass
+    result = compute_holidays(country, year, length)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary file first for concurrent runs.
+    tmp_filename = '{}.{}'.format(filename, os.getpid())
+    with open(tmp_filename, 'w', encoding='utf-8') as f:
+        for date, name in result:
+            f.write('{},{}\n'.format(date.isoformat(), name))
+    os.replace(tmp_filename, filename)
+    return result
+
+
+def holidays(countries: Iterable[str],
+        first_day: datetime.date,
+        last_day: datetime.date,
+        length: str = 'long',
+        cache_dir: Optional[str] = g_cache_dir
+        ) -> Dict[str, List[Tuple[datetime.date, str]]]:
+    """Return the (date, name) of the holidays in [first_day, last_day].
+
+    Return a dictionary country: holidays, cf. `year_holidays` for the
+    parameters.
+
+    """
+    result = {}
+    for country in countries:
+        result[country] = [(d, n)
+                for year in range(first_day.year, last_day.year + 1)
+                for d, n in year_holidays(country, year, length, cache_dir)
+                if first_day <= d <= last_day]
+    return result
+
+
+def set_holidays(cal: Calendar,
+        countries: Sequence[str],
+        length: str = 'long',
+        cache_dir: Optional[str] = g_cache_dir,
+        separator: str = ' / '):
+    """Set the holidays of the whole calendar.
+
+    As with a holiday file, the last holiday of a country on a day replaces
+    the previous ones. When several countries have a holiday on the same
+    day, the names are joined with `separator`, in the order of `countries`.
+
+    Parameters
+    ----------
+
+    - cal: calendar to fill.
+    - countries: keys of `g_countries`.
+    - length: 'long' or 'short', translation table to use.
+    - cache_dir: directory of the cache files, None to disable the cache.
+    - separator: separator of the names of a same day.
+
+    """
+    names: Dict[datetime.date, List[str]] = {}
+    for country_holidays in holidays(countries, cal.first_day, cal.last_day,
+            length, cache_dir).values():
+        for date, name in dict(country_holidays).items():
+            day_names = names.setdefault(date, [])
+            if name not in day_names:
+                day_names.append(name)
+    for date in sorted(names):
+        cal.set_holiday(date.isoformat(), separator.join(names[date]))
+
+
+if __name__ == '__main__':
+    usage = 'usage: %prog [options] country[,country...] start_year [end_year]'
+    parser = OptionParser(usage=usage,
+            description=('Print the holidays in the format of holidays.csv,'
+                ' countries are among {}.'.format(', '.join(g_countries))))
+
+    parser.add_option('-l', '--length', dest='length',
+            action='store', type=str, default='long',
+            help='"long" or "short" holiday names')
+
+    options, args = parser.parse_args()
+    if len(args) < 2:
+        parser.error('country and start_year arguments missing')
+    countries = args[0].split(',')
+    start_year = int(args[1])
+    end_year = int(args[2]) if len(args) > 2 else start_year
+    try:
+        result = holidays(countries, datetime.date(start_year, 1, 1),
+                datetime.date(end_year, 12, 31), options.length)
+    except ValueError as e:
+        parser.error(str(e))
+    for country in countries:
+        for date, name in result[country]:
+            print('{},{}'.format(date.isoformat(), name))
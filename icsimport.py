@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# Streaming import of the events of iCalendar files (.ics, RFC 5545) into a
+# Calendar, instead of flattening them into an event file.
+#
+# The file is read line by line: the folded lines are unfolded and only the
+# properties used here (DTSTART, DTEND, SUMMARY, RRULE, EXDATE, STATUS, UID,
+# RECURRENCE-ID) of the current VEVENT are kept, the other ones (e.g. large
+# DESCRIPTION or ATTACH) are skipped without being joined. The occurrences of
+# an event are added when END:VEVENT is read, so that the memory use does not
+# depend on the size of the file, except for the recurring events: they are
+# kept until the end of the file, where their occurrences are added, since
+# the occurrences moved or cancelled by an override (a VEVENT with the same
+# UID and a RECURRENCE-ID) can be anywhere in the file. The occurrences
+# outside the calendar range are dropped before any Event is created.
+#
+# - The all-day events (DTSTART;VALUE=DATE) are added on each of their days
+#   (DTEND is exclusive), optionally as holidays.
+# - The other events are added on the day of their start, in the local time
+#   of their TZID, or shifted by `utc_offset` for the UTC times.
+# - The recurrences with FREQ, INTERVAL, COUNT and UNTIL are expanded, as
+#   well as EXDATE. The other parts of RRULE (BYDAY, ...) are not supported,
+#   only the first occurrence is then added, with a warning. An override
+#   replaces only the occurrence of its RECURRENCE-ID (RANGE=THISANDFUTURE
+#   is not supported).
+# - The cancelled events (STATUS:CANCELLED) are skipped.
+
+import calendar
+import datetime
+from optparse import OptionParser
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import warnings
+
+import tracing
+
+__all__ = [
+        'import_ics',
+        'read_occurrences',
+        ]
+
+# Properties of a VEVENT read.
+g_properties = frozenset(('DTSTART', 'DTEND', 'SUMMARY', 'RRULE', 'EXDATE',
+    'STATUS', 'UID', 'RECURRENCE-ID'))
+
+# Maximum number of occurrences of an unbounded recurrence, before the end of
+# the calendar is reached (e.g. DAILY from 1970).
+g_max_occurrences = 1000000
+
+_escapes = {'\\\\': '\\', '\\;': ';', '\\,': ',', '\\n': '\n', '\\N': '\n'}
+
+
+def _unfold(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """Yield (line number, logical line) of the lines of `g_properties`.
+
+    BEGIN and END lines are always yielded, the lines of the other properties
+    and their continuations are skipped.
+
+    """
+    current: List[str] = []
+    current_number = 0
+    for line_number, line in enumerate(lines, 1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t'):
+            if current:
+                current.append(line[1:])
+            continue
+        if current:
+            yield current_number, ''.join(current)
+            current = []
+        name = _name(line)
+        if name in g_properties or name in ('BEGIN', 'END'):
+            current = [line]
+            current_number = line_number
+    if current:
+        yield current_number, ''.join(current)
+
+
+def _name(line: str) -> str:
+    """Return the upper-case property name of a content line."""
+    for i, c in enumerate(line):
+        if c in ';:':
+            return line[:i].upper()
+    return line.upper()
+
+
+def _parse_line(line: str) -> Tuple[str, Dict[str, str], str]:
+    """Return (name, parameters, value) of a content line.
+
+    Raise ValueError if there is no value.
+
+    """
+    quoted = False
+    for i, c in enumerate(line):
+        if c == '"':
+            quoted = not quoted
+        elif c == ':' and not quoted:
+            break
+    else:
+        raise ValueError('missing ":"')
+    name, *params = line[:i].split(';')
+    parameters = {}
+    for param in params:
+        key, _, value = param.partition('=')
+        parameters[key.upper()] = value.strip('"')
+    return name.upper(), parameters, line[i + 1:]
+
+
+def _unescape(text: str) -> str:
+    if '\\' not in text:
+        return text
+    out = []
+    i = 0
+    while i < len(text):
+        pair = text[i:i + 2]
+        if pair in _escapes:
+            out.append(_escapes[pair])
+            i += 2
+        else:
+            out.append(text[i])
+            i += 1
+    return ''.join(out)
+
+
+def _parse_date(value: str, parameters: Dict[str, str],
+        utc_offset: float) -> Tuple[datetime.date, bool]:
+    """Return (date, all_day) of a DATE or DATE-TIME value.
+
+    The UTC times are shifted by `utc_offset` hours, the times with a TZID
+    or floating are taken as is.
+
+    """
+    value = value.strip()
+    date = datetime.date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+    if len(value) == 8:
+        return date, True
+    if value[8:9] != 'T':
+        raise ValueError('wrong date "{}"'.format(value))
+    if value.endswith('Z') and utc_offset:
+        moment = datetime.datetime(date.year, date.month, date.day,
+                int(value[9:11]), int(value[11:13]))
+        date = (moment + datetime.timedelta(hours=utc_offset)).date()
+    return date, False
+
+
+def _add_months(date: datetime.date, months: int) -> Optional[datetime.date]:
+    """Return `date` `months` later, None if the day does not exist."""
+    month = date.month - 1 + months
+    year = date.year + month // 12
+    month = month % 12 + 1
+    if year > datetime.MAXYEAR:
+        return None
+    if date.day > calendar.monthrange(year, month)[1]:
+        return None
+    return date.replace(year=year, month=month)
+
+
+def _recurrences(start: datetime.date, rule: str, first_day: datetime.date,
+        last_day: datetime.date, location: str) -> Iterator[datetime.date]:
+    """Yield the start dates of the recurrence `rule` up to `last_day`.
+
+    The occurrences before `first_day` may be skipped.
+
+    """
+    parts = dict(p.partition('=')[::2] for p in rule.upper().split(';') if p)
+    freq = parts.pop('FREQ', None)
+    interval = int(parts.pop('INTERVAL', '1'))
+    count = int(parts.pop('COUNT', '0')) or None
+    until = parts.pop('UNTIL', None)
+    parts.pop('WKST', None)
+    if freq not in ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY') or parts:
+        warnings.warn('{}: unsupported RRULE "{}", only the first occurrence'
+                ' is added'.format(location, rule))
+        yield start
+        return
+    if until is not None:
+        last_day = min(last_day, datetime.date(int(until[:4]),
+            int(until[4:6]), int(until[6:8])))
+    step = {'DAILY': 1, 'WEEKLY': 7}.get(freq)
+    months = {'MONTHLY': 1, 'YEARLY': 12}.get(freq)
+    # Occurrences counted for COUNT, the invalid dates (e.g. 31st of a
+    # shorter month) are not occurrences, as in RFC 5545.
+    n = 0
+    first = 0
+    if step is not None and count is None:
+        # Every step is an occurrence, jump to the calendar range.
+        first = max((first_day - start).days // (step * interval), 0)
+    for i in range(first, first + g_max_occurrences):
+        if step is not None:
+            date = start + datetime.timedelta(step * interval * i)
+        else:
+            date = _add_months(start, months * interval * i)
+            if date is None:
+                continue
+        if date > last_day or (count is not None and n >= count):
+            return
+        n += 1
+        yield date
+
+
+class _VEvent:
+    """The properties of the VEVENT being read."""
+
+    __slots__ = ('line_number', 'properties', 'exdates')
+
+    def __init__(self, line_number: int):
+        self.line_number = line_number
+        self.properties: Dict[str, Tuple[Dict[str, str], str]] = {}
+        self.exdates: List[Tuple[Dict[str, str], str]] = []
+
+
+def _occurrences(event: _VEvent, first_day: datetime.date,
+        last_day: datetime.date, utc_offset: float, location: str,
+        overridden: Iterable[datetime.date] = ()
+        ) -> Iterator[Tuple[datetime.date, str, bool]]:
+    """Yield (date, summary, all_day) of the days of an event.
+
+    The occurrences starting on `overridden` are skipped, as for EXDATE.
+
+    """
+    properties = event.properties
+    if 'DTSTART' not in properties:
+        raise ValueError('VEVENT without DTSTART')
+    status = properties.get('STATUS')
+    if status is not None and status[1].strip().upper() == 'CANCELLED':
+        return
+    start, all_day = _parse_date(properties['DTSTART'][1],
+            properties['DTSTART'][0], utc_offset)
+    # Length of the all-day events, in days.
+    days = 1
+    if all_day and 'DTEND' in properties:
+        end, _ = _parse_date(properties['DTEND'][1], properties['DTEND'][0],
+                utc_offset)
+        days = max((end - start).days, 1)
+    rule = properties.get('RRULE')
+    if rule is None:
+        if start > last_day or start + datetime.timedelta(days) <= first_day:
+            return
+        starts: Iterable[datetime.date] = (start,)
+    else:
+        starts = _recurrences(start, rule[1],
+                first_day - datetime.timedelta(days - 1), last_day, location)
+    excluded = set(overridden)
+    for parameters, value in event.exdates:
+        for v in value.split(','):
+            excluded.add(_parse_date(v, parameters, utc_offset)[0])
+    # One line per event in the csv data and the svg text.
+    summary = _unescape(properties.get('SUMMARY', ({}, ''))[1]).strip()
+    summary = summary.replace('\n', ' ')
+    for occurrence in starts:
+        if occurrence in excluded:
+            continue
+        for i in range(days):
+            date = occurrence + datetime.timedelta(i)
+            if first_day <= date <= last_day:
+                yield date, summary, all_day
+
+
+def read_occurrences(lines: Iterable[str], first_day: datetime.date,
+        last_day: datetime.date, utc_offset: float = 0.0,
+        filename: str = '<ics>'
+        ) -> Iterator[Tuple[datetime.date, str, bool]]:
+    """Yield (date, summary, all_day) of the event days in [first_day, last_day].
+
+    The days of the recurring events are yielded last.
+
+    Raise ValueError with the location of the first malformed event.
+
+    Parameters
+    ----------
+
+    - lines: lines of an iCalendar file, e.g. an open file.
+    - first_day, last_day: range of dates, included.
+    - utc_offset: offset from UTC in hours of the times in UTC.
+    - filename: file name used in the error messages.
+
+    """
+    event: Optional[_VEvent] = None
+    # Recurring events and their location, added at the end of the file.
+    masters: List[Tuple[_VEvent, str]] = []
+    # UID: start dates of the occurrences replaced by an override.
+    overridden: Dict[str, Set[datetime.date]] = {}
+    # Depth of the components nested in the VEVENT (e.g. VALARM), whose
+    # properties are not the ones of the event.
+    depth = 0
+    for line_number, line in _unfold(lines):
+        location = '{}:{}'.format(filename, line_number)
+        try:
+            name, parameters, value = _parse_line(line)
+        except ValueError as e:
+            raise ValueError('{}: {}'.format(location, e)) from None
+        if name == 'BEGIN':
+            if value.upper() == 'VEVENT' and event is None:
+                event = _VEvent(line_number)
+            elif event is not None:
+                depth += 1
+            continue
+        if event is None:
+            continue
+        if name == 'END':
+            if depth:
+                depth -= 1
+                continue
+            location = '{}:{}'.format(filename, event.line_number)
+            properties = event.properties
+            uid = properties.get('UID', ({}, ''))[1]
+            try:
+                if 'RECURRENCE-ID' in properties:
+                    parameters, value = properties.pop('RECURRENCE-ID')
+                    overridden.setdefault(uid, set()).add(
+                            _parse_date(value, parameters, utc_offset)[0])
+                    # An override is a single occurrence.
+                    properties.pop('RRULE', None)
+                elif 'RRULE' in properties:
+                    masters.append((event, location))
+                    event = None
+                    continue
+                yield from _occurrences(event, first_day, last_day,
+                        utc_offset, location)
+            except ValueError as e:
+                raise ValueError('{}: {}'.format(location, e)) from None
+            event = None
+        elif depth:
+            continue
+        elif name == 'EXDATE':
+            event.exdates.append((parameters, value))
+        else:
+            event.properties[name] = (parameters, value)
+    for event, location in masters:
+        uid = event.properties.get('UID', ({}, ''))[1]
+        try:
+            yield from _occurrences(event, first_day, last_day, utc_offset,
+                    location, overridden.get(uid, ()))
+        except ValueError as e:
+            raise ValueError('{}: {}'.format(location, e)) from None
+
+
+def import_ics(cal, ics_file: str, all_day_holidays: bool = False,
+        utc_offset: float = 0.0) -> int:
+    """Add the events of an iCalendar file to a Calendar.
+
+    Return the number of days added.
+
+    Parameters
+    ----------
+
+    - cal: Calendar or RangeCalendar.
+    - ics_file: iCalendar file.
+    - all_day_holidays: set the all-day events as holidays instead of adding
+        them as events.
+    - utc_offset: offset from UTC in hours of the times in UTC.
+
+    """
+    count = 0
+    with tracing.span('import_ics', file=ics_file) as args, \
+            open(ics_file, 'r', encoding='utf-8', newline='') as f:
+        for date, summary, all_day in read_occurrences(
+                tracing.counted(f, args), cal.first_day, cal.last_day,
+                utc_offset, ics_file):
+            if all_day and all_day_holidays:
+                cal.set_holiday(date.isoformat(), summary)
+            else:
+                cal.add_event(date.isoformat(), summary)
+            count += 1
+        args['days'] = count
+    return count
+
+
+if __name__ == '__main__':
+    usage = 'usage: %prog [options] FIRST_DATE LAST_DATE ICS_FILE [...]'
+    parser = OptionParser(usage=usage,
+            description=('Write the events of iCalendar files between'
+                ' FIRST_DATE and LAST_DATE (yyyy-mm-dd) as lines'
+                ' "yyyy-mm-dd,name" (cf. generate_csv.py --event-file), for'
+                ' generate_csv.py --ics-file reads them directly.'))
+
+    parser.add_option('-z', '--utc-offset', dest='utc_offset',
+            action='store', type=float, default=0.0,
+            help='offset from UTC in hours of the times in UTC')
+
+    parser.add_option('-a', '--all-day', dest='all_day',
+            action='store_true', default=False,
+            help='only write the all-day events')
+
+    options, args = parser.parse_args()
+    if len(args) < 3:
+        parser.error('FIRST_DATE, LAST_DATE and ICS_FILE required')
+    try:
+        first_day = datetime.date.fromisoformat(args[0])
+        last_day = datetime.date.fromisoformat(args[1])
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        for ics_file in args[2:]:
+            with open(ics_file, 'r', encoding='utf-8', newline='') as f:
+                for date, summary, all_day in read_occurrences(f, first_day,
+                        last_day, options.utc_offset, ics_file):
+                    if all_day or not options.all_day:
+                        print('{},{}'.format(date.isoformat(), summary))
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+# Assemble the pages of the calendar into a single-page pdf and a booklet pdf,
+# in one pass, as the two pdfjam calls did (`pdfjam` and
+# `pdfjam --booklet true --landscape`).
+#
+# Each input file is read once. In the booklet, each input page becomes a
+# form XObject which is placed on the sheets, a page used several times (e.g.
+# white.pdf) is embedded only once.
+# The pages of a booklet are printed on sheets folded in the middle, so that
+# the page count must be a multiple of 4.
+#
+# The pages converted by Inkscape are separate pdf files, each with its own
+# copy of the fonts and images. Identical objects (font programs, images,
+# forms, ...) are merged before writing, so that each one is stored once
+# (`deduplicate`).
+#
+# Pages smaller than A5 can also be imposed at their natural size in a corner
+# of A4 sheets (`--corner`), instead of centered, so that only two cuts are
+# needed. This replaces small_page_on_a4.sh.
+#
+# Requires pikepdf.
+
+import hashlib
+from optparse import OptionParser
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pikepdf
+from pikepdf import Pdf
+
+import tracing
+
+__all__ = [
+        'booklet_order',
+        'deduplicate',
+        'impose',
+        'impose_corner',
+        ]
+
+# Points per millimeter.
+g_mm = 72.0 / 25.4
+
+# A4 landscape, in points.
+g_a4_landscape = (297 * g_mm, 210 * g_mm)
+
+# Default distance between the pages and the corner of the sheet with
+# `impose_corner`, in points.
+g_corner_margin = 0.5 * g_mm
+
+# Length of the cut marks and distance to the pages, in points.
+g_mark_length = 5 * g_mm
+g_mark_gap = 1 * g_mm
+
+
+def booklet_order(page_count: int,
+        signature: int = 0) -> List[Tuple[int, int]]:
+    """Return the (left, right) page indices of the sides of the sheets.
+
+    The sides are in printing order: front then back of the first sheet,
+    and so on, for sheets folded and nested in the middle.
+
+    Parameters
+    ----------
+
+    - page_count: number of pages, a multiple of 4.
+    - signature: number of pages of each group of nested sheets, a multiple
+        of 4, 0 for a single group. The last group can be shorter.
+
+    """
+    if page_count % 4:
+        raise ValueError('The page count ({}) must be a multiple of 4'.format(
+            page_count))
+    if signature % 4:
+        raise ValueError('The signature ({}) must be a multiple of 4'.format(
+            signature))
+    sides = []
+    for first in range(0, page_count, signature or page_count or 1):
+        count = min(signature or page_count, page_count - first)
+        last = first + count - 1
+        for sheet in range(count // 4):
+            sides.append((last - 2 * sheet, first + 2 * sheet))
+            sides.append((first + 2 * sheet + 1, last - 1 - 2 * sheet))
+    return sides
+
+
+def fit_matrix(box: Sequence[float],
+        cell: Tuple[float, float, float, float]) -> List[float]:
+    """Return the matrix to center `box` in `cell`, scaled to fit.
+
+    Parameters
+    ----------
+
+    - box: (llx, lly, urx, ury) of the page.
+    - cell: (x, y, width, height) of the destination.
+
+    """
+    llx, lly, urx, ury = [float(v) for v in box]
+    width = urx - llx
+    height = ury - lly
+    x, y, cell_width, cell_height = cell
+    scale = min(cell_width / width, cell_height / height)
+    tx = x + (cell_width - scale * width) / 2 - scale * llx
+    ty = y + (cell_height - scale * height) / 2 - scale * lly
+    return [scale, 0, 0, scale, tx, ty]
+
+
+class _Forms:
+    """Form XObjects of the input pages in a destination pdf."""
+
+    def __init__(self, pdf: Pdf):
+        self.pdf = pdf
+        self._forms: Dict[Tuple[str, int], pikepdf.Object] = {}
+
+    def get(self, key: Tuple[str, int], page: pikepdf.Page) -> pikepdf.Object:
+        form = self._forms.get(key)
+        if form is None:
+            form = self.pdf.copy_foreign(
+                    page.as_form_xobject(handle_transformations=True))
+            self._forms[key] = form
+        return form
+
+
+def _read_pages(input_files: Sequence[str]
+        ) -> Tuple[Dict[str, Pdf], List[Tuple[Tuple[str, int], pikepdf.Page]]]:
+    """Return the opened pdf files and the (key, page) of all pages.
+
+    A file given several times is opened once, the key of a page identifies
+    it in its file.
+
+    """
+    sources: Dict[str, Pdf] = {}
+    pages: List[Tuple[Tuple[str, int], pikepdf.Page]] = []
+    try:
+        for filename in input_files:
+            if filename not in sources:
+                sources[filename] = Pdf.open(filename)
+            for i, page in enumerate(sources[filename].pages):
+                pages.append(((filename, i), page))
+    except Exception:
+        _close(sources)
+        raise
+    return sources, pages
+
+
+def _close(sources: Dict[str, Pdf]):
+    for pdf in sources.values():
+        pdf.close()
+
+
+def _page_size(page: pikepdf.Page) -> Tuple[float, float]:
+    llx, lly, urx, ury = [float(v) for v in page.mediabox]
+    return urx - llx, ury - lly
+
+
+def impose(input_files: Sequence[str],
+        single_file: Optional[str] = None,
+        booklet_file: Optional[str] = None,
+        sheet_size: Optional[Tuple[float, float]] = None,
+        signature: int = 0,
+        pad: bool = False,
+        dedup: bool = True) -> int:
+    """Write the single-page and the booklet pdf, return the page count.
+
+    Parameters
+    ----------
+
+    - input_files: pdf files, all their pages are used in order.
+    - single_file: output pdf with one page per input page, or None.
+    - booklet_file: output pdf with two pages per sheet side, or None.
+    - sheet_size: (width, height) of the booklet sheets in points, default
+        to twice the width of the first page.
+    - signature: cf. `booklet_order`.
+    - pad: add blank pages at the end to get a multiple of 4 pages instead
+        of raising ValueError.
+    - dedup: whether to merge the identical objects, cf. `deduplicate`.
+
+    """
+    sources, pages = _read_pages(input_files)
+    try:
+        if booklet_file is not None:
+            # Check before writing anything.
+            sides = booklet_order(_padded_count(len(pages), pad), signature)
+
+        if single_file is not None:
+            with tracing.span('single', file=single_file,
+                    pages=len(pages)) as args:
+                single = Pdf.new()
+                for _, page in pages:
+                    single.pages.append(page)
+                _save(single, single_file, dedup, args)
+                args['bytes'] = os.path.getsize(single_file)
+
+        if booklet_file is not None:
+            if sheet_size is None:
+                width, height = _page_size(pages[0][1])
+                sheet_size = (2 * width, height)
+            sheet_width, sheet_height = sheet_size
+            cells = ((0.0, 0.0, sheet_width / 2, sheet_height),
+                    (sheet_width / 2, 0.0, sheet_width / 2, sheet_height))
+            with tracing.span('booklet', file=booklet_file,
+                    sides=len(sides)) as args:
+                _write_sheets(booklet_file, pages, sides, sheet_size,
+                        [cells] * len(sides), dedup=dedup, args=args)
+                args['bytes'] = os.path.getsize(booklet_file)
+    finally:
+        _close(sources)
+    return len(pages)
+
+
+def impose_corner(input_files: Sequence[str],
+        output_file: str,
+        sheet_size: Tuple[float, float] = g_a4_landscape,
+        signature: int = 4,
+        offset: Optional[Tuple[float, float]] = None,
+        margin: float = g_corner_margin,
+        cut_marks: bool = False,
+        pad: bool = False,
+        dedup: bool = True) -> int:
+    """Write a booklet with the pages at their natural size in a corner.
+
+    The two pages of a sheet side are placed side by side, centered on the
+    sheet and moved by `offset` on the front sides and by `-offset` on the
+    back sides, so that both sides are aligned when printed in duplex.
+    Return the page count.
+
+    Parameters
+    ----------
+
+    - input_files: pdf files, all their pages are used in order, all pages
+        must have the size of the first one.
+    - output_file: output pdf.
+    - sheet_size: (width, height) of the sheets in points.
+    - signature: cf. `booklet_order`.
+    - offset: (dx, dy) of the pages on the front sides in points, default
+        to the bottom-left corner at `margin` from the edges.
+    - margin: distance between the pages and the edges of the sheet when
+        `offset` is None, in points.
+    - cut_marks: whether to draw marks at the corners of the pages and at
+        the fold.
+    - pad, dedup: cf. `impose`.
+
+    """
+    sources, pages = _read_pages(input_files)
+    try:
+        sides = booklet_order(_padded_count(len(pages), pad), signature)
+        page_width, page_height = _page_size(pages[0][1])
+        sheet_width, sheet_height = sheet_size
+        x = (sheet_width - 2 * page_width) / 2
+        y = (sheet_height - page_height) / 2
+        if offset is None:
+            offset = (min(0.0, margin - x), min(0.0, margin - y))
+        # Sizes in mm are rounded in points.
+        tolerance = 0.01 * g_mm
+        if ((abs(offset[0]) > x + tolerance)
+                or (abs(offset[1]) > y + tolerance)):
+            raise ValueError('The pages do not fit on the sheet')
+        sides_cells = []
+        for i in range(len(sides)):
+            # Sides alternate front and back.
+            sign = 1 if i % 2 == 0 else -1
+            left = x + sign * offset[0]
+            bottom = y + sign * offset[1]
+            sides_cells.append((
+                (left, bottom, page_width, page_height),
+                (left + page_width, bottom, page_width, page_height)))
+        with tracing.span('corner', file=output_file,
+                sides=len(sides)) as args:
+            _write_sheets(output_file, pages, sides, sheet_size, sides_cells,
+                    cut_marks, dedup, args)
+            args['bytes'] = os.path.getsize(output_file)
+    finally:
+        _close(sources)
+    return len(pages)
+
+
+# Objects which are never merged: they are unique by nature, or must be
+# referenced only once.
+g_unique_types = ('/Annot', '/Catalog', '/Page', '/Pages')
+
+
+def _object_key(obj: pikepdf.Object) -> Optional[Tuple[str, bytes]]:
+    """Return a key equal for identical objects, None if never merged.
+
+    The references to other objects are part of the key, so that objects
+    become identical once the objects they refer to have been merged.
+
+    """
+    if isinstance(obj, pikepdf.Stream):
+        # /Length may be an indirect object, the data gives the length.
+        stream_dict = pikepdf.Dictionary({k: v
+            for k, v in obj.stream_dict.items() if k != '/Length'})
+        if stream_dict.get('/Type') in g_unique_types:
+            return None
+        return ('stream', stream_dict.unparse()
+                + hashlib.sha256(obj.read_raw_bytes()).digest())
+    if isinstance(obj, pikepdf.Dictionary):
+        if obj.get('/Type') in g_unique_types:
+            return None
+        return ('dictionary', obj.unparse(resolved=True))
+    if isinstance(obj, pikepdf.Array):
+        return ('array', obj.unparse(resolved=True))
+    return None
+
+
+def _replace_references(obj: pikepdf.Object,
+        replacements: Dict[Tuple[int, int], pikepdf.Object]):
+    """Replace the references in `obj` and its direct children."""
+    if isinstance(obj, pikepdf.Array):
+        items = enumerate(obj)
+    elif isinstance(obj, (pikepdf.Dictionary, pikepdf.Stream)):
+        items = obj.items()
+    else:
+        return
+    for k, v in list(items):
+        if not isinstance(v, pikepdf.Object):
+            # Numbers, booleans...
+            continue
+        if v.is_indirect:
+            replacement = replacements.get(v.objgen)
+            if replacement is not None:
+                obj[k] = replacement
+        else:
+            _replace_references(v, replacements)
+
+
+def deduplicate(pdf: Pdf) -> int:
+    """Merge the identical objects of `pdf`, return the number removed.
+
+    Streams are identical if they have the same dictionary and the same
+    encoded data, e.g. the same font program or the same image in several
+    pages. The merge is repeated until no more objects are identical, e.g.
+    for the font dictionaries using merged font programs. The removed
+    objects are not written when saving.
+
+    """
+    removed = set()
+    while True:
+        # key: first object with this key.
+        first: Dict[Tuple[str, bytes], pikepdf.Object] = {}
+        replacements: Dict[Tuple[int, int], pikepdf.Object] = {}
+        for obj in pdf.objects:
+            if obj.objgen in removed:
+                continue
+            key = _object_key(obj)
+            if key is None:
+                continue
+            kept = first.setdefault(key, obj)
+            if kept.objgen != obj.objgen:
+                replacements[obj.objgen] = kept
+        if not replacements:
+            return len(removed)
+        removed.update(replacements)
+        for obj in pdf.objects:
+            if obj.objgen not in removed:
+                _replace_references(obj, replacements)
+        _replace_references(pdf.trailer, replacements)
+
+
+def _save(pdf: Pdf, output_file: str, dedup: bool, args: Dict[str, Any]):
+    """Save `pdf`, after merging its identical objects if `dedup`."""
+    if dedup:
+        args['merged'] = deduplicate(pdf)
+    pdf.save(output_file,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate)
+
+
+def _padded_count(page_count: int, pad: bool) -> int:
+    if pad:
+        return page_count + -page_count % 4
+    return page_count
+
+
+def cut_marks_content(left: float, bottom: float,
+        width: float, height: float) -> str:
+    """Return the content stream drawing the cut marks around a block.
+
+    There are marks at the four corners and at the middle of the top and
+    bottom edges (fold).
+
+    """
+    right = left + width
+    top = bottom + height
+    middle = left + width / 2
+    gap = g_mark_gap
+    length = g_mark_length
+    lines = []
+    for x, dx in ((left, -1), (right, 1)):
+        for y, dy in ((bottom, -1), (top, 1)):
+            lines.append((x + dx * gap, y, x + dx * (gap + length), y))
+            lines.append((x, y + dy * gap, x, y + dy * (gap + length)))
+    for y, dy in ((bottom, -1), (top, 1)):
+        lines.append((middle, y + dy * gap, middle, y + dy * (gap + length)))
+    path = ' '.join('{:.3f} {:.3f} m {:.3f} {:.3f} l'.format(*line)
+            for line in lines)
+    return 'q 0.25 w 0 G {} S Q'.format(path)
+
+
+def _write_sheets(output_file: str,
+        pages: List[Tuple[Tuple[str, int], pikepdf.Page]],
+        sides: List[Tuple[int, int]],
+        sheet_size: Tuple[float, float],
+        sides_cells: List[Tuple[Tuple[float, float, float, float], ...]],
+        cut_marks: bool = False,
+        dedup: bool = True,
+        args: Optional[Dict[str, Any]] = None):
+    """Write one sheet side per element of `sides`.
+
+    Parameters
+    ----------
+
+    - output_file: output pdf.
+    - pages: (key, page) of the input pages.
+    - sides: (left, right) page indices, cf. `booklet_order`; indices
+        after the last page are blank pages.
+    - sheet_size: (width, height) of the sheets in points.
+    - sides_cells: for each side, the (x, y, width, height) of the left and
+        right page, the pages are centered and scaled to fit.
+    - cut_marks: whether to draw cut marks around the two cells.
+    - dedup: whether to merge the identical objects, cf. `deduplicate`.
+    - args: tracing arguments, completed with the number of merged objects.
+
+    """
+    output = Pdf.new()
+    forms = _Forms(output)
+    for side, cells in zip(sides, sides_cells):
+        sheet = output.add_blank_page(page_size=sheet_size)
+        xobjects = pikepdf.Dictionary()
+        content = []
+        for cell, index in zip(cells, side):
+            if index >= len(pages):
+                # Blank padding page.
+                continue
+            key, page = pages[index]
+            name = '/P{}'.format(index)
+            xobjects[name] = forms.get(key, page)
+            matrix = fit_matrix(page.mediabox, cell)
+            content.append('q {} cm {} Do Q'.format(
+                ' '.join('{:.6f}'.format(v) for v in matrix), name))
+        if cut_marks:
+            left = cells[0]
+            right = cells[-1]
+            content.append(cut_marks_content(left[0], left[1],
+                right[0] + right[2] - left[0], left[3]))
+        sheet.Resources = pikepdf.Dictionary(XObject=xobjects)
+        sheet.Contents = output.make_stream(
+                '\n'.join(content).encode('ascii'))
+    _save(output, output_file, dedup, {} if args is None else args)
+
+
+def parse_size(size: str) -> Tuple[float, float]:
+    """Return (width, height) in points from 'WIDTHxHEIGHT' in mm."""
+    try:
+        width, height = size.lower().split('x')
+        return float(width) * g_mm, float(height) * g_mm
+    except ValueError:
+        raise ValueError('Size must be "WIDTHxHEIGHT" in mm') from None
+
+
+if __name__ == '__main__':
+    usage = 'usage: %prog [options] input.pdf [input.pdf ...]'
+    parser = OptionParser(usage=usage)
+
+    parser.add_option('-s', '--single', dest='single_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help='output pdf with one page per input page')
+
+    parser.add_option('-b', '--booklet', dest='booklet_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help='output pdf with two pages per sheet side')
+
+    parser.add_option('-c', '--corner', dest='corner_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help=('output pdf with two pages per sheet side, at their'
+                ' natural size in a corner of the sheet'))
+
+    parser.add_option('-p', '--sheet-size', dest='sheet_size',
+            action='store', type=str, metavar='WxH', default=None,
+            help=('size of the sheets in mm, e.g. 297x210, default to twice'
+                ' the width of the first page for --booklet and to A4'
+                ' landscape for --corner'))
+
+    parser.add_option('-g', '--signature', dest='signature',
+            action='store', type=int, default=None,
+            help=('number of pages of each group of nested sheets, a'
+                ' multiple of 4, default to all pages for --booklet and'
+                ' to 4 for --corner'))
+
+    parser.add_option('-f', '--offset', dest='offset',
+            action='store', type=str, metavar='DXxDY', default=None,
+            help=('offset of the pages on the front sides in mm with'
+                ' --corner, e.g. -9.6x-6.5, default to the bottom-left'
+                ' corner'))
+
+    parser.add_option('-k', '--cut-marks', dest='cut_marks',
+            action='store_true', default=False,
+            help='draw cut marks with --corner')
+
+    parser.add_option('--pad', dest='pad',
+            action='store_true', default=False,
+            help='add blank pages to get a multiple of 4 pages')
+
+    parser.add_option('--no-dedup', dest='dedup',
+            action='store_false', default=True,
+            help='do not merge the identical fonts, images and forms')
+
+    options, args = parser.parse_args()
+    if not args:
+        parser.error('input files missing')
+    if not (options.single_file or options.booklet_file
+            or options.corner_file):
+        parser.error('--single, --booklet or --corner is required')
+    try:
+        sheet_size = (parse_size(options.sheet_size)
+                if options.sheet_size else None)
+        if options.single_file or options.booklet_file:
+            impose(args,
+                    single_file=options.single_file,
+                    booklet_file=options.booklet_file,
+                    sheet_size=sheet_size,
+                    signature=options.signature or 0,
+                    pad=options.pad,
+                    dedup=options.dedup)
+        if options.corner_file:
+            impose_corner(args, options.corner_file,
+                    sheet_size=sheet_size or g_a4_landscape,
+                    signature=(4 if options.signature is None
+                        else options.signature),
+                    offset=(parse_size(options.offset)
+                        if options.offset else None),
+                    cut_marks=options.cut_marks,
+                    pad=options.pad,
+                    dedup=options.dedup)
+    except ValueError as e:
+        parser.error(str(e))
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# Convert svg files to pdf with a pool of long-lived Inkscape processes in
+# shell mode (`inkscape --shell`), one per core by default, instead of
+# starting Inkscape once per page.
+#
+# Each worker is fed conversion jobs from a common queue. A worker that
+# crashes, hangs or doesn't write its output is restarted and the job is
+# retried on another attempt.
+
+import os
+from optparse import OptionParser
+import queue
+import re
+import select
+import subprocess
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import tracing
+
+__all__ = [
+        'InkscapePool',
+        'convert',
+        ]
+
+# Prompt of the Inkscape shell.
+_prompt = b'>'
+
+
+def inkscape_version(inkscape: str = 'inkscape') -> Tuple[int, int]:
+    """Return (major, minor) of the Inkscape version."""
+    output = subprocess.run([inkscape, '--version'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True).stdout.decode('utf-8', 'replace')
+    match = re.search(r'Inkscape (\d+)\.(\d+)', output)
+    if not match:
+        raise RuntimeError('Cannot get the version of {}'.format(inkscape))
+    return int(match.group(1)), int(match.group(2))
+
+
+class InkscapeError(RuntimeError):
+    pass
+
+
+class _Worker:
+    """One Inkscape process in shell mode."""
+
+    def __init__(self, inkscape: str, version: Tuple[int, int],
+            timeout: float):
+        self.inkscape = inkscape
+        self.version = version
+        self.timeout = timeout
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self):
+        self.process = subprocess.Popen([self.inkscape, '--shell'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL)
+        self._read_prompt()
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.write(b'quit\n')
+            self.process.stdin.flush()
+            self.process.wait(5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def restart(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+        self.start()
+
+    def command(self, svg_file: str, pdf_file: str) -> bytes:
+        """Return the shell command to convert one file."""
+        if self.version >= (1, 1):
+            line = 'file-open:{};export-filename:{};export-do;file-close\n'
+        elif self.version >= (1, 0):
+            # No action file-close before Inkscape 1.1.
+            line = 'file-open:{};export-filename:{};export-do\n'
+        else:
+            line = '{} --export-pdf={}\n'
+        return line.format(svg_file, pdf_file).encode('utf-8')
+
+    def convert(self, svg_file: str, pdf_file: str):
+        """Convert one file, raise InkscapeError on failure."""
+        if self.process is None:
+            self.start()
+        try:
+            os.remove(pdf_file)
+        except FileNotFoundError:
+            pass
+        try:
+            self.process.stdin.write(self.command(svg_file, pdf_file))
+            self.process.stdin.flush()
+        except OSError:
+            raise InkscapeError('Inkscape exited') from None
+        self._read_prompt()
+        if not os.path.exists(pdf_file) or not os.path.getsize(pdf_file):
+            raise InkscapeError('{} not written'.format(pdf_file))
+
+    def _read_prompt(self):
+        """Read the output until the next prompt."""
+        fd = self.process.stdout.fileno()
+        deadline = time.monotonic() + self.timeout
+        output = b''
+        while not output.rstrip().endswith(_prompt):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise InkscapeError('Inkscape timed out')
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            data = os.read(fd, 4096)
+            if not data:
+                raise InkscapeError('Inkscape exited')
+            # Only the end is needed to find the prompt.
+            output = output[-256:] + data
+
+
+class InkscapePool:
+    """A pool of Inkscape processes to convert svg files to pdf."""
+
+    def __init__(self,
+            workers: Optional[int] = None,
+            inkscape: str = 'inkscape',
+            retries: int = 2,
+            timeout: float = 120.0,
+            persistent: bool = False):
+        """
+        Parameters
+        ----------
+
+        - workers: number of Inkscape processes, default to the number of
+            cores.
+        - inkscape: Inkscape executable.
+        - retries: number of additional attempts for a failed job.
+        - timeout: maximum duration of one job, in seconds.
+        - persistent: keep the Inkscape processes between calls of
+            `convert` until `close`, e.g. for a long-running process.
+
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.inkscape = inkscape
+        self.retries = retries
+        self.timeout = timeout
+        self.persistent = persistent
+        self._version = inkscape_version(inkscape)
+        # Running workers kept by a persistent pool.
+        self._idle: List[_Worker] = []
+        self._idle_lock = threading.Lock()
+
+    def __enter__(self) -> 'InkscapePool':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Stop the Inkscape processes kept by a persistent pool."""
+        with self._idle_lock:
+            workers = self._idle
+            self._idle = []
+        for worker in workers:
+            worker.stop()
+
+    def convert(self, jobs: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Convert the files and return the failed jobs.
+
+        Parameters
+        ----------
+
+        - jobs: iterable of (svg file, pdf file).
+
+        """
+        jobs_queue: queue.Queue = queue.Queue()
+        job_count = 0
+        for svg_file, pdf_file in jobs:
+            jobs_queue.put((os.path.abspath(svg_file),
+                os.path.abspath(pdf_file), 0))
+            job_count += 1
+        failed: List[Tuple[str, str]] = []
+        lock = threading.Lock()
+        threads = [threading.Thread(target=self._run,
+                args=(jobs_queue, failed, lock))
+                for _ in range(min(self.workers, job_count))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return failed
+
+    def _run(self, jobs_queue: queue.Queue, failed: List[Tuple[str, str]],
+            lock: threading.Lock):
+        with self._idle_lock:
+            worker = self._idle.pop() if self._idle else None
+        if worker is None:
+            worker = _Worker(self.inkscape, self._version, self.timeout)
+        try:
+            while True:
+                try:
+                    svg_file, pdf_file, attempt = jobs_queue.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    with tracing.span('inkscape', 'page', file=svg_file,
+                            attempt=attempt) as args:
+                        args['ok'] = False
+                        worker.convert(svg_file, pdf_file)
+                        args['ok'] = True
+                        args['bytes'] = os.path.getsize(pdf_file)
+                except (InkscapeError, OSError):
+                    # Start from a fresh process, the job is put back for
+                    # any worker.
+                    try:
+                        worker.restart()
+                    except (InkscapeError, OSError):
+                        pass
+                    if attempt < self.retries:
+                        jobs_queue.put((svg_file, pdf_file, attempt + 1))
+                    else:
+                        with lock:
+                            failed.append((svg_file, pdf_file))
+        finally:
+            if self.persistent:
+                with self._idle_lock:
+                    self._idle.append(worker)
+            else:
+                worker.stop()
+
+
+def convert(svg_files: Iterable[str],
+        output_dir: Optional[str] = None,
+        **kwargs) -> List[Tuple[str, str]]:
+    """Convert svg files to pdf files with the same base name.
+
+    Return the failed jobs (svg file, pdf file). Keyword arguments are
+    those of `InkscapePool`.
+
+    Parameters
+    ----------
+
+    - svg_files: svg files.
+    - output_dir: directory of the pdf files, default to the directory of
+        each svg file.
+
+    """
+    jobs = []
+    for svg_file in svg_files:
+        pdf_file = os.path.splitext(svg_file)[0] + '.pdf'
+        if output_dir is not None:
+            pdf_file = os.path.join(output_dir, os.path.basename(pdf_file))
+        jobs.append((svg_file, pdf_file))
+    return InkscapePool(**kwargs).convert(jobs)
+
+
+if __name__ == '__main__':
+    usage = 'usage: %prog [options] file.svg [file.svg ...]'
+    parser = OptionParser(usage=usage)
+
+    parser.add_option('-j', '--jobs', dest='jobs',
+            action='store', type=int, default=0,
+            help='number of Inkscape processes, default to the number of cores')
+
+    parser.add_option('-D', '--output-dir', dest='output_dir',
+            action='store', type=str, metavar='DIR', default=None,
+            help='directory of the pdf files')
+
+    parser.add_option('-i', '--inkscape', dest='inkscape',
+            action='store', type=str, default='inkscape',
+            help='Inkscape executable')
+
+    parser.add_option('-r', '--retries', dest='retries',
+            action='store', type=int, default=2,
+            help='number of additional attempts for a failed page')
+
+    parser.add_option('-t', '--timeout', dest='timeout',
+            action='store', type=float, default=120.0,
+            help='maximum duration of one page, in seconds')
+
+    options, args = parser.parse_args()
+    if not args:
+        parser.error('svg files missing')
+    failed = convert(args,
+            output_dir=options.output_dir,
+            workers=options.jobs or None,
+            inkscape=options.inkscape,
+            retries=options.retries,
+            timeout=options.timeout)
+    for svg_file, pdf_file in failed:
+        print('Failed to convert {}'.format(svg_file))
+    if failed:
+        raise SystemExit(1)
@@ -0,0 +1,263 @@
+# Layouts of the csv data: which unit of time goes on a row, i.e. on a page or
+# a double page of the agenda.
+#
+# - week: one week per double page, the format of `Calendar.write_csv`.
+# - day: one day per page.
+# - month: one month per page, with one slot per day of the month.
+#
+# The column names of a layout are computed once, the fields of a day come
+# from `Day.fields` (cf. `g_day_columns` in csvcalendar.py) so that all
+# layouts use the same columns for the days: for a slot `s` (e.g. 'monday',
+# 'day' or 'day_1'), `s` is the day number, then come `birthdays_s`,
+# `namedays_s`, `events_s`, `moon_s` and `holiday_s`.
+#
+# A layout can be restricted to the columns used by the templates (`keep`),
+# the other fields are then neither computed nor written.
+
+import calendar
+import csv
+import datetime
+from typing import (Callable, Dict, FrozenSet, Iterable, Iterator, List,
+        Optional, Sequence, TextIO, Type, Union)
+
+from csvcalendar import Calendar
+from csvcalendar import CsvDialect
+from csvcalendar import Day
+from csvcalendar import Week
+from csvcalendar import g_day_columns
+from csvcalendar import g_week_columns
+from csvcalendar import g_weekdays
+
+__all__ = [
+        'DayLayout',
+        'Layout',
+        'MonthLayout',
+        'WeekLayout',
+        'get_layout',
+        ]
+
+g_weekday_names = [w.capitalize() for w in g_weekdays]
+
+Row = List[Union[int, str]]
+Fields = Sequence[Union[int, str]]
+
+
+def _slot_columns(slot: str) -> List[str]:
+    return [c.format(slot) for c in g_day_columns]
+
+
+class Layout:
+    """Base class of the layouts, one csv row per unit of time."""
+
+    # Name of the layout for `get_layout`.
+    name = ''
+
+    # Columns always written, the pages are named after them.
+    required = ('code',)
+
+    def __init__(self,
+            start_page: int = 2,
+            weekdays: Optional[Sequence[str]] = None,
+            keep: Optional[Iterable[str]] = None):
+        """
+        Parameters
+        ----------
+
+        - start_page: page of the first row.
+        - weekdays: names of the days from Monday, default to
+            `g_weekday_names`.
+        - keep: names of the columns to write, e.g. the placeholders of the
+            templates (cf. `svgrender.template_placeholders`), default to
+            all. The columns in `required` are always written.
+
+        """
+        self.start_page = start_page
+        self.weekdays = list(weekdays or g_weekday_names)
+        self.keep: Optional[FrozenSet[str]] = None
+        if keep is not None:
+            self.keep = frozenset(keep).union(self.required)
+        self.columns = tuple(c for c in self._columns() if self._kept(c))
+
+    def _columns(self) -> List[str]:
+        """Return the names of all the columns of the layout."""
+        raise NotImplementedError
+
+    def _kept(self, column: str) -> bool:
+        return self.keep is None or column in self.keep
+
+    def _selector(self, columns: Sequence[str]) -> Callable[[Fields], Fields]:
+        """Return a function selecting the kept fields among `columns`."""
+        indices = [i for i, c in enumerate(columns) if self._kept(c)]
+        if len(indices) == len(columns):
+            return lambda fields: fields
+        return lambda fields: [fields[i] for i in indices]
+
+    def _slot_fields(self, slot: str) -> Callable[[Day], Fields]:
+        """Return a function computing the kept fields of a day slot."""
+        getters = [getter for column, getter
+                in zip(_slot_columns(slot), Day.field_getters())
+                if self._kept(column)]
+        if len(getters) == len(g_day_columns):
+            return Day.fields
+        return lambda day: [getter(day) for getter in getters]
+
+    def rows(self, cal: Calendar) -> Iterator[Row]:
+        """Yield the rows of the calendar, without header."""
+        raise NotImplementedError
+
+    def header_row(self) -> List[str]:
+        """Return the csv column names."""
+        return list(self.columns)
+
+    def iter_rows(self, cal: Calendar, header: bool = True) -> Iterator[Row]:
+        """Yield the csv rows, cf. `Calendar.iter_rows`."""
+        if not cal.weeks:
+            return
+        if header:
+            yield self.header_row()
+        yield from self.rows(cal)
+
+    def write_csv(self, cal: Calendar, stream: TextIO, header: bool = True):
+        """Write the csv data to `stream`, cf. `Calendar.write_csv`."""
+        csv.writer(stream, CsvDialect).writerows(self.iter_rows(cal, header))
+
+
+class WeekLayout(Layout):
+    """One week per double page, as `Calendar.write_csv`.
+
+    The page numbers are those of the calendar, `start_page` is not used.
+
+    """
+
+    name = 'week'
+
+    required = ('code', 'page_left', 'page_right')
+
+    def _columns(self) -> List[str]:
+        return Week.header_row()
+
+    def row_function(self) -> Callable[[Week], Row]:
+        """Return the function computing the row of one week."""
+        if self.keep is None:
+            return Week.row
+        head = self._selector(g_week_columns)
+        slots = [self._slot_fields(weekday) for weekday in g_weekdays]
+
+        def row(week: Week) -> Row:
+            data = list(head(week.fields()))
+            for day, fields in zip(week.days, slots):
+                data.extend(fields(day))
+            return data
+        return row
+
+    def rows(self, cal: Calendar) -> Iterator[Row]:
+        row = self.row_function()
+        for week in cal.weeks:
+            yield row(week)
+
+
+class DayLayout(Layout):
+    """One day per page.
+
+    The columns are 'code' (yyyy-mm-dd), 'page', 'weekday', 'week' (ISO
+    week number), 'month' and the columns of the slot 'day'.
+
+    """
+
+    name = 'day'
+
+    required = ('code', 'page')
+
+    _head_columns = ('code', 'page', 'weekday', 'week', 'month')
+
+    def _columns(self) -> List[str]:
+        return list(self._head_columns) + _slot_columns('day')
+
+    def rows(self, cal: Calendar) -> Iterator[Row]:
+        weekdays = self.weekdays
+        months = cal.months
+        page = self.start_page
+        head = self._selector(self._head_columns)
+        fields = self._slot_fields('day')
+        for week in cal.weeks:
+            number = week.number
+            for weekday, day in zip(weekdays, week.days):
+                date = day.date
+                row = list(head([date.isoformat(), '{:03}'.format(page),
+                    weekday, number, months[date.month - 1]]))
+                row.extend(fields(day))
+                yield row
+                page += 1
+
+
+class MonthLayout(Layout):
+    """One month per page.
+
+    The columns are 'code' (yyyy-mm), 'page', 'month', 'year', then, for
+    each day `n` from 1 to 31, 'weekday_n' and the columns of the slot
+    'day_n'. The slots after the end of the month are empty, as the days
+    out of the calendar.
+
+    """
+
+    name = 'month'
+
+    required = ('code', 'page')
+
+    _head_columns = ('code', 'page', 'month', 'year')
+
+    def _columns(self) -> List[str]:
+        columns = list(self._head_columns)
+        for n in range(1, 32):
+            columns.append('weekday_{}'.format(n))
+            columns += _slot_columns('day_{}'.format(n))
+        return columns
+
+    def rows(self, cal: Calendar) -> Iterator[Row]:
+        weekdays = self.weekdays
+        page = self.start_page
+        year = cal.first_day.year
+        month = cal.first_day.month
+        head = self._selector(self._head_columns)
+        # (whether weekday_n is kept, fields of day_n, empty fields of day_n)
+        # for n from 1 to 31.
+        slots = []
+        for n in range(1, 32):
+            slot = 'day_{}'.format(n)
+            width = sum(1 for c in _slot_columns(slot) if self._kept(c))
+            with_weekday = self._kept('weekday_{}'.format(n))
+            slots.append((with_weekday, self._slot_fields(slot),
+                ('',) * (width + with_weekday)))
+        while (year, month) <= (cal.last_day.year, cal.last_day.month):
+            row = list(head(['{}-{:02}'.format(year, month),
+                '{:03}'.format(page), cal.months[month - 1], year]))
+            first_weekday, length = calendar.monthrange(year, month)
+            for n, (with_weekday, fields, empty) in enumerate(slots, 1):
+                day = None
+                if n <= length:
+                    # None out of [cal.first_day, cal.last_day].
+                    day = cal.day(datetime.date(year, month, n))
+                if day is None:
+                    row.extend(empty)
+                    continue
+                if with_weekday:
+                    row.append(weekdays[(first_weekday + n - 1) % 7])
+                row.extend(fields(day))
+            yield row
+            page += 1
+            month += 1
+            if month > 12:
+                year += 1
+                month = 1
+
+
+g_layouts: Dict[str, Type[Layout]] = {
+        layout.name: layout for layout in (WeekLayout, DayLayout, MonthLayout)}
+
+
+def get_layout(name: str, **kwargs) -> Layout:
+    """Return the layout from its name, keyword arguments are for Layout."""
+    if name not in g_layouts:
+        raise ValueError('Layout must be one of {}'.format(
+            ', '.join(g_layouts)))
+    return g_layouts[name](**kwargs)
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# Dates of the principal moon phases (new moon, first quarter, full moon, last
+# quarter), to replace templates/moon.csv.
+#
+# The phases are computed with the algorithm from Jean Meeus, Astronomical
+# Algorithms, 2nd ed., chapter 49, vectorised over the lunations with NumPy.
+# The result is precise to a few minutes, the phase dates are given in local
+# time with a fixed offset from UTC.
+# The dates of a year are cached on disk, one file per year and UTC offset,
+# with lines "yyyy-mm-dd,i" where i is the phase index (0 for new moon, 1 for
+# first quarter, 2 for full moon, 3 for last quarter).
+#
+# Requires NumPy.
+
+import datetime
+import os
+from optparse import OptionParser
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from csvcalendar import Calendar
+
+__all__ = [
+        'g_glyphs',
+        'moon_phases',
+        'set_moon_phases',
+        ]
+
+# Glyphs for new moon, first quarter, full moon and last quarter, cf. the
+# header of csvcalendar.py.
+g_glyphs = {
+        'circles': ('●', '◐', '○', '◑'),
+        'weather-icons': ('', '', '', ''),
+        'emoji': ('🌑', '🌓', '🌕', '🌗'),
+        }
+
+g_cache_dir = os.path.join(
+        os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+        'cage', 'moon')
+
+# Julian day of 1970-01-01T00:00 UTC.
+_jd_unix_epoch = 2440587.5
+
+_deg = np.pi / 180.0
+
+# Periodic terms for new and full moons, (coefficient, power of E,
+# multiples of M, M', F, Omega). Meeus, p. 351.
+_new_moon_terms = [
+        (-0.40720, 0, 0, 1, 0, 0),
+        (0.17241, 1, 1, 0, 0, 0),
+        (0.01608, 0, 0, 2, 0, 0),
+        (0.01039, 0, 0, 0, 2, 0),
+        (0.00739, 1, -1, 1, 0, 0),
+        (-0.00514, 1, 1, 1, 0, 0),
+        (0.00208, 2, 2, 0, 0, 0),
+        (-0.00111, 0, 0, 1, -2, 0),
+        (-0.00057, 0, 0, 1, 2, 0),
+        (0.00056, 1, 1, 2, 0, 0),
+        (-0.00042, 0, 0, 3, 0, 0),
+        (0.00042, 1, 1, 0, 2, 0),
+        (0.00038, 1, 1, 0, -2, 0),
+        (-0.00024, 1, -1, 2, 0, 0),
+        (-0.00017, 0, 0, 0, 0, 1),
+        (-0.00007, 0, 2, 1, 0, 0),
+        (0.00004, 0, 0, 2, -2, 0),
+        (0.00004, 0, 3, 0, 0, 0),
+        (0.00003, 0, 1, 1, -2, 0),
+        (0.00003, 0, 0, 2, 2, 0),
+        (-0.00003, 0, 1, 1, 2, 0),
+        (0.00003, 0, -1, 1, 2, 0),
+        (-0.00002, 0, -1, 1, -2, 0),
+        (-0.00002, 0, 1, 3, 0, 0),
+        (0.00002, 0, 0, 4, 0, 0),
+        ]
+
+_full_moon_terms = [
+        (-0.40614, 0, 0, 1, 0, 0),
+        (0.17302, 1, 1, 0, 0, 0),
+        (0.01614, 0, 0, 2, 0, 0),
+        (0.01043, 0, 0, 0, 2, 0),
+        (0.00734, 1, -1, 1, 0, 0),
+        (-0.00515, 1, 1, 1, 0, 0),
+        (0.00209, 2, 2, 0, 0, 0),
+        (-0.00111, 0, 0, 1, -2, 0),
+        (-0.00057, 0, 0, 1, 2, 0),
+        (0.00056, 1, 1, 2, 0, 0),
+        (-0.00042, 0, 0, 3, 0, 0),
+        (0.00042, 1, 1, 0, 2, 0),
+        (0.00038, 1, 1, 0, -2, 0),
+        (-0.00024, 1, -1, 2, 0, 0),
+        (-0.00017, 0, 0, 0, 0, 1),
+        (-0.00007, 0, 2, 1, 0, 0),
+        (0.00004, 0, 0, 2, -2, 0),
+        (0.00004, 0, 3, 0, 0, 0),
+        (0.00003, 0, 1, 1, -2, 0),
+        (0.00003, 0, 0, 2, 2, 0),
+        (-0.00003, 0, 1, 1, 2, 0),
+        (0.00003, 0, -1, 1, 2, 0),
+        (-0.00002, 0, -1, 1, -2, 0),
+        (-0.00002, 0, 1, 3, 0, 0),
+        (0.00002, 0, 0, 4, 0, 0),
+        ]
+
+_quarter_terms = [
+        (-0.62801, 0, 0, 1, 0, 0),
+        (0.17172, 1, 1, 0, 0, 0),
+        (-0.01183, 1, 1, 1, 0, 0),
+        (0.00862, 0, 0, 2, 0, 0),
+        (0.00804, 0, 0, 0, 2, 0),
+        (0.00454, 1, -1, 1, 0, 0),
+        (0.00204, 2, 2, 0, 0, 0),
+        (-0.00180, 0, 0, 1, -2, 0),
+        (-0.00070, 0, 0, 1, 2, 0),
+        (-0.00040, 0, 0, 3, 0, 0),
+        (-0.00034, 1, -1, 2, 0, 0),
+        (0.00032, 1, 1, 0, 2, 0),
+        (0.00032, 1, 1, 0, -2, 0),
+        (-0.00028, 2, 2, 1, 0, 0),
+        (0.00027, 1, 1, 2, 0, 0),
+        (-0.00017, 0, 0, 0, 0, 1),
+        (-0.00005, 0, -1, 1, -2, 0),
+        (0.00004, 0, 0, 2, 2, 0),
+        (-0.00004, 0, 1, 1, 2, 0),
+        (0.00004, 0, -2, 1, 0, 0),
+        (0.00003, 0, 1, 1, -2, 0),
+        (0.00003, 0, 3, 0, 0, 0),
+        (0.00002, 0, 0, 2, -2, 0),
+        (0.00002, 0, -1, 1, 2, 0),
+        (-0.00002, 0, 1, 3, 0, 0),
+        ]
+
+# Planetary arguments A1 to A14, (constant, coefficient of k, coefficient of
+# the correction). Meeus, p. 351-352.
+_planetary_terms = [
+        (299.77, 0.107408, 0.000325),
+        (251.88, 0.016321, 0.000165),
+        (251.83, 26.651886, 0.000164),
+        (349.42, 36.412478, 0.000126),
+        (84.66, 18.206239, 0.000110),
+        (141.74, 53.303771, 0.000062),
+        (207.14, 2.453732, 0.000060),
+        (154.84, 7.306860, 0.000056),
+        (34.52, 27.261239, 0.000047),
+        (207.19, 0.121824, 0.000042),
+        (291.34, 1.844379, 0.000040),
+        (161.72, 24.198154, 0.000037),
+        (239.56, 25.513099, 0.000035),
+        (331.55, 3.592518, 0.000023),
+        ]
+
+# Polynomials of TT - UT in seconds of Espenak and Meeus, cf.
+# https://eclipse.gsfc.nasa.gov/SEcat5/deltatpoly.html, (end year, origin,
+# scale, coefficients from the constant) for u = (year - origin) / scale,
+# valid from the end year of the previous segment. Before -500 and after 2150,
+# TT - UT is -20 + 32 * ((year - 1820) / 100)**2.
+_delta_t_segments = [
+        (-500.0, 1820.0, 100.0, (-20.0, 0.0, 32.0)),
+        (500.0, 0.0, 100.0, (10583.6, -1014.41, 33.78311, -5.952053,
+            -0.1798452, 0.022174192, 0.0090316521)),
+        (1600.0, 1000.0, 100.0, (1574.2, -556.01, 71.23472, 0.319781,
+            -0.8503463, -0.005050998, 0.0083572073)),
+        (1700.0, 1600.0, 1.0, (120.0, -0.9808, -0.01532, 1.0 / 7129.0)),
+        (1800.0, 1700.0, 1.0, (8.83, 0.1603, -0.0059285, 0.00013336,
+            -1.0 / 1174000.0)),
+        (1860.0, 1800.0, 1.0, (13.72, -0.332447, 0.0068612, 0.0041116,
+            -0.00037436, 0.0000121272, -0.0000001699, 0.000000000875)),
+        (1900.0, 1860.0, 1.0, (7.62, 0.5737, -0.251754, 0.01680668,
+            -0.0004473624, 1.0 / 233174.0)),
+        (1920.0, 1900.0, 1.0, (-2.79, 1.494119, -0.0598939, 0.0061966,
+            -0.000197)),
+        (1941.0, 1920.0, 1.0, (21.20, 0.84493, -0.076100, 0.0020936)),
+        (1961.0, 1950.0, 1.0, (29.07, 0.407, -1.0 / 233.0, 1.0 / 2547.0)),
+        (1986.0, 1975.0, 1.0, (45.45, 1.067, -1.0 / 260.0, -1.0 / 718.0)),
+        (2005.0, 2000.0, 1.0, (63.86, 0.3345, -0.060374, 0.0017275,
+            0.000651814, 0.00002373599)),
+        (2050.0, 2000.0, 1.0, (62.92, 0.32217, 0.005589)),
+        # -20 + 32 * u**2 - 0.5628 * (2150 - year) with u = (year - 1820) / 100.
+        (2150.0, 1820.0, 100.0, (-20.0 - 0.5628 * 330.0, 56.28, 32.0)),
+        ]
+
+
+def delta_t(year: np.ndarray) -> np.ndarray:
+    """Return TT - UT in days (Espenak and Meeus polynomials)."""
+    conditions = [year < end for end, _, _, _ in _delta_t_segments]
+    choices = [np.polynomial.polynomial.polyval((year - origin) / scale,
+        coefficients) for _, origin, scale, coefficients in _delta_t_segments]
+    u = (year - 1820.0) / 100.0
+    seconds = np.select(conditions, choices, -20.0 + 32.0 * u**2)
+    return seconds / 86400.0
+
+
+def _periodic(terms, e, m, mp, f, omega) -> np.ndarray:
+    total = np.zeros_like(m)
+    for coeff, e_power, i_m, i_mp, i_f, i_omega in terms:
+        total += (coeff * e**e_power
+                * np.sin(i_m * m + i_mp * mp + i_f * f + i_omega * omega))
+    return total
+
+
+def phase_jde(k: np.ndarray) -> np.ndarray:
+    """Return the Julian Ephemeris Days of the phases of lunations `k`.
+
+    The fractional part of k gives the phase: .0 for new moon, .25 for first
+    quarter, .5 for full moon and .75 for last quarter.
+    k = 0 is the new moon of 2000-01-06.
+
+    """
+    t = k / 1236.85
+    jde = (2451550.09766 + 29.530588861 * k + 0.00015437 * t**2
+            - 0.000000150 * t**3 + 0.00000000073 * t**4)
+    e = 1.0 - 0.002516 * t - 0.0000074 * t**2
+    m = (2.5534 + 29.10535670 * k - 0.0000014 * t**2
+            - 0.00000011 * t**3) * _deg
+    mp = (201.5643 + 385.81693528 * k + 0.0107582 * t**2
+            + 0.00001238 * t**3 - 0.000000058 * t**4) * _deg
+    f = (160.7108 + 390.67050284 * k - 0.0016118 * t**2
+            - 0.00000227 * t**3 + 0.000000011 * t**4) * _deg
+    omega = (124.7746 - 1.56375588 * k + 0.0020672 * t**2
+            + 0.00000215 * t**3) * _deg
+
+    phase = np.rint((k - np.floor(k)) * 4).astype(int) % 4
+    correction = np.select(
+            [phase == 0, phase == 2],
+            [_periodic(_new_moon_terms, e, m, mp, f, omega),
+                _periodic(_full_moon_terms, e, m, mp, f, omega)],
+            _periodic(_quarter_terms, e, m, mp, f, omega))
+    w = (0.00306 - 0.00038 * e * np.cos(m) + 0.00026 * np.cos(mp)
+            - 0.00002 * np.cos(mp - m) + 0.00002 * np.cos(mp + m)
+            + 0.00002 * np.cos(2 * f))
+    correction += np.select([phase == 1, phase == 3], [w, -w], 0.0)
+
+    for constant, coeff_k, coeff in _planetary_terms:
+        a = constant + coeff_k * k
+        if constant == 299.77:
+            a = a - 0.009173 * t**2
+        correction += coeff * np.sin(a * _deg)
+    return jde + correction
+
+
+def compute_phases(year: int, utc_offset: float = 0.0
+        ) -> List[Tuple[datetime.date, int]]:
+    """Return the (date, phase index) of the phases in `year`.
+
+    Parameters
+    ----------
+
+    - year: year.
+    - utc_offset: offset from UTC in hours of the time zone for the dates.
+
+    """
+    k0 = np.floor((year - 2000) * 12.3685) - 1
+    k = k0 + np.arange(4 * 16) / 4.0
+    jde = phase_jde(k)
+    jd = jde - delta_t(year + (jde - jde[0]) / 365.25)
+    days = np.floor(jd - _jd_unix_epoch + utc_offset / 24.0).astype(np.int64)
+    dates = days.astype('datetime64[D]')
+    phases = np.rint((k - k0) * 4).astype(int) % 4
+    in_year = dates.astype('datetime64[Y]').astype(int) + 1970 == year
+    return [(d, int(p)) for d, p in zip(dates[in_year].tolist(),
+        phases[in_year])]
+
+
+def _cache_file(cache_dir: str, year: int, utc_offset: float) -> str:
+    return os.path.join(cache_dir, 'moon-{}-utc{:+g}.csv'.format(
+        year, utc_offset))
+
+
+def year_phases(year: int,
+        utc_offset: float = 0.0,
+        cache_dir: Optional[str] = g_cache_dir
+        ) -> List[Tuple[datetime.date, int]]:
+    """Return the (date, phase index) of the phases in `year`, cached.
+
+    Parameters
+    ----------
+
+    - year: year.
+    - utc_offset: offset from UTC in hours of the time zone for the dates.
+    - cache_dir: directory of the cache files, None to disable the cache.
+
+    """
+    if cache_dir is None:
+        return compute_phases(year, utc_offset)
+    filename = _cache_file(cache_dir, year, utc_offset)
+    try:
+        with open(filename, 'r') as f:
+            return [(datetime.date.fromisoformat(l[:10]), int(l[11]))
+                    for l in f if l.strip()]
+    except (OSError, ValueError, IndexError):
+        pass
+    phases = compute_phases(year, utc_offset)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary file first for concurrent runs.
+    tmp_filename = '{}.{}'.format(filename, os.getpid())
+    with open(tmp_filename, 'w') as f:
+        for date, phase in phases:
+            f.write('{},{}\n'.format(date.isoformat(), phase))
+    os.replace(tmp_filename, filename)
+    return phases
+
+
+def moon_phases(first_day: datetime.date,
+        last_day: datetime.date,
+        utc_offset: float = 0.0,
+        cache_dir: Optional[str] = g_cache_dir
+        ) -> List[Tuple[datetime.date, int]]:
+    """Return the (date, phase index) of the phases in [first_day, last_day].
+
+    Cf. `year_phases` for the parameters.
+
+    """
+    phases = []
+    for year in range(first_day.year, last_day.year + 1):
+        phases += [(d, p) for d, p in year_phases(year, utc_offset, cache_dir)
+                if first_day <= d <= last_day]
+    return phases
+
+
+def set_moon_phases(cal: Calendar,
+        glyphs: Sequence[str] = g_glyphs['circles'],
+        utc_offset: float = 0.0,
+        cache_dir: Optional[str] = g_cache_dir):
+    """Set the moon phases of the whole calendar.
+
+    Parameters
+    ----------
+
+    - cal: calendar to fill.
+    - glyphs: texts for new moon, first quarter, full moon and last quarter.
+    - utc_offset: offset from UTC in hours of the time zone for the dates.
+    - cache_dir: directory of the cache files, None to disable the cache.
+
+    """
+    if len(glyphs) != 4:
+        raise ValueError('Four moon glyphs are required')
+    for date, phase in moon_phases(cal.first_day, cal.last_day, utc_offset,
+            cache_dir):
+        cal.set_moon(date.isoformat(), glyphs[phase])
+
+
+def get_glyphs(name: str) -> Sequence[str]:
+    """Return the glyphs from a name in `g_glyphs` or a 4-character string."""
+    if name in g_glyphs:
+        return g_glyphs[name]
+    if len(name) == 4:
+        return tuple(name)
+    raise ValueError('Moon glyphs must be one of {} or 4 characters'.format(
+        ', '.join(g_glyphs)))
+
+
+if __name__ == '__main__':
+    usage = 'usage: %prog [options] start_year [end_year]'
+    parser = OptionParser(usage=usage,
+            description='Print the moon phases in the format of moon.csv.')
+
+    parser.add_option('-g', '--glyphs', dest='glyphs',
+            action='store', type=str, default='circles',
+            help=('glyphs for new moon, first quarter, full moon and last'
+                ' quarter: one of {} or 4 characters'.format(
+                    ', '.join(g_glyphs))))
+
+    parser.add_option('-z', '--utc-offset', dest='utc_offset',
+            action='store', type=float, default=0.0,
+            help='offset from UTC in hours of the time zone for the dates')
+
+    options, args = parser.parse_args()
+    if not args:
+        parser.error('start_year argument missing')
+    start_year = int(args[0])
+    end_year = int(args[1]) if len(args) > 1 else start_year
+    glyphs = get_glyphs(options.glyphs)
+    for date, phase in moon_phases(datetime.date(start_year, 1, 1),
+            datetime.date(end_year, 12, 31), options.utc_offset):
+        print('{},{}'.format(date.isoformat(), glyphs[phase]))
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+# Incremental generation of the pdf pages.
+#
+# Each generated page gets a fingerprint: the hash of its template and of the
+# values of the placeholders used by the template, including the extra
+# variables (the page content only depends on those). The fingerprints of all pages form a manifest, which can
+# also be written by generate_csv.py.
+# The pdf pages are stored in a content-addressed cache, keyed by their
+# fingerprint, with a maximum size: the oldest pages are evicted first.
+# When the pages are updated, only pages whose fingerprint is not in the cache
+# are rendered with svgrender.py and converted with inkscape_pool.py.
+#
+# Files referenced by the templates (e.g. pictures) are not part of the
+# fingerprint, clear the cache if they change.
+
+import hashlib
+import json
+import os
+from optparse import OptionParser
+import shutil
+from typing import Dict, Iterable, List, Optional
+
+from inkscape_pool import InkscapePool
+from svgrender import Template
+from svgrender import parse_extra_vars
+from svgrender import parse_generator_extra_vars
+from svgrender import rows_from_csv
+import tracing
+
+__all__ = [
+        'PageCache',
+        'page_manifest',
+        'update_pages',
+        ]
+
+g_cache_dir = os.path.join(
+        os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+        'cage', 'pages')
+
+# Default maximum size of the cache, in bytes.
+g_max_size = 500 * 1024 * 1024
+
+# Column with the page number for each side.
+g_page_columns = {'even': 'page_left', 'odd': 'page_right'}
+
+# Name of the file recording the fingerprints of the pages in a directory.
+g_state_file = '.pagecache.json'
+
+
+def file_hash(filename: str) -> str:
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def page_hash(template_hash: str, placeholders: Iterable[str],
+        row: Dict[str, str]) -> str:
+    """Return the fingerprint of a page.
+
+    Parameters
+    ----------
+
+    - template_hash: hash of the template content.
+    - placeholders: variables used in the template.
+    - row: values of the variables.
+
+    """
+    h = hashlib.sha256(template_hash.encode('ascii'))
+    for name in sorted(placeholders):
+        value = row.get(name)
+        h.update(b'\0' + name.encode('utf-8') + b'=')
+        if value is not None:
+            h.update(value.encode('utf-8'))
+    return h.hexdigest()
+
+
+def page_file(page: str, extension: str = 'pdf') -> str:
+    """Return the file name of a generated page, e.g. 'p008-gen.pdf'."""
+    return 'p{}-gen.{}'.format(page, extension)
+
+
+def page_manifest(rows: Iterable[Dict[str, str]],
+        template_even: str,
+        template_odd: str,
+        extra_vars: Optional[Dict[str, str]] = None) -> Dict:
+    """Return the manifest with the fingerprint of each page.
+
+    The manifest is a dictionary:
+    {'templates': {side: {'file': file, 'hash': hash}},
+    'extra_vars': {name: value},
+    'pages': [{'page': '008', 'side': 'even', 'code': '2022-01', 'row': 0,
+    'hash': hash}, ...]}, where side is 'even' or 'odd' and row is the index
+    of the row in `rows`. The code of the weeks is not unique, e.g. the
+    week of Monday 2024-12-30 is also '2024-01'.
+
+    Parameters
+    ----------
+
+    - rows: rows of the calendar, as dictionaries column: value.
+    - template_even, template_odd: svg templates for the left and right
+        pages.
+    - extra_vars: values for variables not in the rows, cf.
+        `svgrender.render_pages`.
+
+    """
+    extra_vars = extra_vars or {}
+    templates = {}
+    placeholders = {}
+    for side, filename in (('even', template_even), ('odd', template_odd)):
+        templates[side] = {'file': filename, 'hash': file_hash(filename)}
+        placeholders[side] = Template.from_file(filename).placeholders
+    pages = []
+    for index, row in enumerate(rows):
+        if extra_vars:
+            row = dict(extra_vars, **row)
+        for side in ('even', 'odd'):
+            pages.append({
+                'page': row[g_page_columns[side]],
+                'side': side,
+                'code': row['code'],
+                'row': index,
+                'hash': page_hash(templates[side]['hash'],
+                    placeholders[side], row),
+                })
+    return {'templates': templates, 'extra_vars': extra_vars, 'pages': pages}
+
+
+def write_manifest(manifest: Dict, manifest_file: str):
+    with open(manifest_file, 'w') as f:
+        json.dump(manifest, f, indent=1)
+        f.write('\n')
+
+
+def read_manifest(manifest_file: str) -> Dict:
+    with open(manifest_file, 'r') as f:
+        return json.load(f)
+
+
+class PageCache:
+    """Content-addressed cache of files with a maximum total size."""
+
+    def __init__(self,
+            cache_dir: str = g_cache_dir,
+            max_size: int = g_max_size,
+            extension: str = 'pdf'):
+        """
+        Parameters
+        ----------
+
+        - cache_dir: directory of the cache.
+        - max_size: maximum total size of the cached files, in bytes.
+        - extension: extension of the cached files.
+
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.extension = extension
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2],
+                '{}.{}'.format(key, self.extension))
+
+    def get(self, key: str, dest: str) -> bool:
+        """Copy the file for `key` to `dest`, return False if not cached."""
+        path = self.path(key)
+        try:
+            shutil.copyfile(path, dest)
+        except FileNotFoundError:
+            return False
+        # The modification time gives the eviction order.
+        os.utime(path)
+        return True
+
+    def put(self, key: str, src: str):
+        """Store a copy of `src` for `key`."""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = '{}.{}'.format(path, os.getpid())
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """Remove the least recently used files above the maximum size."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def update_pages(manifest: Dict,
+        rows: Iterable[Dict[str, str]],
+        output_dir: str = '.',
+        cache: Optional[PageCache] = None,
+        processes: Optional[int] = None,
+        inkscape: str = 'inkscape',
+        pool: Optional[InkscapePool] = None) -> List[str]:
+    """Write the pdf pages of the manifest, render only the missing ones.
+
+    Return the pages that were rendered.
+
+    Parameters
+    ----------
+
+    - manifest: cf. `page_manifest`.
+    - rows: rows of the calendar, as dictionaries column: value, the ones
+        given to `page_manifest`.
+    - output_dir: directory of the pdf pages.
+    - cache: page cache, default to a PageCache with default arguments.
+    - processes: number of Inkscape processes, default to one per core.
+    - inkscape: Inkscape executable.
+    - pool: Inkscape pool to use instead of a new one with `processes` and
+        `inkscape`, e.g. a persistent one.
+
+    """
+    if cache is None:
+        cache = PageCache()
+    state_file = os.path.join(output_dir, g_state_file)
+    try:
+        with open(state_file, 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+
+    missing = []
+    with tracing.span('cache_lookup', pages=len(manifest['pages'])) as args:
+        for page in manifest['pages']:
+            dest = os.path.join(output_dir, page_file(page['page']))
+            if state.get(dest) == page['hash'] and os.path.exists(dest):
+                # Unchanged, mark as up to date for the build system.
+                os.utime(dest)
+                continue
+            if cache.get(page['hash'], dest):
+                state[dest] = page['hash']
+                continue
+            missing.append(page)
+        args['missing'] = len(missing)
+
+    if missing:
+        rows = list(rows)
+        extra_vars = manifest.get('extra_vars')
+        jobs = []
+        for page in missing:
+            template = Template.from_file(
+                    manifest['templates'][page['side']]['file'])
+            svg_file = os.path.join(output_dir, page_file(page['page'], 'svg'))
+            with tracing.span('render', 'page', file=svg_file) as args:
+                row = rows[page['row']]
+                if extra_vars:
+                    row = dict(extra_vars, **row)
+                content = template.render(row)
+                with open(svg_file, 'wb') as f:
+                    f.write(content)
+                args['bytes'] = len(content)
+            jobs.append((svg_file,
+                os.path.join(output_dir, page_file(page['page']))))
+        if pool is None:
+            pool = InkscapePool(processes, inkscape=inkscape)
+        with tracing.span('convert', pages=len(jobs)) as args:
+            failed = set(pdf for _, pdf in pool.convert(jobs))
+            args['failed'] = len(failed)
+        for page, (_, dest) in zip(missing, jobs):
+            if dest in failed:
+                state.pop(dest, None)
+                continue
+            cache.put(page['hash'], dest)
+            state[dest] = page['hash']
+    cache.evict()
+
+    with open(state_file, 'w') as f:
+        json.dump(state, f, indent=1)
+    if missing and failed:
+        raise RuntimeError('Failed to convert {}'.format(
+            ', '.join(sorted(failed))))
+    return [page['page'] for page in missing]
+
+
+if __name__ == '__main__':
+    usage = 'usage: %prog [options]'
+    parser = OptionParser(usage=usage,
+            description=('Write the pdf pages of the calendar, rendering only'
+                ' the pages that are not in the page cache.'))
+
+    parser.add_option('-d', '--data-file', dest='data_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help='csv file from generate_csv.py')
+
+    parser.add_option('-m', '--manifest', dest='manifest',
+            action='store', type=str, metavar='FILE', default=None,
+            help=('manifest from generate_csv.py --manifest, computed from'
+                ' the data file and templates if not given'))
+
+    parser.add_option('-e', '--template-even', dest='template_even',
+            action='store', type=str, metavar='FILE', default=None,
+            help='svg template for even pages')
+
+    parser.add_option('-o', '--template-odd', dest='template_odd',
+            action='store', type=str, metavar='FILE', default=None,
+            help='svg template for odd pages')
+
+    parser.add_option('-D', '--output-dir', dest='output_dir',
+            action='store', type=str, metavar='DIR', default='.',
+            help='directory of the pdf pages')
+
+    parser.add_option('-x', '--extra-var', dest='extra_vars',
+            action='append', type=str, metavar='NAME=VALUE', default=[],
+            help='extra variable, can be given several times')
+
+    parser.add_option('--extra-vars', dest='generator_extra_vars',
+            action='store', type=str, metavar='VARS', default='',
+            help=('extra variables in the format of the Inkscape generator,'
+                ' "name1=>value1|name2=>value2"'))
+
+    parser.add_option('-c', '--cache-dir', dest='cache_dir',
+            action='store', type=str, metavar='DIR', default=g_cache_dir,
+            help='directory of the page cache')
+
+    parser.add_option('-s', '--max-size', dest='max_size',
+            action='store', type=int, metavar='MIB',
+            default=g_max_size // (1024 * 1024),
+            help='maximum size of the page cache, in MiB')
+
+    parser.add_option('-j', '--jobs', dest='jobs',
+            action='store', type=int, default=0,
+            help='number of Inkscape processes, default to the number of cores')
+
+    options, args = parser.parse_args()
+    if not options.data_file:
+        parser.error('--data-file is required')
+    try:
+        extra_vars = parse_generator_extra_vars(options.generator_extra_vars)
+        extra_vars.update(parse_extra_vars(options.extra_vars))
+    except ValueError as e:
+        parser.error(str(e))
+    if options.manifest:
+        if extra_vars:
+            parser.error('the extra variables require the templates instead'
+                    ' of --manifest')
+        manifest = read_manifest(options.manifest)
+    elif options.template_even and options.template_odd:
+        manifest = page_manifest(rows_from_csv(options.data_file),
+                options.template_even, options.template_odd, extra_vars)
+    else:
+        parser.error('--manifest or both templates are required')
+    rendered = update_pages(manifest,
+            rows_from_csv(options.data_file),
+            output_dir=options.output_dir,
+            cache=PageCache(options.cache_dir,
+                options.max_size * 1024 * 1024),
+            processes=options.jobs or None)
+    print('{} page(s) rendered'.format(len(rendered)))
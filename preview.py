@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+# Local HTTP server to preview the pages of the calendar without building it.
+#
+# The pages of a week (e.g. /2024-02-12) are rendered on demand from the
+# templates and the calendar data, as svg or, with Inkscape, as pdf:
+#
+# - /: list of the weeks.
+# - /<monday>: the spread, i.e. the even and odd pages side by side.
+# - /<monday>/even.svg, /<monday>/odd.pdf, ...: one page.
+#
+# The weeks are addressed by the date of their Monday, yyyy-mm-dd, because
+# their code is not unique (e.g. the weeks of Monday 2024-01-01 and
+# 2024-12-30 are both 2024-01).
+#
+# The rendered pages are kept in a LRU cache of bounded size, keyed by the
+# page fingerprint (cf. pagecache.py), so that a page is rendered again when
+# its row or its template changes. The input files and the templates are
+# read again when they are modified.
+
+import collections
+import hashlib
+import html
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import os
+from optparse import OptionParser
+import re
+import shutil
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from generate_csv import build_calendar
+from generate_csv import parse_date
+from layouts import WeekLayout
+from pagecache import page_hash
+from svgrender import Template
+import tracing
+
+__all__ = [
+        'LRUCache',
+        'Previewer',
+        'serve',
+        ]
+
+# Default maximum size of the cache of rendered pages, in bytes.
+g_cache_size = 64 * 1024 * 1024
+
+# Side: column with the page number.
+g_sides = {'even': 'page_left', 'odd': 'page_right'}
+
+g_content_types = {
+        'svg': 'image/svg+xml',
+        'pdf': 'application/pdf',
+        }
+
+# Keyword arguments of build_calendar with input files.
+g_input_files = ('birthday_file', 'event_file', 'holiday_file', 'moon_file',
+        'nameday_file', 'month_file')
+
+_page_path_re = re.compile(
+        r'^/([0-9]{4}-[0-9]{2}-[0-9]{2})/(even|odd)\.(svg|pdf)$')
+_spread_path_re = re.compile(r'^/([0-9]{4}-[0-9]{2}-[0-9]{2})/?$')
+
+
+class LRUCache:
+    """Least recently used cache of bytes, bounded by the total size."""
+
+    def __init__(self, max_size: int = g_cache_size):
+        """
+        Parameters
+        ----------
+
+        - max_size: maximum total size of the values, in bytes.
+
+        """
+        self.max_size = max_size
+        self.size = 0
+        self._data: collections.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Any) -> Optional[bytes]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Any, value: bytes):
+        """Store a value, a value larger than the cache is not stored."""
+        if len(value) > self.max_size:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._data[key] = value
+            self.size += len(value)
+            while self.size > self.max_size:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+
+def _mtime(filename: Optional[str]) -> Optional[int]:
+    if not filename:
+        return None
+    try:
+        return os.stat(filename).st_mtime_ns
+    except OSError:
+        return None
+
+
+class _TemplateFile:
+    """A template read again when its file is modified."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._mtime: Optional[int] = None
+        self.template: Optional[Template] = None
+        self.hash = ''
+        self.placeholders: frozenset = frozenset()
+
+    def refresh(self):
+        mtime = _mtime(self.filename)
+        if self.template is not None and mtime == self._mtime:
+            return
+        with open(self.filename, 'rb') as f:
+            content = f.read()
+        self.template = Template(content)
+        self.hash = hashlib.sha256(content).hexdigest()
+        self.placeholders = frozenset(self.template.placeholders)
+        self._mtime = mtime
+
+
+class Previewer:
+    """Render the pages of the calendar on demand."""
+
+    def __init__(self,
+            year: int,
+            template_even: str,
+            template_odd: str,
+            cache_size: int = g_cache_size,
+            inkscape: str = 'inkscape',
+            **kwargs):
+        """
+        Parameters
+        ----------
+
+        - year: year of the calendar.
+        - template_even, template_odd: svg templates of the pages.
+        - cache_size: maximum size of the cache of rendered pages, in bytes.
+        - inkscape: Inkscape executable, for the pdf pages.
+        - kwargs: keyword arguments of `generate_csv.build_calendar`.
+
+        """
+        self.year = year
+        self.kwargs = kwargs
+        self.templates = {'even': _TemplateFile(template_even),
+                'odd': _TemplateFile(template_odd)}
+        self.cache = LRUCache(cache_size)
+        self.inkscape = inkscape
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pdf_lock = threading.Lock()
+        self._mtimes: Optional[Tuple] = None
+        self._columns = WeekLayout().columns
+        self._row = WeekLayout().row_function()
+        # Monday of the week as yyyy-mm-dd: week index, and rows computed
+        # since the last load.
+        self._indices: Dict[str, int] = {}
+        self._rows: Dict[str, Dict[str, str]] = {}
+
+    def _refresh(self):
+        """Load the calendar again if an input file was modified."""
+        mtimes = tuple(_mtime(self.kwargs.get(k)) for k in g_input_files)
+        if mtimes == self._mtimes:
+            return
+        with tracing.span('load_calendar'):
+            cal = build_calendar(self.year, **self.kwargs)
+        self.cal = cal
+        self._indices = {week.monday.date.isoformat(): i
+                for i, week in enumerate(cal.weeks)}
+        self._rows = {}
+        self._mtimes = mtimes
+
+    def weeks(self) -> List[Tuple[str, str, str, str, str]]:
+        """Return (monday, code, month, left page, right page) of the weeks.
+
+        `monday` is the date of the Monday as yyyy-mm-dd.
+
+        """
+        with self._lock:
+            self._refresh()
+            return [(week.monday.date.isoformat(), week.code, week.month_str)
+                    + tuple(week.fields()[2:4]) for week in self.cal.weeks]
+
+    def row(self, monday: str) -> Optional[Dict[str, str]]:
+        """Return the row of a week, None if not in the calendar.
+
+        `monday` is the date of the Monday of the week as yyyy-mm-dd.
+
+        """
+        with self._lock:
+            self._refresh()
+            row = self._rows.get(monday)
+            if row is None:
+                index = self._indices.get(monday)
+                if index is None:
+                    return None
+                row = dict(zip(self._columns,
+                    [str(v) for v in self._row(self.cal.weeks[index])]))
+                self._rows[monday] = row
+            return row
+
+    def page(self, monday: str, side: str, fmt: str
+            ) -> Optional[Tuple[str, bytes]]:
+        """Return (fingerprint, content) of a page, None if unknown week.
+
+        Raise RuntimeError if the pdf conversion fails.
+
+        Parameters
+        ----------
+
+        - monday: date of the Monday of the week, e.g. '2024-02-12'.
+        - side: 'even' or 'odd'.
+        - fmt: 'svg' or 'pdf'.
+
+        """
+        row = self.row(monday)
+        if row is None:
+            return None
+        template = self.templates[side]
+        with self._lock:
+            template.refresh()
+        key = '{}.{}'.format(page_hash(template.hash, template.placeholders,
+            row), fmt)
+        content = self.cache.get(key)
+        if content is None:
+            with tracing.span('render', 'page', monday=monday, side=side,
+                    format=fmt):
+                if fmt == 'svg':
+                    content = template.template.render(row)
+                else:
+                    content = self._pdf(self.page(monday, side, 'svg')[1])
+            self.cache.put(key, content)
+        return key, content
+
+    def _pdf(self, svg: bytes) -> bytes:
+        """Convert an svg page with a persistent Inkscape process."""
+        from inkscape_pool import InkscapePool
+
+        with self._pdf_lock:
+            if self._pool is None:
+                self._pool = InkscapePool(1, inkscape=self.inkscape,
+                        persistent=True)
+            tmp_dir = tempfile.mkdtemp(prefix='cage-preview-')
+            try:
+                svg_file = os.path.join(tmp_dir, 'page.svg')
+                pdf_file = os.path.join(tmp_dir, 'page.pdf')
+                with open(svg_file, 'wb') as f:
+                    f.write(svg)
+                if self._pool.convert([(svg_file, pdf_file)]):
+                    raise RuntimeError('Failed to convert the page to pdf')
+                with open(pdf_file, 'rb') as f:
+                    return f.read()
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+
+
+def _index_html(weeks: List[Tuple[str, str, str, str, str]]) -> str:
+    lines = ['<!DOCTYPE html>', '<html><head><meta charset="utf-8">',
+            '<title>Calendar preview</title></head><body>', '<table>',
+            '<tr><th>Week</th><th>Month</th><th>Even page</th>'
+            '<th>Odd page</th></tr>']
+    for monday, code, month, left, right in weeks:
+        lines.append('<tr><td><a href="/{0}">{1}</a></td><td>{2}</td>'
+                '<td>{3} <a href="/{0}/even.svg">svg</a>'
+                ' <a href="/{0}/even.pdf">pdf</a></td>'
+                '<td>{4} <a href="/{0}/odd.svg">svg</a>'
+                ' <a href="/{0}/odd.pdf">pdf</a></td></tr>'.format(
+                    html.escape(monday), html.escape(code),
+                    html.escape(month), html.escape(left),
+                    html.escape(right)))
+    lines += ['</table>', '</body></html>', '']
+    return '\n'.join(lines)
+
+
+def _spread_html(monday: str, code: str) -> str:
+    monday = html.escape(monday)
+    code = html.escape(code)
+    return '\n'.join(['<!DOCTYPE html>', '<html><head><meta charset="utf-8">',
+        '<title>{0}</title>'.format(code),
+        '<style>img { width: 49%; border: 1px solid #ccc; }</style>',
+        '</head><body>',
+        '<p><a href="/">Weeks</a> | {1} | <a href="/{0}/even.pdf">even pdf</a>'
+        ' | <a href="/{0}/odd.pdf">odd pdf</a></p>'.format(monday, code),
+        '<img src="/{0}/even.svg" alt="even page">'
+        '<img src="/{0}/odd.svg" alt="odd page">'.format(monday),
+        '</body></html>', ''])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Set by `serve`.
+    previewer: Previewer
+
+    def _send(self, status: int, content: bytes, content_type: str,
+            etag: Optional[str] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        if etag is not None:
+            self.send_header('ETag', '"{}"'.format(etag))
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(content)
+
+    def _send_text(self, status: int, text: str):
+        self._send(status, text.encode('utf-8'), 'text/plain; charset=utf-8')
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/':
+            self._send(HTTPStatus.OK,
+                    _index_html(self.previewer.weeks()).encode('utf-8'),
+                    'text/html; charset=utf-8')
+            return
+        match = _spread_path_re.match(path)
+        if match:
+            row = self.previewer.row(match.group(1))
+            if row is None:
+                self._send_text(HTTPStatus.NOT_FOUND, 'Unknown week\n')
+                return
+            self._send(HTTPStatus.OK,
+                    _spread_html(match.group(1), row['code']).encode('utf-8'),
+                    'text/html; charset=utf-8')
+            return
+        match = _page_path_re.match(path)
+        if not match:
+            self._send_text(HTTPStatus.NOT_FOUND, 'Not found\n')
+            return
+        monday, side, fmt = match.groups()
+        try:
+            page = self.previewer.page(monday, side, fmt)
+        except (RuntimeError, OSError) as e:
+            self._send_text(HTTPStatus.INTERNAL_SERVER_ERROR,
+                    '{}\n'.format(e))
+            return
+        if page is None:
+            self._send_text(HTTPStatus.NOT_FOUND, 'Unknown week\n')
+            return
+        etag, content = page
+        if self.headers.get('If-None-Match') == '"{}"'.format(etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', '"{}"'.format(etag))
+            self.end_headers()
+            return
+        self._send(HTTPStatus.OK, content, g_content_types[fmt], etag)
+
+    do_HEAD = do_GET
+
+
+def serve(previewer: Previewer, address: str = '127.0.0.1',
+        port: int = 8000):
+    """Serve the pages until interrupted."""
+    handler = type('Handler', (_Handler,), {'previewer': previewer})
+    with ThreadingHTTPServer((address, port), handler) as server:
+        print('Serving on http://{}:{}/'.format(*server.server_address[:2]))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            previewer.close()
+
+
+if __name__ == '__main__':
+    usage = ('usage: %prog [options] --template-even FILE --template-odd FILE'
+            ' year\n'
+            '       %prog [options] --template-even FILE --template-odd FILE'
+            ' --first-date yyyy-mm-dd --last-date yyyy-mm-dd')
+    parser = OptionParser(usage=usage,
+            description=('Serve the pages of the calendar on a local HTTP'
+                ' server, rendered on demand.'))
+
+    parser.add_option('-e', '--extra-weeks', dest='extra_weeks',
+            action='store', type=int, default=2,
+            help='number of weeks of the following year, default %default')
+
+    parser.add_option('--first-date', dest='first_date',
+            action='store', type=str, default=None,
+            help='first date of the calendar, instead of the year')
+
+    parser.add_option('--last-date', dest='last_date',
+            action='store', type=str, default=None,
+            help='last date of the calendar, with --first-date')
+
+    parser.add_option('-s', '--start-page', dest='start_page',
+            action='store', type=int, default=2,
+            help='page number of the first week, default %default')
+
+    parser.add_option('-b', '--birthday-file', dest='birthday_file',
+            action='store', type=str, default=None,
+            help='birthday file, cf. generate_csv.py')
+
+    parser.add_option('-d', '--holiday-file', dest='holiday_file',
+            action='store', type=str, default=None,
+            help='holiday file, cf. generate_csv.py')
+
+    parser.add_option('-m', '--moon-file', dest='moon_file',
+            action='store', type=str, default=None,
+            help='moon file, cf. generate_csv.py')
+
+    parser.add_option('-n', '--nameday-file', dest='nameday_file',
+            action='store', type=str, default=None,
+            help='nameday file, cf. generate_csv.py')
+
+    parser.add_option('-v', '--event-file', dest='event_file',
+            action='store', type=str, default=None,
+            help='event file, cf. generate_csv.py')
+
+    parser.add_option('-t', '--month-file', dest='month_file',
+            action='store', type=str, default=None,
+            help='file with the month names, cf. generate_csv.py')
+
+    parser.add_option('--template-even', dest='template_even',
+            action='store', type=str, metavar='FILE', default=None,
+            help='svg template for even pages')
+
+    parser.add_option('--template-odd', dest='template_odd',
+            action='store', type=str, metavar='FILE', default=None,
+            help='svg template for odd pages')
+
+    parser.add_option('-a', '--address', dest='address',
+            action='store', type=str, default='127.0.0.1',
+            help='address to listen on, default %default')
+
+    parser.add_option('-p', '--port', dest='port',
+            action='store', type=int, default=8000,
+            help='port to listen on, default %default')
+
+    parser.add_option('-c', '--cache-size', dest='cache_size',
+            action='store', type=int, metavar='MIB',
+            default=g_cache_size // (1024 * 1024),
+            help='maximum size of the cache of rendered pages, in MiB')
+
+    parser.add_option('-i', '--inkscape', dest='inkscape',
+            action='store', type=str, default='inkscape',
+            help='Inkscape executable, for the pdf pages')
+
+    options, args = parser.parse_args()
+    if not (options.template_even and options.template_odd):
+        parser.error('--template-even and --template-odd are required')
+    if bool(options.first_date) != bool(options.last_date):
+        parser.error('--first-date and --last-date go together')
+    first_date = None
+    last_date = None
+    if options.first_date:
+        try:
+            first_date = parse_date(options.first_date)
+            last_date = parse_date(options.last_date)
+        except ValueError as e:
+            parser.error(str(e))
+        args = args or [str(first_date.year)]
+    if not args:
+        parser.error('year argument missing')
+    serve(Previewer(int(args[0]), options.template_even,
+            options.template_odd,
+            cache_size=options.cache_size * 1024 * 1024,
+            inkscape=options.inkscape,
+            extra_weeks=options.extra_weeks,
+            first_date=first_date,
+            last_date=last_date,
+            start_page=options.start_page,
+            birthday_file=options.birthday_file,
+            holiday_file=options.holiday_file,
+            moon_file=options.moon_file,
+            nameday_file=options.nameday_file,
+            event_file=options.event_file,
+            month_file=options.month_file),
+        options.address, options.port)
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# Render one svg page per data row from an svg template, as the
+# inkscape_generator extension does with `--var-type=name`: each placeholder
+# `%VAR_name%` is replaced by the value of the column `name`.
+#
+# The template is parsed once: it is split into byte slices around the
+# placeholders, a page is then the concatenation of the slices and the
+# XML-escaped values.
+#
+# The placeholders used by a template are cached on disk, keyed by the hash
+# of the template, so that generate_csv.py can write only the columns used
+# by the templates without parsing them at each run.
+
+import csv
+import hashlib
+import multiprocessing
+import os
+from optparse import OptionParser
+import re
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set
+from xml.sax.saxutils import escape
+
+from csvcalendar import Calendar
+import tracing
+
+__all__ = [
+        'Template',
+        'render_calendar',
+        'render_pages',
+        'template_placeholders',
+        ]
+
+g_placeholder_re = re.compile(rb'%VAR_([A-Za-z0-9_]+)%')
+
+g_cache_dir = os.path.join(
+        os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+        'cage', 'templates')
+
+# Placeholders of the templates read in this process, by template hash.
+_placeholder_cache: Dict[str, FrozenSet[str]] = {}
+
+_xml_entities = {'"': '&quot;', "'": '&apos;'}
+
+
+def xml_escape(value: str) -> str:
+    """Escape a value for XML text and attribute values."""
+    return escape(value, _xml_entities)
+
+
+def rows_from_calendar(cal: Calendar) -> Iterator[Dict[str, str]]:
+    """Yield the rows of a calendar as dictionaries column: value."""
+    rows = cal.iter_rows()
+    header = next(rows, None)
+    if header is None:
+        return
+    for row in rows:
+        yield dict(zip(header, [str(v) for v in row]))
+
+
+def rows_from_csv(data_file: str) -> Iterator[Dict[str, str]]:
+    """Yield the rows of a csv file with a header line."""
+    with open(data_file, 'r', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+class Template:
+    """An svg template with precompiled placeholder positions."""
+
+    def __init__(self, content: bytes):
+        """
+        Parameters
+        ----------
+
+        - content: content of the template, encoded in UTF-8.
+
+        """
+        self.content = content
+        # Literal slices, there is one more slice than variables.
+        self._slices: List[bytes] = []
+        self._variables: List[str] = []
+        start = 0
+        for match in g_placeholder_re.finditer(content):
+            self._slices.append(content[start:match.start()])
+            self._variables.append(match.group(1).decode('ascii'))
+            start = match.end()
+        self._slices.append(content[start:])
+
+    @classmethod
+    def from_file(cls, filename: str) -> 'Template':
+        with open(filename, 'rb') as f:
+            return cls(f.read())
+
+    @property
+    def placeholders(self) -> Set[str]:
+        """Names of the variables used in the template."""
+        return set(self._variables)
+
+    def render(self, row: Dict[str, str], xml: bool = True) -> bytes:
+        """Return the content with the placeholders replaced.
+
+        Placeholders without a value in `row` are kept as is.
+
+        Parameters
+        ----------
+
+        - row: dictionary variable: value.
+        - xml: whether to escape the values for XML.
+
+        """
+        parts = [self._slices[0]]
+        for variable, part in zip(self._variables, self._slices[1:]):
+            value = row.get(variable)
+            if value is None:
+                parts.append(b'%VAR_' + variable.encode('ascii') + b'%')
+            elif xml:
+                parts.append(xml_escape(value).encode('utf-8'))
+            else:
+                parts.append(value.encode('utf-8'))
+            parts.append(part)
+        return b''.join(parts)
+
+
+def template_placeholders(filename: str,
+        cache_dir: Optional[str] = g_cache_dir) -> FrozenSet[str]:
+    """Return the names of the variables used in a template, cached.
+
+    Parameters
+    ----------
+
+    - filename: svg template.
+    - cache_dir: directory of the cache files, None to disable the disk
+        cache.
+
+    """
+    with open(filename, 'rb') as f:
+        content = f.read()
+    key = hashlib.sha256(content).hexdigest()
+    placeholders = _placeholder_cache.get(key)
+    if placeholders is not None:
+        return placeholders
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = os.path.join(cache_dir, key + '.txt')
+        try:
+            with open(cache_file, 'r', encoding='ascii') as f:
+                placeholders = frozenset(f.read().split())
+        except OSError:
+            pass
+    if placeholders is None:
+        placeholders = frozenset(Template(content).placeholders)
+        if cache_file is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Write to a temporary file first for concurrent runs.
+            tmp_file = '{}.{}'.format(cache_file, os.getpid())
+            with open(tmp_file, 'w', encoding='ascii') as f:
+                f.write(''.join(p + '\n' for p in sorted(placeholders)))
+            os.replace(tmp_file, cache_file)
+    _placeholder_cache[key] = placeholders
+    return placeholders
+
+
+class _Job:
+    """Render and write the pages of one template."""
+
+    def __init__(self,
+            template: Template,
+            output_pattern: str,
+            output_dir: str,
+            extra_vars: Dict[str, str]):
+        self.template = template
+        self.output_pattern = Template(output_pattern.encode('utf-8'))
+        self.output_dir = output_dir
+        self.extra_vars = extra_vars
+
+    def __call__(self, row: Dict[str, str]) -> str:
+        if self.extra_vars:
+            row = dict(self.extra_vars, **row)
+        filename = os.path.join(self.output_dir,
+                self.output_pattern.render(row, xml=False).decode('utf-8'))
+        with tracing.span('render', 'page', file=filename) as args:
+            content = self.template.render(row)
+            with open(filename, 'wb') as f:
+                f.write(content)
+            args['bytes'] = len(content)
+        return filename
+
+
+# Job of the worker processes of `render_pages`.
+g_job: Optional[_Job] = None
+
+
+def _init_worker(job: _Job):
+    global g_job
+    g_job = job
+
+
+def _run_worker(row: Dict[str, str]) -> str:
+    filename = g_job(row)
+    # The worker processes do not run the exit handlers.
+    tracing.flush()
+    return filename
+
+
+def render_pages(template_file: str,
+        rows: Iterable[Dict[str, str]],
+        output_pattern: str,
+        output_dir: str = '.',
+        extra_vars: Optional[Dict[str, str]] = None,
+        processes: int = 1) -> List[str]:
+    """Write one svg file per row and return the file names.
+
+    Parameters
+    ----------
+
+    - template_file: svg template.
+    - rows: dictionaries variable: value.
+    - output_pattern: output file name with placeholders, e.g.
+        'p%VAR_page_left%-gen.svg'.
+    - output_dir: directory of the output files.
+    - extra_vars: values for variables not in the rows.
+    - processes: number of worker processes, 1 to work in this process.
+
+    """
+    job = _Job(Template.from_file(template_file), output_pattern,
+            output_dir, extra_vars or {})
+    if processes <= 1:
+        return [job(row) for row in rows]
+    with multiprocessing.Pool(processes,
+            initializer=_init_worker,
+            initargs=(job,)) as pool:
+        return list(pool.imap(_run_worker, rows, chunksize=8))
+
+
+def render_calendar(cal: Calendar,
+        template_file: str,
+        output_pattern: str,
+        **kwargs) -> List[str]:
+    """Write one svg file per week of `cal`, cf. `render_pages`."""
+    return render_pages(template_file, rows_from_calendar(cal),
+            output_pattern, **kwargs)
+
+
+def parse_extra_vars(values: List[str]) -> Dict[str, str]:
+    """Return the dictionary from a list of 'name=value'."""
+    extra_vars = {}
+    for v in values:
+        name, sep, value = v.partition('=')
+        if not sep:
+            raise ValueError('Extra variable must be "name=value"')
+        extra_vars[name] = value
+    return extra_vars
+
+
+def parse_generator_extra_vars(value: str) -> Dict[str, str]:
+    """Return the dictionary from the --extra-vars of the Inkscape generator.
+
+    The value is 'name1=>value1|name2=>value2' or 'name1|value1|name2|value2',
+    empty for no variable.
+
+    """
+    if not value:
+        return {}
+    fields = value.split('|')
+    if '=>' in value:
+        pairs = [f.partition('=>')[::2] for f in fields]
+    elif len(fields) % 2 == 0:
+        pairs = list(zip(fields[::2], fields[1::2]))
+    else:
+        raise ValueError('Extra variables must be "name1=>value1|name2=>value2"')
+    return dict(pairs)
+
+
+if __name__ == '__main__':
+    usage = 'usage: %prog [options] template.svg'
+    parser = OptionParser(usage=usage)
+
+    parser.add_option('-d', '--data-file', dest='data_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help='csv file from generate_csv.py')
+
+    parser.add_option('-o', '--output-pattern', dest='output_pattern',
+            action='store', type=str, default='p%VAR_page_left%-gen.svg',
+            help='output file name, with placeholders')
+
+    parser.add_option('-D', '--output-dir', dest='output_dir',
+            action='store', type=str, metavar='DIR', default='.',
+            help='directory of the output files')
+
+    parser.add_option('-x', '--extra-var', dest='extra_vars',
+            action='append', type=str, metavar='NAME=VALUE', default=[],
+            help='extra variable, can be given several times')
+
+    parser.add_option('--extra-vars', dest='generator_extra_vars',
+            action='store', type=str, metavar='VARS', default='',
+            help=('extra variables in the format of the Inkscape generator,'
+                ' "name1=>value1|name2=>value2"'))
+
+    parser.add_option('-j', '--jobs', dest='jobs',
+            action='store', type=int, default=1,
+            help='number of processes')
+
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error('one template is required')
+    if not options.data_file:
+        parser.error('--data-file is required')
+    try:
+        extra_vars = parse_generator_extra_vars(options.generator_extra_vars)
+        extra_vars.update(parse_extra_vars(options.extra_vars))
+    except ValueError as e:
+        parser.error(str(e))
+    render_pages(args[0],
+            rows_from_csv(options.data_file),
+            options.output_pattern,
+            output_dir=options.output_dir,
+            extra_vars=extra_vars,
+            processes=options.jobs)
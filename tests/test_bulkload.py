@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+import bulkload
+from csvcalendar import Calendar
+import generate_csv
+
+g_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_event_year_zero(tmp_path):
+    event_file = tmp_path / 'events.csv'
+    event_file.write_text('2022-03-01,a\n0000-03-02,b\n')
+    with pytest.raises(ValueError, match=r'events\.csv:2: '):
+        bulkload.load_events(Calendar(2022, 2), str(event_file))
+
+
+def test_same_as_default(tmp_path):
+    files = {
+            'birthday_file': ('1980-02-29,Jo\n0000-07-14,Al\n2030-01-01,Future\n'
+                '1999-12-31,Eve\n'),
+            'event_file': ('2022-01-04,A\n2022-01-04,B\n2021-06-01,Old\n'
+                '2023-01-08,Extra week\n'),
+            'holiday_file': '2022-01-01,New year\n2022-05-08,Victory\n',
+            }
+    kwargs = {}
+    for key, text in files.items():
+        path = tmp_path / (key + '.csv')
+        path.write_text(text)
+        kwargs[key] = str(path)
+    kwargs['moon_file'] = os.path.join(g_root, 'templates', 'moon.csv')
+    kwargs['nameday_file'] = os.path.join(g_root, 'translations',
+            'namedays-cz.csv')
+    for year in (2022, 2024):
+        default = generate_csv.build_calendar(year, **kwargs)
+        bulk = generate_csv.build_calendar(year, bulk=True, **kwargs)
+        assert str(bulk) == str(default)
@@ -0,0 +1,52 @@
+import datetime
+
+from csvcalendar import Calendar
+from csvcalendar import RangeCalendar
+
+
+def _birthdays(cal, datestr):
+    return cal.day(datetime.date.fromisoformat(datestr)).fields()[1]
+
+
+def test_birthday_feb_29():
+    cal = RangeCalendar(datetime.date(2023, 2, 1), datetime.date(2024, 3, 31))
+    cal.add_birthday('2000-02-29', 'Jo')
+    # Celebrated on March 1st in non-leap years.
+    assert _birthdays(cal, '2023-02-28') == ''
+    assert _birthdays(cal, '2023-03-01') == 'Jo (23, 02-29)'
+    assert _birthdays(cal, '2024-02-29') == 'Jo (24)'
+    assert _birthdays(cal, '2024-03-01') == ''
+
+
+def test_overlay_copy_on_write():
+    # Weeks from Monday 2021-12-27.
+    base = Calendar(2022, 0)
+    base.add_event('2022-01-04', 'Base')
+    before = str(base)
+    overlay = base.overlay()
+    overlay.add_event('2022-01-11', 'Overlay')
+    assert str(base) == before
+    assert 'Overlay' not in before
+    assert overlay.day(datetime.date(2022, 1, 11)).fields()[3] == 'Overlay'
+    assert overlay.day(datetime.date(2022, 1, 4)).fields()[3] == 'Base'
+    # Only the modified week is copied.
+    assert overlay.weeks[1] is base.weeks[1]
+    assert overlay.weeks[2] is not base.weeks[2]
+    assert overlay.weeks[3] is base.weeks[3]
+
+
+def test_overlay_relabel():
+    base = Calendar(2022, 0)
+    base.add_event('2022-01-04', 'Base')
+    before = str(base)
+    months = [str(m) for m in range(1, 13)]
+    overlay = base.overlay(start_page=10, months=months)
+    assert str(base) == before
+    week = overlay.weeks[1]
+    assert week.fields() == ['2022-01', 1, '012', '013', '1']
+    # The days are shared until written.
+    assert week.days is base.weeks[1].days
+    overlay.add_event('2022-01-05', 'Overlay')
+    assert overlay.weeks[1].fields() == week.fields()
+    assert overlay.weeks[1].days is not base.weeks[1].days
+    assert str(base) == before
@@ -0,0 +1,46 @@
+import datetime
+
+import icsimport
+
+
+def _ics(*events):
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0']
+    for event in events:
+        lines += ['BEGIN:VEVENT'] + list(event) + ['END:VEVENT']
+    lines.append('END:VCALENDAR')
+    return [l + '\r\n' for l in lines]
+
+
+def _read(lines):
+    return sorted(icsimport.read_occurrences(lines,
+        datetime.date(2022, 1, 1), datetime.date(2022, 12, 31)))
+
+
+def test_moved_occurrence():
+    master = ('UID:meeting', 'DTSTART:20220105T100000',
+            'RRULE:FREQ=WEEKLY;COUNT=3', 'SUMMARY:Meeting')
+    moved = ('UID:meeting', 'RECURRENCE-ID:20220112T100000',
+            'DTSTART:20220113T100000', 'SUMMARY:Meeting moved')
+    expected = [
+            (datetime.date(2022, 1, 5), 'Meeting', False),
+            (datetime.date(2022, 1, 13), 'Meeting moved', False),
+            (datetime.date(2022, 1, 19), 'Meeting', False),
+            ]
+    # The override can be before or after the recurring event.
+    assert _read(_ics(master, moved)) == expected
+    assert _read(_ics(moved, master)) == expected
+
+
+def test_cancelled_occurrence():
+    master = ('UID:meeting', 'DTSTART:20220105T100000',
+            'RRULE:FREQ=WEEKLY;COUNT=2', 'SUMMARY:Meeting')
+    cancelled = ('UID:meeting', 'RECURRENCE-ID:20220112T100000',
+            'DTSTART:20220112T100000', 'STATUS:CANCELLED')
+    assert _read(_ics(master, cancelled)) == [
+            (datetime.date(2022, 1, 5), 'Meeting', False)]
+
+
+def test_multi_line_summary():
+    event = ('DTSTART;VALUE=DATE:20220301', 'SUMMARY:Line 1\\nLine 2')
+    assert _read(_ics(event)) == [
+            (datetime.date(2022, 3, 1), 'Line 1 Line 2', True)]
@@ -0,0 +1,45 @@
+import pikepdf
+
+import impose
+
+
+def _flat(sides):
+    """Return the 1-based pages of the sides, as given to pdfjam."""
+    return [page + 1 for side in sides for page in side]
+
+
+def test_booklet_order_as_pdfjam():
+    # Page order of `pdfjam --booklet true`.
+    assert _flat(impose.booklet_order(4)) == [4, 1, 2, 3]
+    assert _flat(impose.booklet_order(12)) == [
+            12, 1, 2, 11, 10, 3, 4, 9, 8, 5, 6, 7]
+    # Page order of `pdfjam --booklet true --signature 8`.
+    assert _flat(impose.booklet_order(16, 8)) == [
+            8, 1, 2, 7, 6, 3, 4, 5, 16, 9, 10, 15, 14, 11, 12, 13]
+
+
+def _add_page(pdf, font_data):
+    font_file = pdf.make_stream(font_data)
+    font = pdf.make_indirect(pikepdf.Dictionary(Type=pikepdf.Name.Font,
+        Subtype=pikepdf.Name.Type1, FontFile=font_file))
+    # Different contents, not merged.
+    contents = pdf.make_stream('BT /F1 12 Tf ({}) Tj ET'.format(
+        len(pdf.pages)).encode('ascii'))
+    pdf.pages.append(pikepdf.Page(pikepdf.Dictionary(Type=pikepdf.Name.Page,
+        MediaBox=[0, 0, 100, 100], Contents=contents,
+        Resources=pikepdf.Dictionary(Font=pikepdf.Dictionary(F1=font)))))
+
+def test_deduplicate(tmp_path):
+    pdf = pikepdf.new()
+    _add_page(pdf, b'font')
+    _add_page(pdf, b'font')
+    _add_page(pdf, b'other font')
+    # The font files, then the fonts referring to the merged font files.
+    assert impose.deduplicate(pdf) == 2
+    fonts = [page.Resources.Font.F1 for page in pdf.pages]
+    assert fonts[0].objgen == fonts[1].objgen
+    assert fonts[0].objgen != fonts[2].objgen
+    pdf.save(tmp_path / 'out.pdf')
+    with pikepdf.open(tmp_path / 'out.pdf') as saved:
+        assert [page.Resources.Font.F1.FontFile.read_bytes()
+                for page in saved.pages] == [b'font', b'font', b'other font']
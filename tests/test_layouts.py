@@ -0,0 +1,20 @@
+import datetime
+
+from csvcalendar import RangeCalendar
+import layouts
+
+
+def test_month_out_of_calendar():
+    # From Monday 2022-03-14 to Sunday 2022-04-10.
+    cal = RangeCalendar(datetime.date(2022, 3, 15), datetime.date(2022, 4, 10))
+    layout = layouts.MonthLayout(weekdays=[str(i) for i in range(7)],
+            keep=['weekday_{}'.format(n) for n in range(1, 32)]
+            + ['day_{}'.format(n) for n in range(1, 32)])
+    march, april = [dict(zip(layout.columns, row)) for row in layout.rows(cal)]
+    assert march['code'] == '2022-03'
+    assert march['day_13'] == march['weekday_13'] == ''
+    # 2022-03-14 is a Monday.
+    assert (march['day_14'], march['weekday_14']) == (14, '0')
+    assert (april['day_10'], april['weekday_10']) == (10, '6')
+    assert april['day_11'] == april['weekday_11'] == ''
+    assert april['day_31'] == ''
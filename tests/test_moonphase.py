@@ -0,0 +1,11 @@
+import numpy as np
+
+import moonphase
+
+
+def test_delta_t():
+    # Values of TT - UT in seconds, Espenak and Meeus.
+    years = np.array([1900.0, 1950.0, 1975.0, 2000.0, 2020.0])
+    seconds = moonphase.delta_t(years) * 86400.0
+    assert np.allclose(seconds, [-2.79, 29.07, 45.45, 63.86, 71.62],
+            atol=0.5)
@@ -0,0 +1,61 @@
+import shutil
+
+from csvcalendar import Calendar
+import pagecache
+import svgrender
+
+
+class FakePool:
+    """Inkscape pool copying the svg files to the pdf files."""
+
+    def convert(self, jobs):
+        for svg_file, pdf_file in jobs:
+            shutil.copyfile(svg_file, pdf_file)
+        return []
+
+
+def _template(tmp_path, name):
+    template = tmp_path / name
+    template.write_text('<svg><text>%VAR_code% %VAR_author%</text></svg>')
+    return str(template)
+
+
+def test_extra_vars_in_fingerprint(tmp_path):
+    template_even = _template(tmp_path, 'even.svg')
+    template_odd = _template(tmp_path, 'odd.svg')
+    rows = [{'code': '2022-01', 'page_left': '008', 'page_right': '009'}]
+    hashes = {}
+    for author in ('Jane', 'John'):
+        manifest = pagecache.page_manifest(rows, template_even, template_odd,
+                {'author': author})
+        hashes[author] = [p['hash'] for p in manifest['pages']]
+        assert manifest['extra_vars'] == {'author': author}
+    assert hashes['Jane'] != hashes['John']
+
+
+def test_same_week_code(tmp_path):
+    cal = Calendar(2024, 2)
+    cal.add_event('2024-01-02', 'JanEvent')
+    cal.add_event('2024-12-31', 'DecEvent')
+    rows = list(svgrender.rows_from_calendar(cal))
+    # The week of Monday 2024-12-30 is also week 1.
+    assert rows[0]['code'] == rows[52]['code'] == '2024-01'
+    template = tmp_path / 'template.svg'
+    template.write_text('<svg><text>%VAR_page_left% %VAR_events_tuesday%'
+            '</text></svg>')
+    manifest = pagecache.page_manifest(rows, str(template), str(template))
+    output_dir = tmp_path / 'pages'
+    output_dir.mkdir()
+    pagecache.update_pages(manifest, rows, str(output_dir),
+            cache=pagecache.PageCache(str(tmp_path / 'cache')),
+            pool=FakePool())
+    assert '002 JanEvent' in (output_dir / 'p002-gen.pdf').read_text()
+    assert '106 DecEvent' in (output_dir / 'p106-gen.pdf').read_text()
+
+
+def test_parse_generator_extra_vars():
+    expected = {'author': 'Jane', 'edition': '2'}
+    assert svgrender.parse_generator_extra_vars(
+            'author=>Jane|edition=>2') == expected
+    assert svgrender.parse_generator_extra_vars('author|Jane|edition|2') == expected
+    assert svgrender.parse_generator_extra_vars('') == {}
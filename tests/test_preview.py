@@ -0,0 +1,20 @@
+import preview
+
+
+def test_same_week_code(tmp_path):
+    event_file = tmp_path / 'events.csv'
+    event_file.write_text('2024-01-02,Jan\n2024-12-31,Dec\n')
+    template = tmp_path / 'template.svg'
+    template.write_text('<svg><text>%VAR_page_left% %VAR_events_tuesday%'
+            '</text></svg>')
+    previewer = preview.Previewer(2024, str(template), str(template),
+            event_file=str(event_file))
+    weeks = previewer.weeks()
+    # The weeks of Monday 2024-01-01 and 2024-12-30 have the code 2024-01.
+    assert weeks[0][:2] == ('2024-01-01', '2024-01')
+    assert weeks[52][:2] == ('2024-12-30', '2024-01')
+    assert b'002 Jan' in previewer.page('2024-01-01', 'even', 'svg')[1]
+    assert b'106 Dec' in previewer.page('2024-12-30', 'even', 'svg')[1]
+    index = preview._index_html(weeks)
+    assert '<a href="/2024-01-01">2024-01</a>' in index
+    assert '<a href="/2024-12-30">2024-01</a>' in index
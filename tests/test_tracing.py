@@ -0,0 +1,33 @@
+import json
+import multiprocessing
+
+import tracing
+
+
+def _trace(trace_file, barrier, index):
+    tracing.enable(trace_file)
+    tracing.add_event('event', index, index + 1)
+    barrier.wait()
+    tracing.flush()
+
+
+def test_concurrent_creation(tmp_path):
+    context = multiprocessing.get_context('fork')
+    for attempt in range(10):
+        trace_file = str(tmp_path / 'trace-{}.json'.format(attempt))
+        barrier = context.Barrier(8)
+        processes = [context.Process(target=_trace,
+            args=(trace_file, barrier, i)) for i in range(8)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        with open(trace_file) as f:
+            content = f.read()
+        assert content.startswith('[\n')
+        # The closing bracket is optional in the trace format.
+        events = json.loads(content.rstrip(',\n') + ']')
+        assert sorted(e['ts'] for e in events if e['ph'] == 'X') == list(
+                range(8))
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+            'trace-{}.json'.format(i) for i in range(10))
@@ -0,0 +1,16 @@
+import datetime
+
+import validate
+
+
+def test_event_without_name(tmp_path):
+    event_file = tmp_path / 'events.csv'
+    event_file.write_text('2022-05-01\n2022-05-02,\n2022-05-03x\n')
+    report = validate.Report(datetime.date(2022, 1, 1),
+            datetime.date(2022, 12, 31))
+    validate.validate_events(report, str(event_file))
+    assert [(d.line, d.severity, d.code) for d in report.diagnostics] == [
+            (1, 'warning', 'empty-name'),
+            (2, 'warning', 'empty-name'),
+            (3, 'error', 'format'),
+            ]
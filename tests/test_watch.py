@@ -0,0 +1,58 @@
+import os
+import shutil
+
+import pagecache
+from watch import Watcher
+
+
+class FakePool:
+    """Inkscape pool copying the svg files to the pdf files."""
+
+    def convert(self, jobs):
+        for svg_file, pdf_file in jobs:
+            shutil.copyfile(svg_file, pdf_file)
+        return []
+
+
+def test_update_template_and_data(tmp_path):
+    birthday_file = tmp_path / 'birthdays.csv'
+    birthday_file.write_text('1980-03-15,Alice\n')
+    output_file = tmp_path / 'calendar.csv'
+    watcher = Watcher(2022, str(output_file), birthday_file=str(birthday_file))
+    weeks = watcher.update()
+    assert 'Alice (42)' in output_file.read_text()
+
+    birthday_file.write_text('1980-03-15,Alice\n1990-06-01,Bob\n')
+    # A template and a data file changed at once, in both orders.
+    template = os.path.abspath(str(tmp_path / 'template.svg'))
+    for paths in ([template, str(birthday_file)],
+            [str(birthday_file), template]):
+        assert watcher.update(paths) == weeks
+    content = output_file.read_text()
+    assert 'Alice (42)' in content
+    assert 'Bob (32)' in content
+
+
+def test_pages_of_same_week_code(tmp_path):
+    event_file = tmp_path / 'events.csv'
+    event_file.write_text('2024-01-02,Jan\n2024-12-31,Dec\n')
+    template = tmp_path / 'template.svg'
+    template.write_text('<svg><text>%VAR_page_left% %VAR_events_tuesday%'
+            '</text></svg>')
+    output_dir = tmp_path / 'pages'
+    output_dir.mkdir()
+    # The weeks of Monday 2024-01-01 and 2024-12-30 have the code 2024-01.
+    watcher = Watcher(2024, str(tmp_path / 'calendar.csv'),
+            template_even=str(template), template_odd=str(template),
+            output_dir=str(output_dir),
+            cache=pagecache.PageCache(str(tmp_path / 'cache')),
+            pool=FakePool(), event_file=str(event_file))
+    watcher.update()
+    assert '002 Jan' in (output_dir / 'p002-gen.pdf').read_text()
+    assert '106 Dec' in (output_dir / 'p106-gen.pdf').read_text()
+
+    # Both weeks changed.
+    event_file.write_text('2024-01-02,Jan2\n2024-12-31,Dec2\n')
+    assert watcher.update([str(event_file)]) == [0, 52]
+    assert '002 Jan2' in (output_dir / 'p002-gen.pdf').read_text()
+    assert '106 Dec2' in (output_dir / 'p106-gen.pdf').read_text()
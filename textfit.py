@@ -0,0 +1,716 @@
+#!/usr/bin/env python3
+# Measure the lines of text of the svg templates filled with the calendar
+# data, before rendering, to find the lines too long for the page (e.g. many
+# birthdays on one day) and optionally shorten the data.
+#
+# Each line of a template with placeholders (a <text> element, or a <tspan>
+# with sodipodi:role="line" in a multi-line text) goes from its x to the right
+# margin of the page, by default as wide as the left margin (the smallest x
+# of the lines). The text of a line is made of runs with their own font and
+# size, e.g. the bold day number then the events. Flowed text (<flowRoot>) is
+# not measured.
+#
+# The width of a run is the sum of the advances of its glyphs, read from the
+# font file with fontTools and cached on disk per font file. Kerning is
+# ignored, which overestimates the widths slightly. The font file of a family
+# is found with fc-match or given with --font.
+#
+# Policies for the lines too long:
+#
+# - report: only list them.
+# - truncate: shorten the birthdays, namedays, events and holidays of the line,
+#   the widest one first, to the last complete item followed by "…".
+# - abbreviate: replace the holidays by their short names (cf. `short_` in
+#   generate_holidays_<country>.py) and the items found in an abbreviation
+#   file, then truncate if still too long.
+
+import csv
+import hashlib
+import json
+import os
+from optparse import OptionParser
+import re
+import shutil
+import subprocess
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import warnings
+import xml.etree.ElementTree as ET
+
+from csvcalendar import CsvDialect
+
+__all__ = [
+        'FontResolver',
+        'GlyphAdvances',
+        'Overflow',
+        'TemplateLines',
+        'fit_rows',
+        ]
+
+g_policies = ('report', 'truncate', 'abbreviate')
+
+g_cache_dir = os.path.join(
+        os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+        'cage', 'fonts')
+
+# Prefixes of the columns which can be shortened.
+g_shortened_columns = ('birthdays_', 'namedays_', 'events_', 'holiday_')
+
+g_ellipsis = '…'
+
+# Separator of the items of a list, cf. `csvcalendar.str_for_field`.
+g_separator = ', '
+
+_svg = '{http://www.w3.org/2000/svg}'
+_sodipodi_role = '{http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd}role'
+_placeholder_re = re.compile(r'%VAR_([A-Za-z0-9_]+)%')
+_number_re = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_transform_re = re.compile(r'(matrix|translate|scale)\s*\(([^)]*)\)')
+_units = {'': 1.0, 'px': 1.0, 'pt': 96.0 / 72.0, 'mm': 96.0 / 25.4,
+        'cm': 96.0 / 2.54, 'in': 96.0}
+
+# Font: (family, bold, italic).
+Font = Tuple[str, bool, bool]
+
+# Advance tables read in this process, by font file.
+_advance_cache: Dict[str, 'GlyphAdvances'] = {}
+
+
+class GlyphAdvances:
+    """Advance widths of the glyphs of a font, in em."""
+
+    def __init__(self, advances: Dict[int, float], default: float):
+        """
+        Parameters
+        ----------
+
+        - advances: code point: advance in em.
+        - default: advance of the characters without glyph.
+
+        """
+        self.advances = advances
+        self.default = default
+
+    def width(self, text: str, size: float) -> float:
+        """Return the width of `text` at the font size `size`."""
+        advances = self.advances
+        default = self.default
+        return size * sum(advances.get(ord(c), default) for c in text)
+
+    @classmethod
+    def from_font_file(cls, font_file: str,
+            cache_dir: Optional[str] = g_cache_dir) -> 'GlyphAdvances':
+        """Return the advances of a font file, cached.
+
+        The table is read with fontTools and cached in `cache_dir`, keyed by
+        the hash of the font file, None for no disk cache.
+
+        """
+        table = _advance_cache.get(font_file)
+        if table is not None:
+            return table
+        with open(font_file, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        cache_file = None
+        if cache_dir is not None:
+            cache_file = os.path.join(cache_dir, digest + '.json')
+            try:
+                with open(cache_file, 'r') as f:
+                    data = json.load(f)
+                table = cls({int(k): v for k, v in data['advances'].items()},
+                        data['default'])
+            except (OSError, ValueError, KeyError):
+                pass
+        if table is None:
+            table = _read_advances(font_file)
+            if cache_file is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp_file = '{}.{}.tmp'.format(cache_file, os.getpid())
+                with open(tmp_file, 'w') as f:
+                    json.dump({'font_file': font_file,
+                        'advances': table.advances,
+                        'default': table.default}, f)
+                os.replace(tmp_file, cache_file)
+        _advance_cache[font_file] = table
+        return table
+
+
+def _read_advances(font_file: str) -> GlyphAdvances:
+    """Read the advances of a font file with fontTools."""
+    from fontTools.ttLib import TTFont
+
+    font = TTFont(font_file, lazy=True)
+    units_per_em = font['head'].unitsPerEm
+    metrics = font['hmtx'].metrics
+    advances = {code_point: metrics[glyph][0] / units_per_em
+            for code_point, glyph in font.getBestCmap().items()
+            if glyph in metrics}
+    if '.notdef' in metrics:
+        default = metrics['.notdef'][0] / units_per_em
+    else:
+        default = sum(advances.values()) / max(len(advances), 1)
+    font.close()
+    return GlyphAdvances(advances, default)
+
+
+class FontResolver:
+    """Find the font file of a font family."""
+
+    def __init__(self, fonts: Optional[Dict[str, str]] = None):
+        """
+        Parameters
+        ----------
+
+        - fonts: font specification: font file, where the specification is
+            the family, optionally followed by ':bold' and ':italic', e.g.
+            'sans-serif:bold'. The other fonts are found with fc-match.
+
+        """
+        self.fonts = dict(fonts or {})
+        self._files: Dict[Font, str] = {}
+
+    def font_file(self, font: Font) -> str:
+        """Return the font file of (family, bold, italic).
+
+        Raise ValueError if not found.
+
+        """
+        font_file = self._files.get(font)
+        if font_file is None:
+            font_file = self._find(font)
+            self._files[font] = font_file
+        return font_file
+
+    def _find(self, font: Font) -> str:
+        family, bold, italic = font
+        suffixes = [':bold' * bold + ':italic' * italic]
+        if bold and italic:
+            suffixes += [':bold', ':italic']
+        # The regular font if there is no variant.
+        suffixes.append('')
+        for suffix in suffixes:
+            font_file = self.fonts.get(family + suffix)
+            if font_file is not None:
+                return font_file
+        if shutil.which('fc-match'):
+            pattern = family
+            if bold:
+                pattern += ':weight=bold'
+            if italic:
+                pattern += ':slant=italic'
+            result = subprocess.run(['fc-match', '-f', '%{file}', pattern],
+                    stdout=subprocess.PIPE, universal_newlines=True)
+            if result.returncode == 0 and result.stdout:
+                return result.stdout
+        raise ValueError('No font file for "{}", use --font'.format(
+            family + suffixes[0]))
+
+
+class _Piece:
+    """A literal text or a placeholder, with its font."""
+
+    __slots__ = ('text', 'variable', 'font', 'size')
+
+    def __init__(self, text: str, variable: Optional[str], font: Font,
+            size: float):
+        self.text = text
+        self.variable = variable
+        self.font = font
+        self.size = size
+
+
+class _Line:
+    """A line of a template with placeholders."""
+
+    __slots__ = ('id', 'x', 'y', 'anchor', 'available', 'pieces')
+
+    def __init__(self, id: str, x: float, y: float, anchor: str,
+            pieces: List[_Piece]):
+        self.id = id
+        self.x = x
+        self.y = y
+        self.anchor = anchor
+        self.available = 0.0
+        self.pieces = pieces
+
+    @property
+    def variables(self) -> List[str]:
+        return [p.variable for p in self.pieces if p.variable is not None]
+
+
+def _parse_style(element: ET.Element, style: Dict[str, str]
+        ) -> Dict[str, str]:
+    """Return the style of `element`, inheriting from `style`."""
+    style = dict(style)
+    for name in ('font-family', 'font-size', 'font-weight', 'font-style',
+            'text-anchor'):
+        value = element.get(name)
+        if value is not None:
+            style[name] = value
+    for declaration in element.get('style', '').split(';'):
+        name, _, value = declaration.partition(':')
+        name = name.strip()
+        if name in ('font-family', 'font-size', 'font-weight', 'font-style',
+                'text-anchor'):
+            style[name] = value.strip()
+    return style
+
+
+def _length(value: str) -> float:
+    """Return a length in user units (px), e.g. '12px' or '3.5mm'."""
+    match = re.match(r'\s*([-+0-9.eE]+)\s*([a-z]*)', value)
+    if not match or match.group(2) not in _units:
+        raise ValueError('Unsupported length "{}"'.format(value))
+    return float(match.group(1)) * _units[match.group(2)]
+
+
+def _font(style: Dict[str, str]) -> Tuple[Font, float]:
+    """Return the font and the size of a style."""
+    family = style.get('font-family', 'sans-serif').split(',')[0]
+    family = family.strip().strip('\'"')
+    weight = style.get('font-weight', 'normal')
+    bold = weight in ('bold', 'bolder') or (weight.isdigit()
+            and int(weight) >= 600)
+    italic = style.get('font-style', 'normal') in ('italic', 'oblique')
+    return (family, bold, italic), _length(style.get('font-size', '16px'))
+
+
+def _transform(value: Optional[str]) -> List[float]:
+    """Return the matrix (a, b, c, d, e, f) of a transform attribute."""
+    matrix = [1.0, 0.0, 0.0, 1.0, 0.0, 0.0]
+    for name, args in _transform_re.findall(value or ''):
+        v = [float(n) for n in _number_re.findall(args)]
+        if name == 'matrix':
+            m = v
+        elif name == 'translate':
+            m = [1.0, 0.0, 0.0, 1.0, v[0], v[1] if len(v) > 1 else 0.0]
+        else:
+            m = [v[0], 0.0, 0.0, v[1] if len(v) > 1 else v[0], 0.0, 0.0]
+        matrix = _multiply(matrix, m)
+    return matrix
+
+
+def _multiply(m: Sequence[float], n: Sequence[float]) -> List[float]:
+    return [m[0] * n[0] + m[2] * n[1],
+            m[1] * n[0] + m[3] * n[1],
+            m[0] * n[2] + m[2] * n[3],
+            m[1] * n[2] + m[3] * n[3],
+            m[0] * n[4] + m[2] * n[5] + m[4],
+            m[1] * n[4] + m[3] * n[5] + m[5]]
+
+
+def _pieces(element: ET.Element, style: Dict[str, str], scale: float,
+        pieces: List[_Piece]):
+    """Append the pieces of `element` and its children, in text order."""
+    style = _parse_style(element, style)
+    font, size = _font(style)
+    size *= scale
+    _split(element.text, font, size, pieces)
+    for child in element:
+        if child.tag == _svg + 'tspan':
+            _pieces(child, style, scale, pieces)
+        _split(child.tail, font, size, pieces)
+
+
+def _split(text: Optional[str], font: Font, size: float,
+        pieces: List[_Piece]):
+    if not text:
+        return
+    start = 0
+    for match in _placeholder_re.finditer(text):
+        if match.start() > start:
+            pieces.append(_Piece(text[start:match.start()], None, font, size))
+        pieces.append(_Piece(match.group(0), match.group(1), font, size))
+        start = match.end()
+    if start < len(text):
+        pieces.append(_Piece(text[start:], None, font, size))
+
+
+class TemplateLines:
+    """The lines with placeholders of an svg template."""
+
+    def __init__(self, filename: str, margin: Optional[float] = None):
+        """
+        Parameters
+        ----------
+
+        - filename: svg template.
+        - margin: right margin of the lines, in user units, default to the
+            smallest x of the lines.
+
+        """
+        self.filename = filename
+        root = ET.parse(filename).getroot()
+        view_box = root.get('viewBox')
+        if view_box:
+            self.page_width = float(_number_re.findall(view_box)[2])
+        else:
+            self.page_width = _length(root.get('width', '0'))
+        self.lines: List[_Line] = []
+        # Smallest x of the lines anchored at their start, with or without
+        # placeholders.
+        self.left = self.page_width
+        self._walk(root, [1.0, 0.0, 0.0, 1.0, 0.0, 0.0], {})
+        if margin is None:
+            margin = self.left
+        self._set_available(margin)
+
+    def _set_available(self, margin: float):
+        """Set the available widths, merge the lines sharing a baseline.
+
+        A line anchored at its start followed by a line anchored at its end
+        on the same baseline (e.g. the events of a day then its birthdays) is
+        measured as one line between both anchors.
+
+        """
+        right = self.page_width - margin
+        lines = []
+        for line in sorted(self.lines, key=lambda l: (round(l.y, 1), l.x)):
+            previous = lines[-1] if lines else None
+            if (line.anchor == 'end' and previous is not None
+                    and previous.anchor == 'start'
+                    and round(previous.y, 1) == round(line.y, 1)
+                    and previous.x < line.x):
+                # At least a space between both.
+                space = _Piece(' ', None, line.pieces[0].font,
+                        line.pieces[0].size)
+                lines[-1] = _Line(previous.id + '+' + line.id, previous.x,
+                        previous.y, 'start',
+                        previous.pieces + [space] + line.pieces)
+                lines[-1].available = line.x - previous.x
+                continue
+            if line.anchor == 'start':
+                line.available = right - line.x
+            elif line.anchor == 'end':
+                line.available = line.x - margin
+            else:
+                line.available = 2 * min(line.x - margin, right - line.x)
+            lines.append(line)
+        self.lines = lines
+
+    def _walk(self, element: ET.Element, matrix: List[float],
+            style: Dict[str, str]):
+        matrix = _multiply(matrix, _transform(element.get('transform')))
+        style = _parse_style(element, style)
+        if element.tag == _svg + 'text':
+            self._add_text(element, matrix, style)
+            return
+        for child in element:
+            self._walk(child, matrix, style)
+
+    def _add_text(self, element: ET.Element, matrix: List[float],
+            style: Dict[str, str]):
+        scale = matrix[0]
+        rows = [child for child in element
+                if child.get(_sodipodi_role) == 'line']
+        if not rows:
+            rows = [element]
+        for row in rows:
+            x = float(_number_re.findall(row.get('x') or element.get('x')
+                or '0')[0])
+            y = float(_number_re.findall(row.get('y') or element.get('y')
+                or '0')[0])
+            x, y = (matrix[0] * x + matrix[2] * y + matrix[4],
+                    matrix[1] * x + matrix[3] * y + matrix[5])
+            anchor = _parse_style(row, style).get('text-anchor', 'start')
+            if anchor == 'start':
+                self.left = min(self.left, x)
+            pieces: List[_Piece] = []
+            _pieces(row, style, scale, pieces)
+            if not any(p.variable for p in pieces):
+                continue
+            self.lines.append(_Line(row.get('id', ''), x, y, anchor, pieces))
+
+
+class Overflow:
+    """A line too long for a row."""
+
+    __slots__ = ('template', 'line', 'row', 'width', 'available', 'text')
+
+    def __init__(self, template: str, line: str, row: str, width: float,
+            available: float, text: str):
+        self.template = template
+        self.line = line
+        self.row = row
+        self.width = width
+        self.available = available
+        self.text = text
+
+    def __str__(self):
+        return '{}:{}: {}: {:.1f} > {:.1f}: {}'.format(self.template,
+                self.line, self.row, self.width, self.available, self.text)
+
+
+class _Measure:
+    """Width of pieces with a FontResolver."""
+
+    def __init__(self, resolver: FontResolver, cache_dir: Optional[str]):
+        self.resolver = resolver
+        self.cache_dir = cache_dir
+
+    def __call__(self, text: str, font: Font, size: float) -> float:
+        return GlyphAdvances.from_font_file(self.resolver.font_file(font),
+                self.cache_dir).width(text, size)
+
+
+def _value(piece: _Piece, row: Dict[str, str]) -> str:
+    if piece.variable is None:
+        return piece.text
+    value = row.get(piece.variable)
+    return piece.text if value is None else str(value)
+
+
+def _line_width(line: _Line, row: Dict[str, str], measure: _Measure) -> float:
+    return sum(measure(_value(p, row), p.font, p.size) for p in line.pieces)
+
+
+def _truncate(value: str, width: float, font: Font, size: float,
+        measure: _Measure) -> str:
+    """Return the longest start of `value` narrower than `width`, with '…'.
+
+    The value is cut after the last complete item of the list if any.
+
+    """
+    lo = 0
+    hi = len(value)
+    # Longest prefix such that prefix + '…' fits.
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if measure(value[:mid] + g_ellipsis, font, size) <= width:
+            lo = mid
+        else:
+            hi = mid - 1
+    prefix = value[:lo]
+    end = prefix.rfind(g_separator)
+    if end >= 0:
+        prefix = prefix[:end + len(g_separator)]
+    if not prefix and measure(g_ellipsis, font, size) > width:
+        return ''
+    return prefix + g_ellipsis
+
+
+def _abbreviate(value: str, abbreviations: Dict[str, str]) -> str:
+    if value in abbreviations:
+        return abbreviations[value]
+    return g_separator.join(abbreviations.get(item, item)
+            for item in value.split(g_separator))
+
+
+def _shorten(line: _Line, row: Dict[str, str], overflow: float,
+        measure: _Measure, abbreviations: Optional[Dict[str, str]]):
+    """Shorten the values of `row` in `line` by at least `overflow`."""
+    pieces = [p for p in line.pieces if p.variable
+            and p.variable.startswith(g_shortened_columns)
+            and row.get(p.variable)]
+    if abbreviations:
+        for p in pieces:
+            value = str(row[p.variable])
+            short = _abbreviate(value, abbreviations)
+            if short != value:
+                overflow -= (measure(value, p.font, p.size)
+                        - measure(short, p.font, p.size))
+                row[p.variable] = short
+        if overflow <= 0:
+            return
+    # The widest values first, a short nameday is kept if the events can be
+    # shortened instead.
+    pieces.sort(key=lambda p: measure(str(row[p.variable]), p.font, p.size),
+            reverse=True)
+    for p in pieces:
+        value = str(row[p.variable])
+        width = measure(value, p.font, p.size)
+        short = _truncate(value, width - overflow, p.font, p.size, measure)
+        row[p.variable] = short
+        overflow -= width - measure(short, p.font, p.size)
+        if overflow <= 0:
+            return
+
+
+def fit_rows(rows: Iterable[Dict[str, str]],
+        templates: Sequence[TemplateLines],
+        policy: str = 'report',
+        resolver: Optional[FontResolver] = None,
+        abbreviations: Optional[Dict[str, str]] = None,
+        cache_dir: Optional[str] = g_cache_dir,
+        overflows: Optional[List[Overflow]] = None
+        ) -> Iterator[Dict[str, str]]:
+    """Yield the rows, shortened according to `policy`.
+
+    Parameters
+    ----------
+
+    - rows: data rows, column: value.
+    - templates: templates in which each row is rendered.
+    - policy: one of `g_policies`.
+    - resolver: font files, default to fc-match.
+    - abbreviations: long: short names, for the policy 'abbreviate'.
+    - cache_dir: cache of the glyph advances, None for no disk cache.
+    - overflows: list completed with the lines too long, after shortening.
+
+    """
+    if policy not in g_policies:
+        raise ValueError('Policy must be one of {}'.format(
+            ', '.join(g_policies)))
+    measure = _Measure(resolver or FontResolver(), cache_dir)
+    if policy != 'abbreviate':
+        abbreviations = None
+    for index, row in enumerate(rows):
+        for template in templates:
+            for line in template.lines:
+                width = _line_width(line, row, measure)
+                if width <= line.available:
+                    continue
+                if policy != 'report':
+                    _shorten(line, row, width - line.available, measure,
+                            abbreviations)
+                    width = _line_width(line, row, measure)
+                    if width <= line.available:
+                        continue
+                if overflows is not None:
+                    overflows.append(Overflow(template.filename, line.id,
+                        str(row.get('code', index + 1)), width,
+                        line.available,
+                        ''.join(_value(p, row) for p in line.pieces)))
+        yield row
+
+
+def holiday_abbreviations() -> Dict[str, str]:
+    """Return the long: short holiday names of holiday_provider.g_countries.
+
+    The countries whose module cannot be imported (it requires calendra) are
+    skipped with a warning.
+
+    """
+    import importlib
+
+    import holiday_provider
+
+    abbreviations = {}
+    for country, (module_name, _) in holiday_provider.g_countries.items():
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError as e:
+            warnings.warn('No short holiday names for {}: {}'.format(
+                country, e))
+            continue
+        for key, name in module.long_.items():
+            if key in module.short_ and module.short_[key] != name:
+                abbreviations[name] = module.short_[key]
+    return abbreviations
+
+
+def read_abbreviations(abbreviation_file: str) -> Dict[str, str]:
+    """Return the long: short names of a file with lines 'long,short'."""
+    abbreviations = {}
+    with open(abbreviation_file, 'r') as f:
+        for line_number, l in enumerate(f, 1):
+            if not l.strip():
+                continue
+            long_name, sep, short_name = l.rstrip('\n').rpartition(',')
+            if not sep:
+                raise ValueError('{}:{}: expected "long,short"'.format(
+                    abbreviation_file, line_number))
+            abbreviations[long_name] = short_name
+    return abbreviations
+
+
+def read_rows(data_file: str) -> Tuple[List[str], List[Dict[str, str]]]:
+    """Return the columns and the rows of a csv file of generate_csv.py.
+
+    The numbers (unquoted fields) are kept as int, so that they are written
+    back unquoted.
+
+    """
+    with open(data_file, 'r', newline='') as f:
+        reader = csv.reader(f, CsvDialect)
+        columns = [str(c) for c in next(reader)]
+        rows = []
+        for fields in reader:
+            rows.append({c: int(v) if isinstance(v, float) else v
+                for c, v in zip(columns, fields)})
+    return columns, rows
+
+
+def _parse_font(value: str) -> Tuple[str, str]:
+    spec, sep, font_file = value.rpartition('=')
+    if not sep or not spec:
+        raise ValueError('Font must be "family[:bold][:italic]=FILE"')
+    return spec, font_file
+
+
+if __name__ == '__main__':
+    usage = 'usage: %prog [options] --data-file FILE template.svg [...]'
+    parser = OptionParser(usage=usage,
+            description=('Find the lines of the templates too long for the'
+                ' data of generate_csv.py, before rendering, and optionally'
+                ' shorten the data. Exit with 1 if lines are too long.'))
+
+    parser.add_option('-d', '--data-file', dest='data_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help='csv data, as written by generate_csv.py')
+
+    parser.add_option('-p', '--policy', dest='policy',
+            action='store', type='choice', choices=list(g_policies),
+            default='report',
+            help=('"report" the lines too long, "truncate" or "abbreviate"'
+                ' the data, default %default'))
+
+    parser.add_option('-o', '--output-file', dest='output_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help='write the shortened data to FILE')
+
+    parser.add_option('-f', '--font', dest='fonts',
+            action='append', type=str, metavar='SPEC=FILE', default=[],
+            help=('font file of a family, e.g. "sans-serif=DejaVuSans.ttf"'
+                ' or "sans-serif:bold=DejaVuSans-Bold.ttf", can be given'
+                ' several times, the other fonts are found with fc-match'))
+
+    parser.add_option('-a', '--abbreviations', dest='abbreviation_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help=('file with "long,short" lines, used with "abbreviate" in'
+                ' addition to the short holiday names'))
+
+    parser.add_option('--margin', dest='margin',
+            action='store', type=float, default=None,
+            help=('right margin of the lines in user units of the templates,'
+                ' default to their left margin'))
+
+    parser.add_option('-q', '--quiet', dest='quiet',
+            action='store_true', default=False,
+            help='do not print the lines too long')
+
+    options, args = parser.parse_args()
+    if not options.data_file:
+        parser.error('--data-file is required')
+    if not args:
+        parser.error('template missing')
+    if options.policy != 'report' and not options.output_file:
+        parser.error('--output-file is required with --policy {}'.format(
+            options.policy))
+    try:
+        resolver = FontResolver(dict(_parse_font(v) for v in options.fonts))
+        abbreviations = None
+        if options.policy == 'abbreviate':
+            abbreviations = holiday_abbreviations()
+            if options.abbreviation_file:
+                abbreviations.update(read_abbreviations(
+                    options.abbreviation_file))
+        templates = [TemplateLines(t, options.margin) for t in args]
+        columns, rows = read_rows(options.data_file)
+        overflows: List[Overflow] = []
+        rows = list(fit_rows(rows, templates, options.policy, resolver,
+            abbreviations, overflows=overflows))
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(2)
+    if options.output_file:
+        with open(options.output_file, 'w', newline='') as f:
+            writer = csv.writer(f, CsvDialect)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow([row[c] for c in columns])
+    if not options.quiet:
+        for overflow in overflows:
+            print(overflow, file=sys.stderr)
+    if overflows:
+        sys.exit(1)
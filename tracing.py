@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# Opt-in tracing of the build stages, written as Chrome trace events to be
+# opened with https://ui.perfetto.dev or chrome://tracing.
+#
+# Tracing is enabled by the environment variable CAGE_TRACE, set to the trace
+# file, or with `enable`. The events of all processes are appended to the
+# same file, in the JSON array format (the closing bracket is optional in
+# this format), so that the trace of a whole build can be collected.
+# The timestamps are from the wall clock, to align the processes.
+#
+# As a script, run a command in a span, the Python scripts of the command
+# trace into the same file:
+#   python3 tracing.py --trace-file=trace.json --name=stage -- command args
+
+import atexit
+from contextlib import contextmanager
+import json
+import os
+from optparse import OptionParser
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+__all__ = [
+        'counted',
+        'counting_stream',
+        'enable',
+        'enabled',
+        'flush',
+        'span',
+        ]
+
+g_env_var = 'CAGE_TRACE'
+
+g_trace_file: Optional[str] = os.environ.get(g_env_var) or None
+
+# Events not written yet.
+g_events: List[Dict[str, Any]] = []
+
+# Number of events kept before writing them.
+g_buffer_size = 1000
+
+_lock = threading.Lock()
+_atexit_registered = False
+_process_named = False
+
+
+def _after_fork_in_child():
+    """Drop the events of the parent, written by the parent."""
+    global _lock
+    global _process_named
+    _lock = threading.Lock()
+    g_events.clear()
+    _process_named = False
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def enable(trace_file: str):
+    """Record the events to `trace_file`, also for child processes."""
+    global g_trace_file
+    global _atexit_registered
+    g_trace_file = trace_file
+    os.environ[g_env_var] = trace_file
+    if not _atexit_registered:
+        atexit.register(flush)
+        _atexit_registered = True
+
+
+def enabled() -> bool:
+    return g_trace_file is not None
+
+
+def _now_us() -> int:
+    return time.time_ns() // 1000
+
+
+def add_event(name: str, start_us: int, end_us: int,
+        category: str = 'stage', args: Optional[Dict[str, Any]] = None):
+    """Record a complete event, from `start_us` to `end_us` in µs."""
+    global _process_named
+    if not enabled():
+        return
+    event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': start_us,
+            'dur': end_us - start_us,
+            'pid': os.getpid(),
+            'tid': threading.get_native_id(),
+            }
+    if args:
+        event['args'] = args
+    with _lock:
+        if not _process_named:
+            g_events.append({
+                'name': 'process_name',
+                'ph': 'M',
+                'pid': os.getpid(),
+                'args': {'name': os.path.basename(sys.argv[0]) or 'python'},
+                })
+            _process_named = True
+        g_events.append(event)
+        full = len(g_events) >= g_buffer_size
+    if full:
+        flush()
+
+
+@contextmanager
+def span(name: str, category: str = 'stage',
+        **args) -> Iterator[Dict[str, Any]]:
+    """Record the duration of the block.
+
+    Yield the dictionary of the event arguments, which can be completed in
+    the block, e.g. with item counts.
+
+    Parameters
+    ----------
+
+    - name: name of the span.
+    - category: category, e.g. 'stage' or 'page'.
+    - args: arguments of the event.
+
+    """
+    if not enabled():
+        yield args
+        return
+    start = _now_us()
+    try:
+        yield args
+    finally:
+        add_event(name, start, _now_us(), category, args)
+
+
+def counted(iterable: Iterable, args: Dict[str, Any],
+        key: str = 'items') -> Iterable:
+    """Return `iterable`, counting the items into `args[key]` if enabled."""
+    if not enabled():
+        return iterable
+    return _counted(iterable, args, key)
+
+
+def _counted(iterable: Iterable, args: Dict[str, Any], key: str) -> Iterator:
+    args[key] = 0
+    for item in iterable:
+        args[key] += 1
+        yield item
+
+
+class _CountingStream:
+    """Text stream counting the bytes written, in UTF-8."""
+
+    def __init__(self, stream: TextIO, args: Dict[str, Any], key: str):
+        self._stream = stream
+        self._args = args
+        self._key = key
+        args[key] = 0
+
+    def write(self, s: str) -> int:
+        self._args[self._key] += len(s.encode('utf-8'))
+        return self._stream.write(s)
+
+
+def counting_stream(stream: TextIO, args: Dict[str, Any],
+        key: str = 'bytes') -> TextIO:
+    """Return `stream`, counting the bytes written into `args[key]` if enabled."""
+    if not enabled():
+        return stream
+    return _CountingStream(stream, args, key)
+
+
+def _create_trace_file(data: bytes) -> bool:
+    """Create the trace file with the opening bracket and `data`.
+
+    The file is created at once, by linking a complete temporary file, so
+    that no other process can append its events before the bracket.
+    Return False if the file already exists.
+
+    """
+    tmp_file = '{}.{}.{}'.format(g_trace_file, os.getpid(),
+            threading.get_ident())
+    with open(tmp_file, 'wb') as f:
+        f.write(b'[\n' + data)
+    try:
+        os.link(tmp_file, g_trace_file)
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(tmp_file)
+    return True
+
+
+def flush():
+    """Append the recorded events to the trace file."""
+    if not enabled():
+        return
+    with _lock:
+        events = g_events[:]
+        del g_events[:]
+    if not events:
+        return
+    data = ''.join(json.dumps(e, ensure_ascii=False) + ',\n'
+            for e in events).encode('utf-8')
+    if not os.path.exists(g_trace_file) and _create_trace_file(data):
+        return
+    # One write in append mode, for concurrent processes.
+    fd = os.open(g_trace_file, os.O_WRONLY | os.O_APPEND)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def run_command(name: str, command: List[str],
+        category: str = 'command') -> int:
+    """Run a command in a span and return its exit code."""
+    with span(name, category, command=' '.join(command)) as args:
+        args['returncode'] = subprocess.call(command)
+    return args['returncode']
+
+
+if g_trace_file is not None:
+    atexit.register(flush)
+    _atexit_registered = True
+
+
+if __name__ == '__main__':
+    usage = 'usage: %prog [options] -- command [args ...]'
+    parser = OptionParser(usage=usage,
+            description=('Run a command and record its duration as a Chrome'
+                ' trace event.'))
+    parser.disable_interspersed_args()
+
+    parser.add_option('-f', '--trace-file', dest='trace_file',
+            action='store', type=str, metavar='FILE', default=g_trace_file,
+            help='trace file, default to ${}'.format(g_env_var))
+
+    parser.add_option('-n', '--name', dest='name',
+            action='store', type=str, default=None,
+            help='name of the span, default to the command')
+
+    options, args = parser.parse_args()
+    if not args:
+        parser.error('command missing')
+    if not options.trace_file:
+        # Run the command without tracing.
+        sys.exit(subprocess.call(args))
+    enable(options.trace_file)
+    sys.exit(run_command(options.name or os.path.basename(args[0]), args))
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# Validation of the input files of generate_csv.py, each file being read once.
+#
+# The diagnostics have a location "file:line", a severity, a code and a
+# message:
+#
+# - error 'format': the line cannot be parsed, generate_csv.py would fail.
+# - error 'date': the date does not exist, generate_csv.py would fail.
+# - warning 'empty-name': the name is empty.
+# - warning 'duplicate': a holiday or a moon phase is already set at this
+#   date, the last one replaces the previous ones.
+# - warning 'future-birth': the birth year is after the end of the calendar.
+# - info 'out-of-range': an event, holiday or moon phase out of the calendar,
+#   it is ignored.
+# - info 'feb-29': a birthday on Feb. 29th, celebrated on March 1st in
+#   non-leap years.
+#
+# The report is written as JSON. Input without errors can be loaded in
+# trusted mode (`generate_csv.py --trusted`), without checking each item.
+
+import calendar
+import datetime
+import json
+from optparse import OptionParser
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from csvcalendar import Calendar
+from csvcalendar import RangeCalendar
+
+__all__ = [
+        'Diagnostic',
+        'Report',
+        'validate_files',
+        ]
+
+g_severities = ('error', 'warning', 'info')
+
+
+class Diagnostic:
+    __slots__ = ('filename', 'line', 'severity', 'code', 'message')
+
+    def __init__(self, filename: str, line: int, severity: str, code: str,
+            message: str):
+        """
+        Parameters
+        ----------
+
+        - filename: input file.
+        - line: line number, from 1.
+        - severity: 'error', 'warning' or 'info'.
+        - code: short identifier of the check, e.g. 'date'.
+        - message: human-readable message.
+
+        """
+        self.filename = filename
+        self.line = line
+        self.severity = severity
+        self.code = code
+        self.message = message
+
+    @property
+    def location(self) -> str:
+        return '{}:{}'.format(self.filename, self.line)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+                'location': self.location,
+                'file': self.filename,
+                'line': self.line,
+                'severity': self.severity,
+                'code': self.code,
+                'message': self.message,
+                }
+
+    def __str__(self):
+        return '{}: {}: {}'.format(self.location, self.severity, self.message)
+
+
+class Report:
+    """Diagnostics of the validation of several files."""
+
+    def __init__(self, first_day: datetime.date, last_day: datetime.date):
+        """
+        Parameters
+        ----------
+
+        - first_day, last_day: range of the calendar.
+
+        """
+        self.first_day = first_day
+        self.last_day = last_day
+        self.files: List[str] = []
+        self.diagnostics: List[Diagnostic] = []
+
+    def add(self, filename: str, line: int, severity: str, code: str,
+            message: str):
+        self.diagnostics.append(Diagnostic(filename, line, severity, code,
+            message))
+
+    def count(self, severity: str) -> int:
+        return sum(1 for d in self.diagnostics if d.severity == severity)
+
+    @property
+    def errors(self) -> List[Diagnostic]:
+        return [d for d in self.diagnostics if d.severity == 'error']
+
+    def as_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {
+                'first_day': self.first_day.isoformat(),
+                'last_day': self.last_day.isoformat(),
+                'files': self.files,
+                }
+        for severity in g_severities:
+            result[severity + 's'] = self.count(severity)
+        result['diagnostics'] = [d.as_dict() for d in self.diagnostics]
+        return result
+
+    def write(self, report_file: str):
+        with open(report_file, 'w') as f:
+            json.dump(self.as_dict(), f, indent=1, ensure_ascii=False)
+            f.write('\n')
+
+
+def _split(report: Report, filename: str, line_number: int, l: str,
+        date_length: int, example: str) -> Optional[Tuple[str, str]]:
+    """Return (datestr, name) of a line 'date,name', None if wrong.
+
+    A line with only the date has an empty name, as for generate_csv.py.
+
+    """
+    if l[date_length:].strip() and l[date_length] != ',':
+        report.add(filename, line_number, 'error', 'format',
+                'expected "{},name"'.format(example))
+        return None
+    name = l[date_length + 1:].strip()
+    if not name:
+        report.add(filename, line_number, 'warning', 'empty-name',
+                'empty name')
+    return l[:date_length], name
+
+
+def _parse_date(report: Report, filename: str, line_number: int,
+        datestr: str, year_zero: bool = False) -> Optional[datetime.date]:
+    """Return the date of 'yyyy-mm-dd', None if wrong.
+
+    With `year_zero`, the year 0000 is accepted and replaced by 1.
+
+    """
+    try:
+        if datestr[4] != '-' or datestr[7] != '-':
+            raise ValueError
+        year = int(datestr[:4])
+        month = int(datestr[5:7])
+        day = int(datestr[8:10])
+    except (ValueError, IndexError):
+        report.add(filename, line_number, 'error', 'format',
+                'expected a date yyyy-mm-dd, got "{}"'.format(datestr))
+        return None
+    if year_zero and not year:
+        year = 1
+    try:
+        return datetime.date(year, month, day)
+    except ValueError as e:
+        report.add(filename, line_number, 'error', 'date',
+                'invalid date "{}": {}'.format(datestr, e))
+        return None
+
+
+def _has_common_year(first_day: datetime.date, last_day: datetime.date) -> bool:
+    """Return whether a Feb. 29th would be moved in [first_day, last_day]."""
+    for year in range(first_day.year, last_day.year + 1):
+        if (not calendar.isleap(year)
+                and first_day <= datetime.date(year, 3, 1) <= last_day):
+            return True
+    return False
+
+
+def validate_birthdays(report: Report, birthday_file: str):
+    """Check a birthday file with lines 'yyyy-mm-dd,name'."""
+    report.files.append(birthday_file)
+    feb_29_moved = _has_common_year(report.first_day, report.last_day)
+    with open(birthday_file, 'r') as f:
+        for line_number, l in enumerate(f, 1):
+            fields = _split(report, birthday_file, line_number, l, 10,
+                    'yyyy-mm-dd')
+            if fields is None:
+                continue
+            date = _parse_date(report, birthday_file, line_number, fields[0],
+                    year_zero=True)
+            if date is None:
+                continue
+            if date.year > report.last_day.year:
+                report.add(birthday_file, line_number, 'warning',
+                        'future-birth',
+                        'birth year {} after the end of the calendar'.format(
+                            date.year))
+            if feb_29_moved and (date.month, date.day) == (2, 29):
+                report.add(birthday_file, line_number, 'info', 'feb-29',
+                        'birthday on Feb. 29th, celebrated on March 1st in'
+                        ' non-leap years')
+
+
+def validate_events(report: Report, event_file: str, kind: str = 'event'):
+    """Check a file with lines 'yyyy-mm-dd,name'.
+
+    Parameters
+    ----------
+
+    - report: report to complete.
+    - event_file: file name.
+    - kind: 'event', 'holiday' or 'moon', holidays and moon phases are
+        unique per day.
+
+    """
+    if kind not in ('event', 'holiday', 'moon'):
+        raise ValueError('Unknown kind {}'.format(kind))
+    report.files.append(event_file)
+    # date: line number of the first entry at this date.
+    seen: Dict[datetime.date, int] = {}
+    with open(event_file, 'r') as f:
+        for line_number, l in enumerate(f, 1):
+            fields = _split(report, event_file, line_number, l, 10,
+                    'yyyy-mm-dd')
+            if fields is None:
+                continue
+            date = _parse_date(report, event_file, line_number, fields[0])
+            if date is None:
+                continue
+            if not report.first_day <= date <= report.last_day:
+                report.add(event_file, line_number, 'info', 'out-of-range',
+                        '{} {} out of the calendar, ignored'.format(kind,
+                            date.isoformat()))
+                continue
+            if kind == 'event':
+                continue
+            if date in seen:
+                report.add(event_file, line_number, 'warning', 'duplicate',
+                        '{} {} already set at line {}, replaced'.format(kind,
+                            date.isoformat(), seen[date]))
+            else:
+                seen[date] = line_number
+
+
+def validate_namedays(report: Report, nameday_file: str):
+    """Check a nameday file with lines 'include,mm-dd,name'."""
+    report.files.append(nameday_file)
+    with open(nameday_file, 'r') as f:
+        for line_number, l in enumerate(f, 1):
+            if l[:1] not in ('0', '1') or l[1:2] != ',':
+                report.add(nameday_file, line_number, 'error', 'format',
+                        'expected "0,mm-dd,name" or "1,mm-dd,name"')
+                continue
+            fields = _split(report, nameday_file, line_number, l[2:], 5,
+                    'mm-dd')
+            if fields is None:
+                continue
+            # 2000 is a leap year, for Feb. 29th.
+            _parse_date(report, nameday_file, line_number,
+                    '2000-' + fields[0])
+
+
+def validate_files(first_day: datetime.date,
+        last_day: datetime.date,
+        birthday_files: Iterable[str] = (),
+        event_files: Iterable[str] = (),
+        holiday_files: Iterable[str] = (),
+        moon_files: Iterable[str] = (),
+        nameday_files: Iterable[str] = ()) -> Report:
+    """Return the report of the validation of the input files.
+
+    Parameters
+    ----------
+
+    - first_day, last_day: range of the calendar, e.g. `Calendar.first_day`
+        and `Calendar.last_day`.
+    - birthday_files, event_files, holiday_files, moon_files, nameday_files:
+        files in the formats of generate_csv.py.
+
+    """
+    report = Report(first_day, last_day)
+    for birthday_file in birthday_files:
+        validate_birthdays(report, birthday_file)
+    for kind, files in (('event', event_files), ('holiday', holiday_files),
+            ('moon', moon_files)):
+        for event_file in files:
+            validate_events(report, event_file, kind)
+    for nameday_file in nameday_files:
+        validate_namedays(report, nameday_file)
+    return report
+
+
+def _files(filename: Optional[str]) -> Sequence[str]:
+    return [filename] if filename else []
+
+
+if __name__ == '__main__':
+    usage = ('usage: %prog [options] year\n'
+            '       %prog [options] --first-date yyyy-mm-dd'
+            ' --last-date yyyy-mm-dd')
+    parser = OptionParser(usage=usage,
+            description=('Check the input files of generate_csv.py and write'
+                ' a JSON report. Exit with 1 if there are errors.'))
+
+    parser.add_option('-e', '--extra-weeks', dest='extra_weeks',
+            action='store', type=int, default=2,
+            help='number of weeks of the following year, default %default')
+
+    parser.add_option('--first-date', dest='first_date',
+            action='store', type=str, default=None,
+            help='first date of the calendar, instead of the year')
+
+    parser.add_option('--last-date', dest='last_date',
+            action='store', type=str, default=None,
+            help='last date of the calendar, with --first-date')
+
+    parser.add_option('-b', '--birthday-file', dest='birthday_file',
+            action='store', type=str, default=None,
+            help='birthday file, cf. generate_csv.py')
+
+    parser.add_option('-d', '--holiday-file', dest='holiday_file',
+            action='store', type=str, default=None,
+            help='holiday file, cf. generate_csv.py')
+
+    parser.add_option('-m', '--moon-file', dest='moon_file',
+            action='store', type=str, default=None,
+            help='moon file, cf. generate_csv.py')
+
+    parser.add_option('-n', '--nameday-file', dest='nameday_file',
+            action='store', type=str, default=None,
+            help='nameday file, cf. generate_csv.py')
+
+    parser.add_option('-v', '--event-file', dest='event_file',
+            action='store', type=str, default=None,
+            help='event file, cf. generate_csv.py')
+
+    parser.add_option('-o', '--output-file', dest='output_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help='write the report to FILE instead of the standard output')
+
+    parser.add_option('-q', '--quiet', dest='quiet',
+            action='store_true', default=False,
+            help='do not print the errors and warnings to the standard error')
+
+    options, args = parser.parse_args()
+    if bool(options.first_date) != bool(options.last_date):
+        parser.error('--first-date and --last-date go together')
+    try:
+        if options.first_date:
+            cal = RangeCalendar(
+                    datetime.date.fromisoformat(options.first_date),
+                    datetime.date.fromisoformat(options.last_date))
+        elif args:
+            cal = Calendar(int(args[0]), extra_weeks=options.extra_weeks)
+        else:
+            parser.error('year argument missing')
+    except ValueError as e:
+        parser.error(str(e))
+    report = validate_files(cal.first_day, cal.last_day,
+            birthday_files=_files(options.birthday_file),
+            event_files=_files(options.event_file),
+            holiday_files=_files(options.holiday_file),
+            moon_files=_files(options.moon_file),
+            nameday_files=_files(options.nameday_file))
+    if options.output_file:
+        report.write(options.output_file)
+    else:
+        json.dump(report.as_dict(), sys.stdout, indent=1, ensure_ascii=False)
+        sys.stdout.write('\n')
+    if not options.quiet:
+        for diagnostic in report.diagnostics:
+            if diagnostic.severity != 'info':
+                print(diagnostic, file=sys.stderr)
+    if report.errors:
+        sys.exit(1)
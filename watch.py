@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+# Keep the calendar in memory and update the csv data, and optionally the pdf
+# pages, when the input files change.
+#
+# The input files are watched with inotify (Linux, through ctypes) or by
+# polling their modification time. On a change, the lines removed from and
+# added to the file give the days to update, only these days are filled
+# again and only the new lines are parsed. Only the rows of the weeks with a
+# changed day are recomputed, and only their pages are rendered again with
+# pagecache.py, with Inkscape processes kept running.
+#
+# Removing a holiday or a moon phase from its file clears it in the
+# calendar, also when it was computed (--moon-glyphs, --holiday-countries).
+
+import collections
+import ctypes
+import ctypes.util
+import csv
+import datetime
+import io
+import os
+from optparse import OptionParser
+import select
+import struct
+import subprocess
+import sys
+import time
+from typing import Counter, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from csvcalendar import Birthday
+from csvcalendar import Celebration
+from csvcalendar import CsvDialect
+from csvcalendar import Event
+from csvcalendar import Nameday
+from generate_csv import build_calendar
+from generate_csv import parse_date
+from layouts import WeekLayout
+import tracing
+
+__all__ = [
+        'Watcher',
+        'file_monitor',
+        ]
+
+# Keyword argument of build_calendar: kind of items in the file.
+g_file_kinds = {
+        'birthday_file': 'birthday',
+        'event_file': 'event',
+        'holiday_file': 'holiday',
+        'moon_file': 'moon',
+        'nameday_file': 'nameday',
+        }
+
+# Time to wait for further changes after a change, in seconds, editors may
+# write a file in several steps.
+g_settle_time = 0.05
+
+# Interval of the polling monitor, in seconds.
+g_poll_interval = 0.2
+
+# inotify events: IN_CLOSE_WRITE | IN_MOVED_TO.
+_in_mask = 0x00000008 | 0x00000080
+_in_event = struct.Struct('iIII')
+
+
+class _Inotify:
+    """Watch files through inotify, on their directories.
+
+    Watching the directories also catches the files replaced by a rename,
+    as most editors save.
+
+    """
+
+    def __init__(self, paths: Iterable[str]):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._paths = set(paths)
+        self._fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        # Watch descriptor: directory.
+        self._dirs: Dict[int, str] = {}
+        for directory in set(os.path.dirname(p) for p in self._paths):
+            wd = libc.inotify_add_watch(self._fd,
+                    os.fsencode(directory), _in_mask)
+            if wd < 0:
+                os.close(self._fd)
+                raise OSError(ctypes.get_errno(),
+                        'inotify_add_watch failed for {}'.format(directory))
+            self._dirs[wd] = directory
+
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        """Return the watched files changed until `timeout`, in seconds."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self._fd, 65536)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = _in_event.unpack_from(data, offset)
+            offset += _in_event.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            path = os.path.join(self._dirs.get(wd, ''), os.fsdecode(name))
+            if path in self._paths:
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class _Poller:
+    """Watch files by polling their modification time and size."""
+
+    def __init__(self, paths: Iterable[str]):
+        self._stats = {p: self._stat(p) for p in paths}
+
+    @staticmethod
+    def _stat(path: str):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        """Return the watched files changed until `timeout`, in seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path, stat in self._stats.items():
+                new_stat = self._stat(path)
+                if new_stat != stat:
+                    self._stats[path] = new_stat
+                    changed.add(path)
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return changed
+            time.sleep(g_poll_interval)
+
+    def close(self):
+        pass
+
+
+def file_monitor(paths: Iterable[str], poll: bool = False):
+    """Return a monitor of the files, with inotify if available.
+
+    The monitor has the methods `wait(timeout)`, returning the set of
+    changed files, and `close()`.
+
+    """
+    paths = [os.path.abspath(p) for p in paths]
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return _Inotify(paths)
+        except (OSError, AttributeError):
+            pass
+    return _Poller(paths)
+
+
+def _read_lines(filename: str) -> List[str]:
+    """Return the non-empty lines of a file, without line ending."""
+    try:
+        with open(filename, 'r') as f:
+            return [l.rstrip('\r\n') for l in f if l.strip()]
+    except OSError:
+        # E.g. while an editor replaces the file.
+        return []
+
+
+# Birthday, Nameday (None if not included) or Event of a line, and its dates
+# in the calendar.
+Item = Tuple[Union[Birthday, Nameday, Event, None], List[datetime.date]]
+
+
+class Watcher:
+    """A calendar kept up to date with its input files."""
+
+    def __init__(self,
+            year: int,
+            output_file: str,
+            template_even: Optional[str] = None,
+            template_odd: Optional[str] = None,
+            output_dir: str = '.',
+            cache=None,
+            pool=None,
+            **kwargs):
+        """
+        Parameters
+        ----------
+
+        - year: year of the calendar.
+        - output_file: csv file to write.
+        - template_even, template_odd: svg templates, to also update the pdf
+            pages in `output_dir` (cf. pagecache.py).
+        - output_dir: directory of the pdf pages.
+        - cache: pagecache.PageCache, default to the default cache.
+        - pool: inkscape_pool.InkscapePool, preferably persistent.
+        - kwargs: keyword arguments of `generate_csv.build_calendar`, the
+            files in `g_file_kinds` are watched.
+
+        """
+        self.output_file = output_file
+        self.templates = None
+        if template_even and template_odd:
+            self.templates = (template_even, template_odd)
+        self.output_dir = output_dir
+        self.cache = cache
+        self.pool = pool
+        # Absolute path: kind of items.
+        self.files: Dict[str, str] = {}
+        for key, kind in g_file_kinds.items():
+            filename = kwargs.pop(key, None)
+            if filename:
+                self.files[os.path.abspath(filename)] = kind
+        # The items of the watched files are added by `update`.
+        kwargs.pop('bulk', None)
+        self.cal = build_calendar(year, **kwargs)
+        # Lines of each file applied to the calendar, and their items.
+        self._applied: Dict[str, Counter[str]] = {
+                path: collections.Counter() for path in self.files}
+        self._items: Dict[str, Dict[str, Item]] = {
+                path: {} for path in self.files}
+        self._row = WeekLayout().row_function()
+        self._stream = io.StringIO()
+        self._writer = csv.writer(self._stream, CsvDialect)
+        self._header = self._format(WeekLayout().header_row())
+        # Csv line of each week.
+        self._lines: List[str] = []
+
+    def watched_files(self) -> List[str]:
+        """Return the input files and the templates."""
+        files = list(self.files)
+        if self.templates is not None:
+            files += [os.path.abspath(t) for t in self.templates]
+        return files
+
+    def _parse(self, kind: str, l: str) -> Item:
+        """Return the item of a line, raise ValueError if wrong."""
+        if kind == 'nameday':
+            if not int(l[0]):
+                return None, []
+            source = Nameday(l[2:7], l[8:].strip())
+        elif kind == 'birthday':
+            source = Birthday(l[:10], l[11:].strip())
+        else:
+            event = Event(l[:10], l[11:].strip())
+            return event, [event.celebration_date]
+        return source, [c.celebration_date
+                for c in source.celebrations(self.cal.first_day,
+                    self.cal.last_day)]
+
+    def _apply(self, path: str) -> Set[datetime.date]:
+        """Apply the changes of a file to the calendar.
+
+        The days with an item added or removed are filled again from the
+        file, in the order of the lines as generate_csv.py does. Return
+        their dates.
+
+        """
+        kind = self.files[path]
+        old_items = self._items[path]
+        # Only the lines not applied yet are parsed.
+        items: Dict[str, Item] = {}
+        lines = []
+        for line_number, l in enumerate(_read_lines(path), 1):
+            if l not in items:
+                item = old_items.get(l)
+                if item is None:
+                    try:
+                        item = self._parse(kind, l)
+                    except (ValueError, IndexError):
+                        print('{}:{}: wrong format, ignored'.format(path,
+                            line_number), file=sys.stderr)
+                        continue
+                items[l] = item
+            lines.append(l)
+        new = collections.Counter(lines)
+        old = self._applied[path]
+        dates: Set[datetime.date] = set()
+        for l in old - new:
+            dates.update(old_items[l][1])
+        for l in new - old:
+            dates.update(items[l][1])
+        cal = self.cal
+        days = {}
+        for date in dates:
+            offset = cal.day_offset(date)
+            if not 0 <= offset < cal.day_count:
+                continue
+            day = cal.week_for_update(offset // 7).days[offset % 7]
+            if kind == 'birthday':
+                day.birthdays = ()
+            elif kind == 'nameday':
+                day.namedays = ()
+            elif kind == 'event':
+                day.events = ()
+            elif kind == 'holiday':
+                day.set_holiday(None)
+            else:
+                day.set_moon(None)
+            days[date] = day
+        if days:
+            for l in lines:
+                source, item_dates = items[l]
+                for date in item_dates:
+                    day = days.get(date)
+                    if day is None:
+                        continue
+                    if kind == 'birthday':
+                        day.add_birthday(Celebration(source, date), False)
+                    elif kind == 'nameday':
+                        day.add_nameday(Celebration(source, date), False)
+                    elif kind == 'event':
+                        day.add_event(source, False)
+                    elif kind == 'holiday':
+                        # The last line of a date wins.
+                        day.set_holiday(source, False)
+                    else:
+                        day.set_moon(source, False)
+        self._applied[path] = new
+        self._items[path] = items
+        return set(days)
+
+    def _format(self, row: List) -> str:
+        self._stream.seek(0)
+        self._stream.truncate()
+        self._writer.writerow(row)
+        return self._stream.getvalue()
+
+    def update(self, paths: Optional[Iterable[str]] = None) -> List[int]:
+        """Apply the changes of the files and update the outputs.
+
+        Return the indices of the updated weeks.
+
+        Parameters
+        ----------
+
+        - paths: changed files, absolute, default to all.
+
+        """
+        paths = self.watched_files() if paths is None else list(paths)
+        dirty: Set[int] = set()
+        # The data files are applied even if all pages are updated, so that
+        # their state is known for the next changes.
+        all_pages = not self._lines
+        for path in paths:
+            if path in self.files:
+                with tracing.span('apply', file=path):
+                    dirty |= set(self.cal.day_offset(d) // 7
+                            for d in self._apply(path))
+            else:
+                # A template changed, all pages may have changed.
+                all_pages = True
+        weeks = self.cal.weeks
+        if all_pages:
+            dirty = set(range(len(weeks)))
+            self._lines = [''] * len(weeks)
+        for index in dirty:
+            self._lines[index] = self._format(self._row(weeks[index]))
+        if dirty:
+            self._write_csv()
+            if self.templates is not None:
+                self._update_pages(sorted(dirty))
+        return sorted(dirty)
+
+    def _write_csv(self):
+        with tracing.span('write_csv'):
+            tmp_file = '{}.{}'.format(self.output_file, os.getpid())
+            with open(tmp_file, 'w', newline='') as f:
+                f.write(self._header)
+                f.writelines(self._lines)
+            os.replace(tmp_file, self.output_file)
+
+    def _update_pages(self, indices: List[int]) -> List[str]:
+        """Render the pages of the weeks at `indices` that changed."""
+        import pagecache
+
+        columns = WeekLayout().columns
+        rows = [dict(zip(columns, [str(v) for v in self._row(
+            self.cal.weeks[i])])) for i in indices]
+        manifest = pagecache.page_manifest(rows, *self.templates)
+        return pagecache.update_pages(manifest, rows,
+                output_dir=self.output_dir,
+                cache=self.cache,
+                pool=self.pool)
+
+    def run(self, monitor, command: Optional[str] = None):
+        """Update the outputs on each change, until interrupted.
+
+        Parameters
+        ----------
+
+        - monitor: cf. `file_monitor`.
+        - command: shell command run after each update, e.g. to assemble
+            the pdf pages.
+
+        """
+        while True:
+            changed = monitor.wait()
+            # Collect the changes of a save in several steps.
+            while True:
+                more = monitor.wait(g_settle_time)
+                if not more:
+                    break
+                changed |= more
+            if not changed:
+                continue
+            start = time.monotonic()
+            weeks = self.update(changed)
+            if weeks and command:
+                subprocess.call(command, shell=True)
+            print('{}: {} week(s) updated in {:.2f} s'.format(
+                ', '.join(os.path.basename(p) for p in sorted(changed)),
+                len(weeks), time.monotonic() - start), file=sys.stderr)
+            tracing.flush()
+
+
+if __name__ == '__main__':
+    usage = ('usage: %prog [options] -o output.csv year\n'
+            '       %prog [options] -o output.csv --first-date yyyy-mm-dd'
+            ' --last-date yyyy-mm-dd')
+    parser = OptionParser(usage=usage,
+            description=('Write the csv data as generate_csv.py, then update'
+                ' it, and the pdf pages if the templates are given, each time'
+                ' an input file changes. Stop with Ctrl-C.'))
+
+    parser.add_option('-e', '--extra-weeks', dest='extra_weeks',
+            action='store', type=int, default=2,
+            help='number of weeks of the following year, default %default')
+
+    parser.add_option('--first-date', dest='first_date',
+            action='store', type=str, default=None,
+            help='first date of the calendar, instead of the year')
+
+    parser.add_option('--last-date', dest='last_date',
+            action='store', type=str, default=None,
+            help='last date of the calendar, with --first-date')
+
+    parser.add_option('-s', '--start-page', dest='start_page',
+            action='store', type=int, default=2,
+            help='page number of the first week, default %default')
+
+    parser.add_option('-b', '--birthday-file', dest='birthday_file',
+            action='store', type=str, default=None,
+            help='birthday file, cf. generate_csv.py')
+
+    parser.add_option('-d', '--holiday-file', dest='holiday_file',
+            action='store', type=str, default=None,
+            help='holiday file, cf. generate_csv.py')
+
+    parser.add_option('-m', '--moon-file', dest='moon_file',
+            action='store', type=str, default=None,
+            help='moon file, cf. generate_csv.py')
+
+    parser.add_option('-n', '--nameday-file', dest='nameday_file',
+            action='store', type=str, default=None,
+            help='nameday file, cf. generate_csv.py')
+
+    parser.add_option('-v', '--event-file', dest='event_file',
+            action='store', type=str, default=None,
+            help='event file, cf. generate_csv.py')
+
+    parser.add_option('-t', '--month-file', dest='month_file',
+            action='store', type=str, default=None,
+            help='file with the month names, cf. generate_csv.py')
+
+    parser.add_option('-o', '--output-file', dest='output_file',
+            action='store', type=str, metavar='FILE', default=None,
+            help='csv file to write')
+
+    parser.add_option('--template-even', dest='template_even',
+            action='store', type=str, metavar='FILE', default=None,
+            help='svg template for even pages, to also update the pdf pages')
+
+    parser.add_option('--template-odd', dest='template_odd',
+            action='store', type=str, metavar='FILE', default=None,
+            help='svg template for odd pages, to also update the pdf pages')
+
+    parser.add_option('-D', '--output-dir', dest='output_dir',
+            action='store', type=str, metavar='DIR', default='.',
+            help='directory of the pdf pages')
+
+    parser.add_option('-j', '--jobs', dest='jobs',
+            action='store', type=int, default=0,
+            help='number of Inkscape processes, default to the number of cores')
+
+    parser.add_option('-x', '--command', dest='command',
+            action='store', type=str, default=None,
+            help=('shell command to run after each update, e.g. to assemble'
+                ' the pages with impose.py'))
+
+    parser.add_option('--poll', dest='poll',
+            action='store_true', default=False,
+            help='poll the files instead of using inotify')
+
+    options, args = parser.parse_args()
+    if not options.output_file:
+        parser.error('--output-file is required')
+    if bool(options.template_even) != bool(options.template_odd):
+        parser.error('--template-even and --template-odd go together')
+    if bool(options.first_date) != bool(options.last_date):
+        parser.error('--first-date and --last-date go together')
+    first_date = None
+    last_date = None
+    if options.first_date:
+        try:
+            first_date = parse_date(options.first_date)
+            last_date = parse_date(options.last_date)
+        except ValueError as e:
+            parser.error(str(e))
+        args = args or [str(first_date.year)]
+    if not args:
+        parser.error('year argument missing')
+    pool = None
+    if options.template_even:
+        from inkscape_pool import InkscapePool
+
+        pool = InkscapePool(options.jobs or None, persistent=True)
+    watcher = Watcher(int(args[0]), options.output_file,
+            template_even=options.template_even,
+            template_odd=options.template_odd,
+            output_dir=options.output_dir,
+            pool=pool,
+            extra_weeks=options.extra_weeks,
+            first_date=first_date,
+            last_date=last_date,
+            start_page=options.start_page,
+            birthday_file=options.birthday_file,
+            holiday_file=options.holiday_file,
+            moon_file=options.moon_file,
+            nameday_file=options.nameday_file,
+            event_file=options.event_file,
+            month_file=options.month_file)
+    monitor = file_monitor(watcher.watched_files(), options.poll)
+    try:
+        watcher.update()
+        if options.command:
+            subprocess.call(options.command, shell=True)
+        print('Watching {}'.format(', '.join(watcher.watched_files())),
+                file=sys.stderr)
+        watcher.run(monitor, options.command)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.close()
+        if pool is not None:
+            pool.close()